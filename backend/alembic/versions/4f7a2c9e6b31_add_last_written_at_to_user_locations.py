@@ -0,0 +1,26 @@
+"""add_last_written_at_to_user_locations
+
+Revision ID: 4f7a2c9e6b31
+Revises: 9c3e5b7d2a18
+Create Date: 2026-10-18 17:48:30.519274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f7a2c9e6b31'
+down_revision = '9c3e5b7d2a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Stationary fixes refresh updated_at only; the suppression window is measured from this
+    op.add_column('user_locations', sa.Column('last_written_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE user_locations SET last_written_at = updated_at")
+
+
+def downgrade() -> None:
+    op.drop_column('user_locations', 'last_written_at')
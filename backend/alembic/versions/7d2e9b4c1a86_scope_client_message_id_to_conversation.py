@@ -0,0 +1,28 @@
+"""scope_client_message_id_to_conversation
+
+Revision ID: 7d2e9b4c1a86
+Revises: 4f7a2c9e6b31
+Create Date: 2026-10-18 21:12:47.603918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2e9b4c1a86'
+down_revision = '4f7a2c9e6b31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # A client may reuse its keys across conversations; only a retry into the same one is a duplicate
+    op.create_unique_constraint('unique_message_conversation_client_id', 'messages',
+                                ['conversation_id', 'sender_id', 'client_message_id'])
+    op.drop_constraint('unique_message_client_id', 'messages', type_='unique')
+
+
+def downgrade() -> None:
+    op.create_unique_constraint('unique_message_client_id', 'messages', ['sender_id', 'client_message_id'])
+    op.drop_constraint('unique_message_conversation_client_id', 'messages', type_='unique')
@@ -0,0 +1,29 @@
+"""add_background_job_state_table
+
+Revision ID: 9c3e5b7d2a18
+Revises: d6a1c8e3f247
+Create Date: 2026-10-18 17:05:12.384519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3e5b7d2a18'
+down_revision = 'd6a1c8e3f247'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('background_job_state',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('watermark', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('background_job_state')
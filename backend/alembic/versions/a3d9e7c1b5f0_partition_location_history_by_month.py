@@ -0,0 +1,66 @@
+"""partition_location_history_by_month
+
+Revision ID: a3d9e7c1b5f0
+Revises: f2b7c9d4e861
+Create Date: 2026-10-18 12:02:37.518233
+
+"""
+from datetime import date, datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d9e7c1b5f0'
+down_revision = 'f2b7c9d4e861'
+branch_labels = None
+depends_on = None
+
+
+# Monthly partitions created ahead of the current month; the retention job
+# keeps extending this (LOCATION_HISTORY_FUTURE_PARTITIONS)
+FUTURE_MONTHS = 3
+
+
+def _next_month(value: date) -> date:
+    if value.month == 12:
+        return date(value.year + 1, 1, 1)
+    return date(value.year, value.month + 1, 1)
+
+
+def upgrade() -> None:
+    # RANGE partitioning is MySQL-only; other backends keep a plain table and
+    # the retention job falls back to batched DELETEs
+    bind = op.get_bind()
+    if bind.dialect.name != 'mysql':
+        return
+
+    oldest = bind.execute(sa.text('SELECT MIN(recorded_at) FROM user_location_history')).scalar()
+    today = datetime.utcnow().date()
+    month = date((oldest or today).year, (oldest or today).month, 1)
+    last = date(today.year, today.month, 1)
+    for _ in range(FUTURE_MONTHS):
+        last = _next_month(last)
+
+    partitions = []
+    while month <= last:
+        partitions.append(
+            f"PARTITION p{month:%Y%m} VALUES LESS THAN (TO_DAYS('{_next_month(month).isoformat()}'))"
+        )
+        month = _next_month(month)
+    partitions.append('PARTITION pmax VALUES LESS THAN MAXVALUE')
+
+    # Every unique key of a partitioned table must contain the partitioning column
+    op.execute('ALTER TABLE user_location_history DROP PRIMARY KEY, ADD PRIMARY KEY (id, recorded_at)')
+    op.execute(
+        'ALTER TABLE user_location_history PARTITION BY RANGE (TO_DAYS(recorded_at)) '
+        f"({', '.join(partitions)})"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'mysql':
+        return
+
+    op.execute('ALTER TABLE user_location_history REMOVE PARTITIONING')
+    op.execute('ALTER TABLE user_location_history DROP PRIMARY KEY, ADD PRIMARY KEY (id)')
@@ -0,0 +1,27 @@
+"""add_client_message_id_to_messages
+
+Revision ID: b8e4f2a6c913
+Revises: a3d9e7c1b5f0
+Create Date: 2026-10-18 14:05:11.208417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4f2a6c913'
+down_revision = 'a3d9e7c1b5f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('client_message_id', sa.String(length=64), nullable=True))
+    # NULLs never collide, so messages sent without a key are unaffected
+    op.create_unique_constraint('unique_message_client_id', 'messages', ['sender_id', 'client_message_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('unique_message_client_id', 'messages', type_='unique')
+    op.drop_column('messages', 'client_message_id')
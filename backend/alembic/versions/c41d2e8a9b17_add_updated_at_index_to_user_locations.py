@@ -0,0 +1,24 @@
+"""add_updated_at_index_to_user_locations
+
+Revision ID: c41d2e8a9b17
+Revises: 78b82334306c
+Create Date: 2026-10-18 09:12:40.512331
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d2e8a9b17'
+down_revision = '78b82334306c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_user_locations_updated_at'), 'user_locations', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_user_locations_updated_at'), table_name='user_locations')
@@ -0,0 +1,27 @@
+"""add_id_to_message_history_index
+
+Revision ID: d6a1c8e3f247
+Revises: b8e4f2a6c913
+Create Date: 2026-10-18 15:32:47.916024
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6a1c8e3f247'
+down_revision = 'b8e4f2a6c913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # id breaks created_at ties, so (created_at, id) keyset pages seek on this index
+    op.drop_index('idx_message_conversation_created', table_name='messages')
+    op.create_index('idx_message_conversation_created', 'messages', ['conversation_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_message_conversation_created', table_name='messages')
+    op.create_index('idx_message_conversation_created', 'messages', ['conversation_id', 'created_at'], unique=False)
@@ -0,0 +1,67 @@
+"""numeric_coordinates_and_spatial_indexes
+
+Revision ID: e5f8a1c3d240
+Revises: c41d2e8a9b17
+Create Date: 2026-10-18 10:05:12.377019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f8a1c3d240'
+down_revision = 'c41d2e8a9b17'
+branch_labels = None
+depends_on = None
+
+
+# table -> whether latitude/longitude are nullable
+COORDINATE_TABLES = {
+    'user_locations': False,
+    'user_location_history': False,
+    'shake_sessions': False,
+    'meetings': True,
+    'events': True,
+    'locations': False,
+}
+
+SPATIAL_INDEXES = [
+    ('idx_user_location_lat_lon', 'user_locations', ['latitude', 'longitude']),
+    ('idx_shake_status_lat_lon', 'shake_sessions', ['status', 'latitude', 'longitude']),
+    ('idx_meeting_lat_lon', 'meetings', ['latitude', 'longitude']),
+    ('idx_event_lat_lon', 'events', ['latitude', 'longitude']),
+    ('idx_location_lat_lon', 'locations', ['latitude', 'longitude']),
+]
+
+
+def upgrade() -> None:
+    for table, nullable in COORDINATE_TABLES.items():
+        if nullable:
+            # Empty strings cannot be converted to DOUBLE
+            op.execute(f"UPDATE {table} SET latitude = NULL WHERE latitude = ''")
+            op.execute(f"UPDATE {table} SET longitude = NULL WHERE longitude = ''")
+        for column in ('latitude', 'longitude'):
+            op.alter_column(
+                table, column,
+                existing_type=sa.String(length=20),
+                type_=sa.Double(),
+                existing_nullable=nullable
+            )
+    
+    for name, table, columns in SPATIAL_INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(SPATIAL_INDEXES):
+        op.drop_index(name, table_name=table)
+    
+    for table, nullable in COORDINATE_TABLES.items():
+        for column in ('latitude', 'longitude'):
+            op.alter_column(
+                table, column,
+                existing_type=sa.Double(),
+                type_=sa.String(length=20),
+                existing_nullable=nullable
+            )
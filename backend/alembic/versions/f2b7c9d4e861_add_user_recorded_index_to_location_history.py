@@ -0,0 +1,27 @@
+"""add_user_recorded_index_to_location_history
+
+Revision ID: f2b7c9d4e861
+Revises: e5f8a1c3d240
+Create Date: 2026-10-18 11:20:48.904215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b7c9d4e861'
+down_revision = 'e5f8a1c3d240'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('idx_history_user_recorded', 'user_location_history', ['user_id', 'recorded_at', 'id'], unique=False)
+    # Redundant: user_id is the leading column of idx_history_user_recorded
+    op.drop_index(op.f('ix_user_location_history_user_id'), table_name='user_location_history')
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_user_location_history_user_id'), 'user_location_history', ['user_id'], unique=False)
+    op.drop_index('idx_history_user_recorded', table_name='user_location_history')
@@ -9,7 +9,7 @@ from app.models.user import User
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 @router.post("/register", response_model=dict, status_code=status.HTTP_201_CREATED)
-async def register(
+def register(
     user_data: UserRegister,
     db: Session = Depends(get_db)
 ):
@@ -22,7 +22,7 @@ async def register(
     }
 
 @router.post("/login", response_model=dict)
-async def login(
+def login(
     login_data: UserLogin,
     db: Session = Depends(get_db)
 ):
@@ -35,14 +35,14 @@ async def login(
     }
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(
+def get_me(
     current_user: User = Depends(get_current_user)
 ):
     """Get current authenticated user."""
     return UserResponse.model_validate(current_user)
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(
+def refresh_token(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -1,11 +1,17 @@
 """API endpoints for chat functionality."""
 from fastapi import APIRouter, Depends, status, Query, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from typing import Optional
-from app.core.database import get_db
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError as SchemaValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Optional, Tuple
+from app.core.database import get_db, get_async_db, get_session_factory
 from app.core.dependencies import get_current_user
+from app.core.exceptions import MeetUpException
 from app.models.user import User
 from app.services.chat_service import ChatService
+from app.repositories.chat_repository import AsyncChatRepository
+from app.repositories.user_repository import AsyncUserRepository
 from app.schemas.chat import (
     MessageCreate,
     MessageResponse,
@@ -15,18 +21,17 @@ from app.schemas.chat import (
     MarkReadResponse,
     UnreadCountResponse
 )
-from app.core.websocket_manager import WebSocketManager
+from app.core.websocket_manager import websocket_manager
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
-websocket_manager = WebSocketManager()
 
 
 @router.get("/conversations", response_model=ConversationListResponse)
-async def get_conversations(
+def get_conversations(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -37,7 +42,7 @@ async def get_conversations(
 
 
 @router.get("/conversations/{friend_id}", response_model=ConversationResponse)
-async def get_or_create_conversation(
+def get_or_create_conversation(
     friend_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -54,54 +59,80 @@ async def send_message(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Send a message to a friend."""
-    service = ChatService(db)
-    message = service.send_message(
-        user_id=current_user.id,
+    """
+    Send a message to a friend. Resending with the same client_message_id
+    returns the original message.
+    """
+    message, created = await run_in_threadpool(_send_message, ChatService(db), current_user.id, message_data)
+    if created:
+        await _broadcast_new_message(message, current_user.id, message_data.friend_id)
+    return message
+
+
+def _send_message(service: ChatService, user_id: int, message_data: MessageCreate) -> Tuple[dict, bool]:
+    return service.send_message(
+        user_id=user_id,
         friend_id=message_data.friend_id,
         content=message_data.content,
-        message_type=message_data.message_type
+        message_type=message_data.message_type,
+        client_message_id=message_data.client_message_id
     )
-    
-    # Broadcast message via WebSocket if recipient is connected
-    conversation = service.chat_repo.get_conversation_with_friend(
-        current_user.id,
-        message_data.friend_id
+
+
+def _send_message_in_own_session(session_factory: sessionmaker, user_id: int,
+                                 message_data: MessageCreate) -> Tuple[dict, bool]:
+    """_send_message for WebSocket frames, which have no request-scoped session."""
+    db = session_factory()
+    try:
+        return _send_message(ChatService(db), user_id, message_data)
+    finally:
+        db.close()
+
+
+async def _broadcast_new_message(message: dict, sender_id: int, friend_id: int):
+    """Deliver a new message to the recipient's connected sockets."""
+    await websocket_manager.broadcast_to_conversation(
+        conversation_id=message["conversation_id"],
+        message={
+            "type": "new_message",
+            "data": message
+        },
+        exclude_user_id=sender_id,
+        participant_ids=[sender_id, friend_id]
     )
-    if conversation:
-        websocket_manager.broadcast_to_conversation(
-            conversation_id=conversation.id,
-            message={
-                "type": "new_message",
-                "data": message
-            },
-            exclude_user_id=current_user.id
-        )
-    
-    return message
 
 
 @router.get("/conversations/{conversation_id}/messages", response_model=MessagesResponse)
-async def get_messages(
+def get_messages(
     conversation_id: int,
     limit: int = Query(50, ge=1, le=100, description="Number of messages to retrieve"),
-    offset: int = Query(0, ge=0, description="Offset for pagination"),
+    offset: int = Query(0, ge=0, description="Offset for pagination (prefer before_id/cursor)"),
+    before_id: Optional[int] = Query(None, description="Only messages older than this message"),
+    after_id: Optional[int] = Query(None, description="Only messages newer than this message"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get message history for a conversation."""
+    """
+    Get message history for a conversation, one page at a time (oldest first
+    within a page). Page back with before_id or forward with after_id, then
+    follow next_cursor.
+    """
     service = ChatService(db)
     result = service.get_messages(
         user_id=current_user.id,
         conversation_id=conversation_id,
         limit=limit,
-        offset=offset
+        offset=offset,
+        before_id=before_id,
+        after_id=after_id,
+        cursor=cursor
     )
     return result
 
 
 @router.patch("/conversations/{conversation_id}/read", response_model=MarkReadResponse)
-async def mark_as_read(
+def mark_as_read(
     conversation_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -113,7 +144,7 @@ async def mark_as_read(
 
 
 @router.get("/unread-count", response_model=UnreadCountResponse)
-async def get_unread_count(
+def get_unread_count(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -127,7 +158,8 @@ async def get_unread_count(
 async def websocket_endpoint(
     websocket: WebSocket,
     conversation_id: int,
-    token: Optional[str] = Query(None)
+    token: Optional[str] = Query(None),
+    async_db: AsyncSession = Depends(get_async_db)
 ):
     """
     WebSocket endpoint for real-time chat messages.
@@ -142,9 +174,19 @@ async def websocket_endpoint(
         await websocket_manager.connect(websocket, conversation_id, token)
         
         # Get user_id from connection info
-        user_id = None
-        if websocket in websocket_manager.connection_info:
-            _, user_id = websocket_manager.connection_info[websocket]
+        user_id = websocket_manager.connection_users.get(websocket)
+        
+        # Verify the user is active and belongs to the conversation without blocking the event loop
+        if user_id:
+            user = await AsyncUserRepository(async_db).get_by_id(user_id)
+            conversation = await AsyncChatRepository(async_db).get_conversation_by_id(
+                conversation_id, user_id
+            )
+            # Give the connection back to the pool while the socket is open
+            await async_db.close()
+            if not user or not user.is_active or not conversation:
+                await websocket.close(code=1008, reason="Not allowed")
+                return
         
         logger.info(f"WebSocket connected for conversation {conversation_id}, user {user_id}")
         
@@ -156,7 +198,7 @@ async def websocket_endpoint(
                 
                 # Handle different message types
                 if message_data.get("type") == "ping":
-                    await websocket.send_text(json.dumps({"type": "pong"}))
+                    websocket_manager.send(websocket, {"type": "pong"})
                 elif message_data.get("type") == "typing" and user_id:
                     # Broadcast typing indicator
                     await websocket_manager.broadcast_typing(
@@ -181,3 +223,144 @@ async def websocket_endpoint(
     finally:
         websocket_manager.disconnect(websocket, conversation_id)
 
+
+
+@router.websocket("/ws")
+async def user_websocket_endpoint(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None),
+    async_db: AsyncSession = Depends(get_async_db),
+    session_factory: sessionmaker = Depends(get_session_factory)
+):
+    """
+    Multiplexed WebSocket carrying every conversation of the user over one
+    connection. Requires authentication token in query parameter.
+    
+    Server frames carry the conversation_id they belong to. Client frames:
+    {"type": "ping"}, {"type": "subscribe"|"unsubscribe", "conversation_id": ...},
+    {"type": "typing", "conversation_id": ..., "is_typing": ...} and
+    {"type": "send_message", "client_message_id": ..., "friend_id": ..., "content": ...,
+    "message_type": ...}. send_message is answered with a "message_ack" frame
+    echoing client_message_id (or an "error" frame carrying it); resending
+    the same client_message_id is acknowledged with the original message.
+    """
+    user_id = websocket_manager.authenticate(token) if token else None
+    if not user_id:
+        await websocket.close(code=1008, reason="Authentication required")
+        return
+    
+    # Verify the user and load their conversations without blocking the event loop
+    user = await AsyncUserRepository(async_db).get_by_id(user_id)
+    conversation_ids = await AsyncChatRepository(async_db).get_user_conversation_ids(user_id) if user else []
+    # Give the connection back to the pool while the socket is open
+    await async_db.close()
+    if not user or not user.is_active:
+        await websocket.close(code=1008, reason="Not allowed")
+        return
+    
+    try:
+        await websocket_manager.connect_user(websocket, user_id, conversation_ids)
+        
+        while True:
+            try:
+                message_data = json.loads(await websocket.receive_text())
+                reply = await _handle_chat_frame(websocket, user_id, message_data, async_db, session_factory)
+                if reply:
+                    websocket_manager.send(websocket, reply)
+            except WebSocketDisconnect:
+                logger.info(f"Chat WebSocket disconnected for user {user_id}")
+                break
+            except json.JSONDecodeError:
+                websocket_manager.send(websocket, {"type": "error", "detail": "Invalid JSON"})
+    
+    except Exception as e:
+        logger.error(f"WebSocket error: {e}")
+        try:
+            await websocket.close(code=1011, reason="Internal error")
+        except:
+            pass
+    finally:
+        websocket_manager.disconnect(websocket)
+
+
+async def _handle_chat_frame(
+    websocket: WebSocket,
+    user_id: int,
+    message_data: dict,
+    async_db: AsyncSession,
+    session_factory: sessionmaker
+) -> Optional[dict]:
+    """
+    Act on one client frame of a multiplexed chat socket. Returns the reply, if any.
+    async_db is the socket's session; it is closed again after use. Sent
+    messages are stored in a session of their own from session_factory.
+    """
+    if not isinstance(message_data, dict):
+        return {"type": "error", "detail": "Frames must be JSON objects"}
+    frame_type = message_data.get("type")
+    if frame_type == "ping":
+        return {"type": "pong"}
+    if frame_type == "send_message":
+        return await _handle_send_message(user_id, message_data, session_factory)
+    
+    conversation_id = message_data.get("conversation_id")
+    if not isinstance(conversation_id, int):
+        return {"type": "error", "detail": "conversation_id is required"}
+    
+    if frame_type == "unsubscribe":
+        websocket_manager.unsubscribe(websocket, conversation_id)
+        return {"type": "unsubscribed", "conversation_id": conversation_id}
+    
+    subscribed = conversation_id in websocket_manager.connection_subscriptions.get(websocket, ())
+    if frame_type == "subscribe" and not subscribed:
+        conversation = await AsyncChatRepository(async_db).get_conversation_by_id(conversation_id, user_id)
+        await async_db.close()
+        if not conversation:
+            return {"type": "error", "conversation_id": conversation_id, "detail": "Not allowed"}
+        websocket_manager.subscribe(websocket, conversation_id)
+    
+    if frame_type == "subscribe":
+        return {"type": "subscribed", "conversation_id": conversation_id}
+    
+    if frame_type == "typing":
+        if not subscribed:
+            return {"type": "error", "conversation_id": conversation_id, "detail": "Not subscribed"}
+        await websocket_manager.broadcast_typing(
+            conversation_id=conversation_id,
+            user_id=user_id,
+            is_typing=message_data.get("is_typing", False)
+        )
+        return None
+    
+    return {"type": "error", "detail": f"Unknown frame type: {frame_type}"}
+
+
+async def _handle_send_message(user_id: int, message_data: dict, session_factory: sessionmaker) -> dict:
+    """Store and deliver a message sent over the socket, answering with an ack."""
+    client_message_id = message_data.get("client_message_id")
+    if not isinstance(client_message_id, str) or not client_message_id:
+        return {"type": "error", "detail": "client_message_id is required"}
+    
+    try:
+        message_create = MessageCreate.model_validate(message_data)
+    except SchemaValidationError as e:
+        error = e.errors()[0]
+        detail = f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        return {"type": "error", "client_message_id": client_message_id, "detail": detail}
+    
+    try:
+        message, created = await run_in_threadpool(
+            _send_message_in_own_session, session_factory, user_id, message_create
+        )
+    except MeetUpException as e:
+        return {"type": "error", "client_message_id": client_message_id, "detail": e.detail}
+    
+    if created:
+        await _broadcast_new_message(message, user_id, message_create.friend_id)
+    return {
+        "type": "message_ack",
+        "client_message_id": client_message_id,
+        "conversation_id": message["conversation_id"],
+        "duplicate": not created,
+        "data": message
+    }
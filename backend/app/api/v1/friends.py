@@ -9,7 +9,7 @@ from app.schemas.friends import FriendResponse, FriendRequest, FriendshipRespons
 router = APIRouter(prefix="/friends", tags=["friends"])
 
 @router.get("", response_model=list[FriendResponse])
-async def get_friends(
+def get_friends(
     close_friends_only: bool = Query(False, description="Filter to close friends only"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -20,7 +20,7 @@ async def get_friends(
     return friends
 
 @router.get("/debug/{friend_id}", response_model=dict)
-async def debug_friendship(
+def debug_friendship(
     friend_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -68,7 +68,7 @@ async def debug_friendship(
     }
 
 @router.get("/requests/pending", response_model=list[dict])
-async def get_pending_friend_requests(
+def get_pending_friend_requests(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -78,7 +78,7 @@ async def get_pending_friend_requests(
     return requests
 
 @router.get("/requests/sent", response_model=list[dict])
-async def get_sent_friend_requests(
+def get_sent_friend_requests(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -88,7 +88,7 @@ async def get_sent_friend_requests(
     return requests
 
 @router.post("/{friend_id}/request", response_model=FriendshipResponse, status_code=status.HTTP_201_CREATED)
-async def send_friend_request(
+def send_friend_request(
     friend_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -99,7 +99,7 @@ async def send_friend_request(
     return friendship
 
 @router.patch("/{friend_id}/accept", response_model=FriendshipResponse)
-async def accept_friend_request(
+def accept_friend_request(
     friend_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -110,7 +110,7 @@ async def accept_friend_request(
     return friendship
 
 @router.patch("/{friend_id}/decline", status_code=status.HTTP_204_NO_CONTENT)
-async def decline_friend_request(
+def decline_friend_request(
     friend_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -121,7 +121,7 @@ async def decline_friend_request(
     return None
 
 @router.delete("/{friend_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def remove_friend(
+def remove_friend(
     friend_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -132,7 +132,7 @@ async def remove_friend(
     return None
 
 @router.patch("/{friend_id}/close-status", response_model=FriendshipResponse)
-async def update_close_friend_status(
+def update_close_friend_status(
     friend_id: int,
     update_data: CloseFriendUpdate,
     current_user: User = Depends(get_current_user),
@@ -11,7 +11,7 @@ router = APIRouter(prefix="/invitations", tags=["invitations"])
 
 
 @router.get("", response_model=List[InvitationResponse])
-async def get_invitations(
+def get_invitations(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -22,7 +22,7 @@ async def get_invitations(
 
 
 @router.get("/{invitation_id}", response_model=InvitationResponse)
-async def get_invitation(
+def get_invitation(
     invitation_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -34,7 +34,7 @@ async def get_invitation(
 
 
 @router.patch("/{invitation_id}/accept", response_model=InvitationResponse)
-async def accept_invitation(
+def accept_invitation(
     invitation_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -46,7 +46,7 @@ async def accept_invitation(
 
 
 @router.patch("/{invitation_id}/decline", response_model=InvitationResponse)
-async def decline_invitation(
+def decline_invitation(
     invitation_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -1,23 +1,36 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
 from datetime import datetime
 from typing import Optional
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db, get_session_factory
 from app.core.dependencies import get_current_user
+from app.core.location_subscriptions import location_subscriptions
+from app.core.security import decode_access_token
+from app.repositories.user_repository import AsyncUserRepository
 from app.models.user import User
 from app.services.location_service import LocationService
 from app.schemas.location import (
     LocationUpdate, 
     LocationResponse, 
     FriendLocationResponse,
+    NearbyFriendLocationResponse,
     LocationHistoryCreate,
-    LocationHistoryResponse
+    LocationHistoryBatchCreate,
+    LocationHistoryBatchResponse,
+    LocationHistoryResponse,
+    LocationHistoryPage
 )
+import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/location", tags=["location"])
 
 @router.patch("/update", response_model=LocationResponse)
-async def update_location(
+def update_location(
     location_data: LocationUpdate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -34,7 +47,7 @@ async def update_location(
     return location
 
 @router.get("/friends/locations", response_model=list[FriendLocationResponse])
-async def get_friends_locations(
+def get_friends_locations(
     close_friends_only: bool = Query(False, description="Filter to close friends only"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -47,8 +60,23 @@ async def get_friends_locations(
     )
     return locations
 
+@router.get("/friends/nearby", response_model=list[NearbyFriendLocationResponse])
+def get_nearby_friends(
+    radius_m: float = Query(1000.0, gt=0, le=50000, description="Search radius in meters"),
+    close_friends_only: bool = Query(False, description="Filter to close friends only"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get friends near the user's current location, closest first."""
+    location_service = LocationService(db)
+    return location_service.get_nearby_friends(
+        current_user.id,
+        radius_m=radius_m,
+        close_friends_only=close_friends_only
+    )
+
 @router.post("/history", response_model=LocationHistoryResponse, status_code=201)
-async def add_location_history(
+def add_location_history(
     history_data: LocationHistoryCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -68,19 +96,111 @@ async def add_location_history(
     )
     return history
 
-@router.get("/history", response_model=list[LocationHistoryResponse])
-async def get_location_history(
+@router.post("/history/batch", response_model=LocationHistoryBatchResponse, status_code=201)
+def add_location_history_batch(
+    batch_data: LocationHistoryBatchCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Add many buffered location history records in one request."""
+    location_service = LocationService(db)
+    return location_service.add_location_history_batch(
+        user_id=current_user.id,
+        points=[point.model_dump() for point in batch_data.points]
+    )
+
+@router.get("/history", response_model=LocationHistoryPage)
+def get_location_history(
     start_date: Optional[datetime] = Query(None, description="Start date for history"),
     end_date: Optional[datetime] = Query(None, description="End date for history"),
+    limit: int = Query(100, ge=1, le=1000, description="Number of records to retrieve"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get user's location history."""
+    """Get user's location history, most recent first, one page at a time."""
     location_service = LocationService(db)
-    history = location_service.get_location_history(
+    return location_service.get_location_history_page(
         current_user.id,
+        limit=limit,
+        cursor=cursor,
         start_date=start_date,
         end_date=end_date
     )
-    return history
 
+@router.get("/history/export")
+def export_location_history(
+    start_date: Optional[datetime] = Query(None, description="Start date for history"),
+    end_date: Optional[datetime] = Query(None, description="End date for history"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Export format: ndjson or csv"),
+    current_user: User = Depends(get_current_user),
+    session_factory: sessionmaker = Depends(get_session_factory)
+):
+    """Stream user's full location history as NDJSON or CSV (oldest first)."""
+    # The stream outlives the request-scoped session, so it opens its own
+    stream_db = session_factory()
+    user_id = current_user.id
+    
+    def content():
+        try:
+            yield from LocationService(stream_db).export_location_history(
+                user_id,
+                start_date=start_date,
+                end_date=end_date,
+                export_format=format
+            )
+        finally:
+            stream_db.close()
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        content(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="location-history.{format}"'}
+    )
+
+@router.websocket("/ws")
+async def location_websocket(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None),
+    close_friends_only: bool = Query(False),
+    async_db: AsyncSession = Depends(get_async_db)
+):
+    """
+    WebSocket pushing friends' location updates as they happen.
+    Requires authentication token in query parameter.
+
+    Each update is sent as {"type": "friend_location", "location": {...}} with the
+    same fields as GET /location/friends/locations, which clients call once to
+    get the initial positions.
+    """
+    payload = decode_access_token(token) if token else None
+    if not payload or not payload.get("sub"):
+        await websocket.close(code=1008, reason="Authentication required")
+        return
+    user_id = int(payload["sub"])
+    
+    user = await AsyncUserRepository(async_db).get_by_id(user_id)
+    # Give the connection back to the pool while the socket is open
+    await async_db.close()
+    if not user or not user.is_active:
+        await websocket.close(code=1008, reason="Not allowed")
+        return
+    
+    await websocket.accept()
+    location_subscriptions.connect(websocket, user_id, close_friends_only)
+    try:
+        while True:
+            data = await websocket.receive_text()
+            try:
+                message_data = json.loads(data)
+            except ValueError:
+                continue
+            if message_data.get("type") == "ping":
+                location_subscriptions.send(websocket, {"type": "pong"})
+    except WebSocketDisconnect:
+        logger.info(f"Location WebSocket disconnected for user {user_id}")
+    except Exception as e:
+        logger.error(f"Location WebSocket error: {e}")
+    finally:
+        location_subscriptions.disconnect(websocket)
@@ -12,7 +12,7 @@ router = APIRouter(prefix="/meetings", tags=["meetings"])
 
 
 @router.post("", response_model=MeetingResponse, status_code=status.HTTP_201_CREATED)
-async def create_meeting(
+def create_meeting(
     meeting_data: MeetingCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -24,7 +24,7 @@ async def create_meeting(
 
 
 @router.get("", response_model=List[MeetingResponse])
-async def get_meetings(
+def get_meetings(
     filter_type: str = Query("all", description="Filter: all, organized, invited, upcoming, past"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -36,7 +36,7 @@ async def get_meetings(
 
 
 @router.get("/{meeting_id}", response_model=MeetingResponse)
-async def get_meeting(
+def get_meeting(
     meeting_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -48,7 +48,7 @@ async def get_meeting(
 
 
 @router.patch("/{meeting_id}", response_model=MeetingResponse)
-async def update_meeting(
+def update_meeting(
     meeting_id: int,
     update_data: MeetingUpdate,
     current_user: User = Depends(get_current_user),
@@ -61,7 +61,7 @@ async def update_meeting(
 
 
 @router.delete("/{meeting_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_meeting(
+def delete_meeting(
     meeting_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -75,7 +75,7 @@ async def delete_meeting(
 
 
 @router.post("/{meeting_id}/participants", response_model=MeetingResponse)
-async def add_participants_to_meeting(
+def add_participants_to_meeting(
     meeting_id: int,
     participant_ids: List[int],
     current_user: User = Depends(get_current_user),
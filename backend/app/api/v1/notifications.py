@@ -11,7 +11,7 @@ router = APIRouter(prefix="/notifications", tags=["notifications"])
 
 
 @router.post("/token", response_model=FCMTokenResponse, status_code=status.HTTP_200_OK)
-async def register_fcm_token(
+def register_fcm_token(
     token_data: FCMTokenRegister,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -15,7 +15,7 @@ router = APIRouter(prefix="/points", tags=["points"])
 
 
 @router.get("/summary", response_model=PointsSummaryResponse)
-async def get_points_summary(
+def get_points_summary(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -26,7 +26,7 @@ async def get_points_summary(
 
 
 @router.get("/history", response_model=PointsHistoryResponse)
-async def get_points_history(
+def get_points_history(
     limit: int = Query(50, ge=1, le=100, description="Number of transactions to return"),
     offset: int = Query(0, ge=0, description="Offset for pagination"),
     transaction_type: Optional[str] = Query(None, description="Filter by transaction type"),
@@ -45,7 +45,7 @@ async def get_points_history(
 
 
 @router.post("/meetings/{meeting_id}/confirm", response_model=PointsAwardResponse, status_code=status.HTTP_200_OK)
-async def confirm_meeting(
+def confirm_meeting(
     meeting_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
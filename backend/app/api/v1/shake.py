@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, Query, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, sessionmaker
+from datetime import datetime
 from typing import Optional
-from app.core.database import get_db
+from app.core.database import get_db, get_session_factory
 from app.core.dependencies import get_current_user
+from app.core.shake_matcher import shake_matcher
 from app.models.user import User
 from app.services.shake_service import ShakeService
 from app.schemas.shake import (
@@ -18,25 +21,63 @@ router = APIRouter(prefix="/shake", tags=["shake"])
 @router.post("/initiate", response_model=ShakeInitiateResponse, status_code=status.HTTP_200_OK)
 async def initiate_shake(
     shake_data: ShakeInitiateRequest,
+    wait: bool = Query(False, description="Hold the request open until a friend matches or the session expires"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    session_factory: sessionmaker = Depends(get_session_factory)
 ):
     """
     Initiate a shake session when user shakes their phone.
     Automatically checks for nearby friends and matches if found.
+    
+    With wait=true an unmatched shake is answered only once a friend's shake
+    matches it (both sides get the result at the same moment) or the session
+    expires, instead of the client retrying.
+    
+    With group=true the shake matches every friend group-shaking nearby
+    (who are all friends with each other) into one meeting, after the group
+    has had a few seconds to gather.
     """
-    service = ShakeService(db)
-    result = service.initiate_shake(
+    service = ShakeService(db, session_factory)
+    result = await run_in_threadpool(
+        service.initiate_shake,
         user_id=current_user.id,
         latitude=shake_data.latitude,
         longitude=shake_data.longitude,
-        accuracy_m=shake_data.accuracy_m
+        accuracy_m=shake_data.accuracy_m,
+        group=shake_data.group
     )
-    return result
+    if not wait or result["matched"]:
+        return result
+    
+    shake = shake_matcher.get(current_user.id)
+    if not shake:
+        return result
+    
+    while True:
+        # Give the connection back to the pool while waiting; waiting needs no database
+        await run_in_threadpool(db.close)
+        timeout = (shake.expires_at - datetime.utcnow()).total_seconds()
+        if timeout <= 0:
+            return service.expired_result(result["session_id"])
+        if not shake.group:
+            matched = await shake_matcher.wait_for_match(current_user.id, timeout)
+            return matched or service.expired_result(result["session_id"])
+        
+        # A group is matched by whichever member checks it after it settles,
+        # so a waiting group shake re-checks every settle interval
+        matched = await shake_matcher.wait_for_match(
+            current_user.id, min(timeout, ShakeService.GROUP_SETTLE_SECONDS)
+        )
+        if matched:
+            return matched
+        checked = await run_in_threadpool(service.check_group_shake, current_user.id)
+        if checked and checked["matched"]:
+            return checked
 
 
 @router.get("/nearby-friends", response_model=NearbyFriendsResponse)
-async def get_nearby_shaking_friends(
+def get_nearby_shaking_friends(
     latitude: float = Query(..., description="Current latitude"),
     longitude: float = Query(..., description="Current longitude"),
     current_user: User = Depends(get_current_user),
@@ -53,7 +94,7 @@ async def get_nearby_shaking_friends(
 
 
 @router.get("/active-session", response_model=Optional[ShakeSessionResponse])
-async def get_active_session(
+def get_active_session(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
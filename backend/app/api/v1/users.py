@@ -9,7 +9,7 @@ from typing import List
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/search", response_model=List[dict])
-async def search_users(
+def search_users(
     q: str = Query(..., description="Search query (username or email)"),
     limit: int = Query(20, le=50, description="Maximum number of results"),
     current_user: User = Depends(get_current_user),
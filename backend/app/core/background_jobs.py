@@ -0,0 +1,132 @@
+"""Periodic maintenance jobs run on background threads."""
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+import threading
+import logging
+from app.core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def supports_advisory_locks(engine: Engine) -> bool:
+    """Whether advisory_lock really locks on this database (MySQL GET_LOCK only)."""
+    return engine.dialect.name == "mysql"
+
+
+@contextmanager
+def advisory_lock(engine: Engine, name: Optional[str]):
+    """
+    Hold the named MySQL lock (GET_LOCK) on a connection of its own for the
+    block, without waiting for it. Yields whether the lock was acquired;
+    without a name, or on databases without named locks, always True, so
+    there nothing is locked at all.
+    """
+    if not name or not supports_advisory_locks(engine):
+        yield True
+        return
+
+    with engine.connect() as conn:
+        acquired = conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": name}).scalar() == 1
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
+
+
+class PeriodicJob:
+    """
+    Runs `task(db)` every `interval_seconds` on a daemon thread, each run with
+    its own session from `session_factory`.
+
+    The task returns a dict describing what it did, which is logged and kept in
+    `last_result`. A failing run is logged and retried on the next interval;
+    it never stops the job.
+
+    With a `lock_name`, each run first takes that database lock; every worker
+    process starts the job, but only the one holding the lock runs it and the
+    others skip that interval. The lock needs MySQL: on other databases every
+    process runs the job, so its task must tolerate concurrent runs (a warning
+    is logged on the first run).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        task: Callable[[Session], Optional[dict]],
+        interval_seconds: float,
+        session_factory: Callable = SessionLocal,
+        lock_name: Optional[str] = None
+    ):
+        self.name = name
+        self.task = task
+        self.interval_seconds = interval_seconds
+        self.session_factory = session_factory
+        self.lock_name = lock_name
+        self._stop_event = threading.Event()
+        self._run_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.run_count = 0
+        self.failure_count = 0
+        self.skip_count = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_result: Optional[dict] = None
+        self._warned_unlocked = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        """Start the job thread. The first run happens immediately."""
+        if self._thread:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        logger.info(f"Background job {self.name} started (interval={self.interval_seconds}s)")
+
+    def stop(self):
+        """Stop the job thread, waiting for a run in progress to finish."""
+        if not self._thread:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def run_once(self) -> Optional[dict]:
+        """Run the task now in the calling thread. Returns its result, None on failure or skip."""
+        with self._run_lock:
+            db = self.session_factory()
+            try:
+                if self.lock_name and not self._warned_unlocked and not supports_advisory_locks(db.get_bind()):
+                    self._warned_unlocked = True
+                    logger.warning(f"Background job {self.name} runs unlocked: named locks need MySQL")
+                with advisory_lock(db.get_bind(), self.lock_name) as acquired:
+                    if not acquired:
+                        self.skip_count += 1
+                        logger.debug(f"Background job {self.name} skipped: lock held by another worker")
+                        return None
+                    result = self.task(db)
+            except Exception as e:
+                db.rollback()
+                self.failure_count += 1
+                logger.error(f"Background job {self.name} failed: {e}")
+                return None
+            finally:
+                db.close()
+
+            self.run_count += 1
+            self.last_run_at = datetime.utcnow()
+            self.last_result = result
+            logger.info(f"Background job {self.name} finished: {result}")
+            return result
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.run_once()
+            self._stop_event.wait(self.interval_seconds)
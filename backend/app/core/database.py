@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
@@ -13,6 +14,64 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Sync driver -> asyncio driver, used when ASYNC_DATABASE_URL is not set explicitly
+ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+_async_engine = None
+_AsyncSessionLocal = None
+
+
+def get_async_database_url() -> str:
+    """Return the asyncio database URL, derived from DATABASE_URL if not configured."""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    
+    scheme, sep, rest = settings.DATABASE_URL.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+def get_async_engine():
+    """
+    Get the asyncio engine, creating it on first use.
+    Created lazily so the async driver is only required when async mode is used.
+    """
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            get_async_database_url(),
+            pool_pre_ping=True,
+            pool_recycle=300
+        )
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine,
+            class_=AsyncSession,
+            autoflush=False,
+            expire_on_commit=False
+        )
+    return _async_engine
+
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    """Get the AsyncSession factory bound to the asyncio engine."""
+    get_async_engine()
+    return _AsyncSessionLocal
+
+
+async def dispose_async_engine():
+    """Close all pooled asyncio connections (called on application shutdown)."""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -20,3 +79,13 @@ def get_db():
     finally:
         db.close()
 
+
+def get_session_factory() -> sessionmaker:
+    """Dependency giving the sync session factory, for work that outlives the request session."""
+    return SessionLocal
+
+
+async def get_async_db():
+    """Dependency yielding an AsyncSession for code that must stay on the event loop."""
+    async with get_async_sessionmaker()() as db:
+        yield db
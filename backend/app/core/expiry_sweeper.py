@@ -0,0 +1,44 @@
+"""Registry of sweeps that clear out expired time-limited data."""
+from typing import Callable, Dict, Optional
+from sqlalchemy.orm import Session
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ExpirySweeper:
+    """
+    Runs every registered sweep and reports how many items each one cleared.
+
+    A sweep is a callable taking a Session and returning the number of rows
+    (or in-memory entries) it expired or deleted. Sweeps run in registration
+    order; one failing does not stop the others. The sweeper itself is meant
+    to be the task of a PeriodicJob.
+    """
+
+    def __init__(self):
+        self._sweeps: Dict[str, Callable[[Session], int]] = {}
+
+    def register(self, name: str, sweep: Callable[[Session], int]):
+        """Add a sweep under a name used in the report."""
+        if name in self._sweeps:
+            raise ValueError(f"Sweep {name} is already registered")
+        self._sweeps[name] = sweep
+
+    def __call__(self, db: Session) -> Dict[str, Optional[int]]:
+        """Run all sweeps. Failed sweeps are reported as None."""
+        report = {}
+        for name, sweep in self._sweeps.items():
+            try:
+                report[name] = sweep(db)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Expiry sweep {name} failed: {e}")
+                report[name] = None
+        return report
+
+    def __len__(self) -> int:
+        return len(self._sweeps)
+
+
+expiry_sweeper = ExpirySweeper()
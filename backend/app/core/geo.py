@@ -0,0 +1,70 @@
+"""Geodesic helpers shared by location, shake and meeting code."""
+from math import asin, atan2, cos, degrees, radians, sin, sqrt
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+EARTH_RADIUS_M = 6371000
+METERS_PER_DEGREE_LAT = 111320.0
+
+
+def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distance in meters between two points."""
+    delta_lat = radians(lat2 - lat1)
+    delta_lon = radians(lon2 - lon1)
+    a = sin(delta_lat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(delta_lon / 2) ** 2
+    return EARTH_RADIUS_M * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+def haversine_distances(latitude: float, longitude: float,
+                        latitudes: Sequence[float], longitudes: Sequence[float]) -> List[float]:
+    """
+    Distances in meters from one point to many, in one pass. The origin's
+    trigonometry is computed once instead of per pair.
+    """
+    lat1 = radians(latitude)
+    lon1 = radians(longitude)
+    cos_lat1 = cos(lat1)
+    distances = []
+    for lat2, lon2 in zip(latitudes, longitudes):
+        lat2 = radians(lat2)
+        a = sin((lat2 - lat1) / 2) ** 2 + cos_lat1 * cos(lat2) * sin((radians(lon2) - lon1) / 2) ** 2
+        distances.append(EARTH_RADIUS_M * 2 * atan2(sqrt(a), sqrt(1 - a)))
+    return distances
+
+
+def degree_deltas(latitude: float, radius_m: float) -> Tuple[float, Optional[float]]:
+    """
+    Half-height and half-width in degrees of the smallest latitude/longitude
+    box holding every point within radius_m of a point at this latitude.
+    The half-width is None when the circle reaches a pole, i.e. the box spans
+    every longitude.
+    """
+    angular = radius_m / EARTH_RADIUS_M
+    lat_delta = degrees(angular)
+    lat = radians(latitude)
+    if abs(latitude) + lat_delta >= 90.0:
+        return lat_delta, None
+    # Widest point of a spherical cap is asin(sin(r) / cos(lat)) from its centre
+    ratio = sin(angular) / cos(lat)
+    if ratio >= 1.0:
+        return lat_delta, None
+    return lat_delta, degrees(asin(ratio))
+
+
+def centroid(points: Iterable[Tuple[float, float]]) -> Tuple[float, float]:
+    """
+    Geographic centre of (latitude, longitude) points. Averages on the unit
+    sphere, so points on both sides of the antimeridian meet near it rather
+    than on the other side of the world.
+    """
+    x = y = z = 0.0
+    count = 0
+    for latitude, longitude in points:
+        lat, lon = radians(latitude), radians(longitude)
+        x += cos(lat) * cos(lon)
+        y += cos(lat) * sin(lon)
+        z += sin(lat)
+        count += 1
+    if not count:
+        raise ValueError("centroid of no points")
+    x, y, z = x / count, y / count, z / count
+    return degrees(atan2(z, sqrt(x * x + y * y))), degrees(atan2(y, x))
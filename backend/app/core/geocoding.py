@@ -0,0 +1,211 @@
+"""Reverse geocoding off the request path, with a coordinate-keyed cache."""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+import threading
+import time
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodingProvider(ABC):
+    """Turns coordinates into a human-readable address. May block."""
+
+    @abstractmethod
+    def reverse(self, latitude: float, longitude: float) -> Optional[str]:
+        """The address at the coordinates, None when there is none."""
+
+
+class NominatimProvider(GeocodingProvider):
+    """OpenStreetMap Nominatim reverse geocoding over HTTP."""
+
+    def __init__(self, base_url: str, user_agent: str = "MeetUpApp/1.0", timeout_seconds: float = 2.0):
+        self.base_url = base_url.rstrip("/")
+        self.user_agent = user_agent
+        self.timeout_seconds = timeout_seconds
+
+    def reverse(self, latitude: float, longitude: float) -> Optional[str]:
+        import requests
+
+        response = requests.get(
+            f"{self.base_url}/reverse",
+            params={"format": "json", "lat": latitude, "lon": longitude, "zoom": 18, "addressdetails": 1},
+            headers={"User-Agent": self.user_agent},
+            timeout=self.timeout_seconds
+        )
+        if response.status_code != 200:
+            return None
+
+        addr = response.json().get("address")
+        if not addr:
+            return None
+        parts = []
+        if "road" in addr:
+            parts.append(addr["road"])
+        if "house_number" in addr:
+            parts.insert(0, addr["house_number"])
+        city = addr.get("city") or addr.get("town") or addr.get("village")
+        if city:
+            parts.append(city)
+        return ", ".join(parts) if parts else None
+
+
+class StaticGeocodingProvider(GeocodingProvider):
+    """
+    Local stand-in that never leaves the process: returns a fixed address
+    (None disables geocoding) and counts lookups.
+    """
+
+    def __init__(self, address: Optional[str] = None):
+        self.address = address
+        self.calls = 0
+
+    def reverse(self, latitude: float, longitude: float) -> Optional[str]:
+        self.calls += 1
+        return self.address
+
+
+class GeocodingCache:
+    """Thread-safe LRU cache with per-entry TTL, keyed by rounded coordinates."""
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 86400.0, precision: int = 4):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.precision = precision
+        self._lock = threading.Lock()
+        # Map: rounded (lat, lon) -> (address, stored at monotonic time)
+        self._entries: "OrderedDict[Tuple[float, float], Tuple[Optional[str], float]]" = OrderedDict()
+
+    def key(self, latitude: float, longitude: float) -> Tuple[float, float]:
+        return round(latitude, self.precision), round(longitude, self.precision)
+
+    def get(self, latitude: float, longitude: float) -> Tuple[bool, Optional[str]]:
+        """Returns (hit, address). A cached None means the provider found nothing."""
+        key = self.key(latitude, longitude)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            address, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, address
+
+    def put(self, latitude: float, longitude: float, address: Optional[str]):
+        key = self.key(latitude, longitude)
+        with self._lock:
+            self._entries[key] = (address, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ReverseGeocoder:
+    """
+    Resolves addresses on a small thread pool so callers never wait on the
+    provider. Lookups for the same rounded coordinates share one provider call
+    while it is in flight, and results (including misses) are cached.
+    With max_workers=0 lookups run inline, which tests use for determinism.
+    """
+
+    def __init__(self, provider: GeocodingProvider, cache: GeocodingCache, max_workers: int = 4):
+        self.provider = provider
+        self.cache = cache
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.RLock()
+        # Map: cache key -> Future of the provider call in flight
+        self._in_flight: Dict[Tuple[float, float], Future] = {}
+
+    def cached(self, latitude: float, longitude: float) -> Optional[str]:
+        """Address from the cache only; never calls the provider."""
+        return self.cache.get(latitude, longitude)[1]
+
+    def resolve(self, latitude: float, longitude: float,
+                on_resolved: Optional[Callable[[Optional[str]], None]] = None) -> Future:
+        """
+        Look up an address in the background. on_resolved(address) runs on the
+        worker thread once the address is known (address is None on failure).
+        """
+        hit, address = self.cache.get(latitude, longitude)
+        if hit:
+            future = Future()
+            future.set_result(address)
+        else:
+            key = self.cache.key(latitude, longitude)
+            with self._lock:
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = self._submit(self._lookup, key, latitude, longitude)
+                    if not future.done():
+                        self._in_flight[key] = future
+
+        if on_resolved:
+            future.add_done_callback(lambda done: self._notify(on_resolved, done))
+        return future
+
+    def _submit(self, fn, *args) -> Future:
+        if self.max_workers <= 0:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="geocoding")
+        return self._executor.submit(fn, *args)
+
+    def _lookup(self, key: Tuple[float, float], latitude: float, longitude: float) -> Optional[str]:
+        try:
+            address = self.provider.reverse(latitude, longitude)
+            self.cache.put(latitude, longitude, address)
+            return address
+        except Exception as e:
+            logger.warning(f"Reverse geocoding failed for ({latitude}, {longitude}): {e}")
+            # Not cached, so the next lookup retries
+            return None
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _notify(self, on_resolved: Callable[[Optional[str]], None], future: Future):
+        try:
+            on_resolved(future.result())
+        except Exception as e:
+            logger.error(f"Reverse geocoding callback failed: {e}")
+
+    def shutdown(self):
+        """Wait for lookups in flight and stop the worker threads."""
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def _build_provider() -> GeocodingProvider:
+    if settings.GEOCODING_PROVIDER == "nominatim":
+        return NominatimProvider(settings.GEOCODING_NOMINATIM_URL, timeout_seconds=settings.GEOCODING_TIMEOUT_SECONDS)
+    return StaticGeocodingProvider()
+
+
+reverse_geocoder = ReverseGeocoder(
+    provider=_build_provider(),
+    cache=GeocodingCache(
+        max_size=settings.GEOCODING_CACHE_SIZE,
+        ttl_seconds=settings.GEOCODING_CACHE_TTL_SECONDS,
+        precision=settings.GEOCODING_CACHE_PRECISION
+    ),
+    max_workers=settings.GEOCODING_MAX_WORKERS
+)
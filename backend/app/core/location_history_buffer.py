@@ -0,0 +1,130 @@
+"""Write-behind buffer for location history rows."""
+from typing import Callable, List, Optional
+import threading
+import logging
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.repositories.location_repository import LocationRepository
+
+logger = logging.getLogger(__name__)
+
+
+class LocationHistoryBuffer:
+    """
+    Collects location history rows in memory and writes them in batches.
+
+    Rows are flushed by a background thread when `flush_size` rows are pending
+    or every `flush_interval_seconds`, whichever comes first, and once more on
+    stop(). While the buffer is not running (or `max_pending` rows are already
+    waiting) add() returns False and the caller writes the row synchronously.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = SessionLocal,
+        flush_size: int = 500,
+        flush_interval_seconds: float = 2.0,
+        max_pending: int = 50000
+    ):
+        self.session_factory = session_factory
+        self.flush_size = flush_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max_pending
+        self._pending: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.flushed_count = 0
+        self.failed_flushes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self):
+        """Start the background flusher thread."""
+        if self._running:
+            return
+        self._running = True
+        self._wakeup.clear()
+        self._thread = threading.Thread(target=self._run, name="location-history-buffer", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Location history buffer started (flush_size={self.flush_size}, "
+            f"interval={self.flush_interval_seconds}s)"
+        )
+
+    def stop(self):
+        """Stop the flusher thread and write every pending row."""
+        if not self._running:
+            return
+        self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        if self._pending:
+            logger.error(f"Location history buffer stopped with {len(self._pending)} unwritten rows")
+
+    def add(self, row: dict) -> bool:
+        """Queue a history row. Returns False if the caller must write it itself."""
+        if not self._running:
+            return False
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                return False
+            self._pending.append(row)
+            should_flush = len(self._pending) >= self.flush_size
+        if should_flush:
+            self._wakeup.set()
+        return True
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Write all pending rows in one transaction. Returns number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+
+            db = self.session_factory()
+            try:
+                written = LocationRepository(db).add_location_history_rows(rows)
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.error(f"Failed to flush {len(rows)} location history rows: {e}")
+                with self._lock:
+                    # Put rows back in front so they are retried in order
+                    self._pending = rows + self._pending
+                    dropped = len(self._pending) - self.max_pending
+                    if dropped > 0:
+                        del self._pending[self.max_pending:]
+                        logger.error(f"Dropped {dropped} location history rows, buffer is full")
+                return 0
+            finally:
+                db.close()
+
+            self.flushed_count += written
+            return written
+
+    def _run(self):
+        while self._running:
+            self._wakeup.wait(self.flush_interval_seconds)
+            self._wakeup.clear()
+            if not self._running:
+                break
+            self.flush()
+
+
+location_history_buffer = LocationHistoryBuffer(
+    flush_size=settings.LOCATION_HISTORY_FLUSH_SIZE,
+    flush_interval_seconds=settings.LOCATION_HISTORY_FLUSH_INTERVAL_SECONDS,
+    max_pending=settings.LOCATION_HISTORY_BUFFER_MAX_PENDING
+)
@@ -0,0 +1,178 @@
+"""In-memory spatial index of users' latest locations."""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from math import floor
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import threading
+import logging
+from app.core.config import settings
+from app.core.geo import degree_deltas, haversine_distances
+
+logger = logging.getLogger(__name__)
+
+
+class LocationIndex:
+    """
+    Process-level uniform grid of every user's current location.
+
+    Entries are kept current by LocationService.update_location. Because each
+    worker process has its own index, it is also re-synced from `user_locations`
+    (rows changed since the last sync) at most every `refresh_seconds`, which
+    bounds how stale a position written through another worker can be.
+    """
+
+    def __init__(self, cell_size_deg: float = 0.01, refresh_seconds: float = 5.0):
+        self.cell_size_deg = cell_size_deg
+        self.refresh_seconds = refresh_seconds
+        self._lon_cells = int(round(360.0 / cell_size_deg))
+        self._lock = threading.RLock()
+        # Map: user_id -> location entry
+        self._entries: Dict[int, dict] = {}
+        # Map: (lat_cell, lon_cell) -> Set of user_ids
+        self._cells: Dict[Tuple[int, int], Set[int]] = defaultdict(set)
+        self._synced_at: Optional[datetime] = None
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (
+            floor(lat / self.cell_size_deg),
+            floor((lon + 180.0) / self.cell_size_deg) % self._lon_cells
+        )
+
+    def upsert(self, user_id: int, latitude: float, longitude: float,
+               accuracy_m: Optional[str], updated_at: datetime) -> bool:
+        """Insert or move a user's entry. Older data never overwrites newer data."""
+        with self._lock:
+            existing = self._entries.get(user_id)
+            if existing:
+                if updated_at and existing["updated_at"] and updated_at < existing["updated_at"]:
+                    return False
+                self._remove_from_cell(user_id, existing)
+
+            entry = {
+                "user_id": user_id,
+                "latitude": latitude,
+                "longitude": longitude,
+                "accuracy_m": accuracy_m,
+                "updated_at": updated_at,
+            }
+            self._entries[user_id] = entry
+            self._cells[self._cell(latitude, longitude)].add(user_id)
+            return True
+
+    def remove(self, user_id: int):
+        """Remove a user from the index."""
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+            if entry:
+                self._remove_from_cell(user_id, entry)
+
+    def _remove_from_cell(self, user_id: int, entry: dict):
+        cell = self._cell(entry["latitude"], entry["longitude"])
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(user_id)
+            if not members:
+                del self._cells[cell]
+
+    def get(self, user_id: int) -> Optional[dict]:
+        """Get a user's indexed location."""
+        with self._lock:
+            return self._entries.get(user_id)
+
+    def get_many(self, user_ids: Iterable[int]) -> Dict[int, dict]:
+        """Get indexed locations for several users."""
+        with self._lock:
+            return {
+                user_id: self._entries[user_id]
+                for user_id in user_ids
+                if user_id in self._entries
+            }
+
+    def nearby(self, latitude: float, longitude: float, radius_m: float,
+               user_ids: Optional[Set[int]] = None) -> List[Tuple[dict, float]]:
+        """
+        Find indexed users within radius_m of a point, closest first.
+        If user_ids is given, only those users are considered.
+        """
+        lat_delta, lon_delta = degree_deltas(latitude, radius_m)
+        if lon_delta is None:
+            lon_span = self._lon_cells  # Near the poles: scan the whole ring
+        else:
+            lon_span = int(lon_delta / self.cell_size_deg) + 1
+
+        lat_min_cell, _ = self._cell(max(-90.0, latitude - lat_delta), longitude)
+        lat_max_cell, _ = self._cell(min(90.0, latitude + lat_delta), longitude)
+        _, lon_center_cell = self._cell(latitude, longitude)
+
+        if lon_span * 2 + 1 >= self._lon_cells:
+            lon_cells = range(self._lon_cells)
+        else:
+            lon_cells = [
+                (lon_center_cell + offset) % self._lon_cells
+                for offset in range(-lon_span, lon_span + 1)
+            ]
+
+        candidates = []
+        with self._lock:
+            for lat_cell in range(lat_min_cell, lat_max_cell + 1):
+                for lon_cell in lon_cells:
+                    for user_id in self._cells.get((lat_cell, lon_cell), ()):
+                        if user_ids is not None and user_id not in user_ids:
+                            continue
+                        candidates.append(self._entries[user_id])
+
+        distances = haversine_distances(
+            latitude, longitude,
+            [entry["latitude"] for entry in candidates],
+            [entry["longitude"] for entry in candidates]
+        )
+        results = [(entry, distance) for entry, distance in zip(candidates, distances) if distance <= radius_m]
+        results.sort(key=lambda item: item[1])
+        return results
+
+    def refresh_if_stale(self, fetch_changed: Callable[[Optional[datetime]], Iterable]):
+        """
+        Sync the index from the database when it has never been loaded or the
+        refresh interval has passed. fetch_changed(since) must return UserLocation
+        rows updated at or after `since` (all rows when since is None).
+        """
+        now = datetime.utcnow()
+        with self._lock:
+            synced_at = self._synced_at
+            if synced_at and (now - synced_at).total_seconds() < self.refresh_seconds:
+                return
+            # Claim this refresh so concurrent readers keep serving from memory
+            self._synced_at = now
+
+        # Overlap the window so rows committed while the last sync ran are not missed
+        since = synced_at - timedelta(seconds=self.refresh_seconds) if synced_at else None
+        try:
+            rows = fetch_changed(since)
+        except Exception:
+            with self._lock:
+                self._synced_at = synced_at
+            raise
+
+        count = 0
+        for row in rows:
+            if self.upsert(row.user_id, row.latitude, row.longitude, row.accuracy_m, row.updated_at):
+                count += 1
+
+        if synced_at is None:
+            logger.info(f"Location index loaded with {count} users")
+
+    def clear(self):
+        """Drop all entries and force a full reload on next refresh."""
+        with self._lock:
+            self._entries.clear()
+            self._cells.clear()
+            self._synced_at = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+location_index = LocationIndex(
+    cell_size_deg=settings.LOCATION_INDEX_CELL_SIZE_DEG,
+    refresh_seconds=settings.LOCATION_INDEX_REFRESH_SECONDS
+)
@@ -0,0 +1,115 @@
+"""WebSocket subscriptions to friends' live locations."""
+from fastapi import WebSocket
+from typing import Dict, List, Optional, Set
+from collections import defaultdict
+import asyncio
+import threading
+import json
+import logging
+from app.core.config import settings
+from app.core.outbound import OutboundQueues
+
+logger = logging.getLogger(__name__)
+
+
+class LocationSubscriptionManager:
+    """
+    Tracks which users have a live location socket open and pushes friends'
+    location updates to them.
+
+    Connections are registered from the event loop while publish() is called
+    from request handlers running in the threadpool, so the maps are guarded
+    by a lock and delivery is scheduled back onto the loop that owns the sockets.
+    There each socket has its own bounded queue and writer (OutboundQueues),
+    so one slow client does not delay the others.
+    """
+
+    def __init__(self, queue_size: int = 256, overflow_policy: str = "disconnect",
+                 send_timeout_seconds: float = 10.0):
+        # Map: user_id -> Set of WebSocket connections
+        self.active_connections: Dict[int, Set[WebSocket]] = defaultdict(set)
+        # Map: WebSocket -> (user_id, close_friends_only)
+        self.connection_info: Dict[WebSocket, tuple] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.outbound = OutboundQueues(self.disconnect, queue_size, overflow_policy, send_timeout_seconds)
+
+    def connect(self, websocket: WebSocket, user_id: int, close_friends_only: bool = False):
+        """Register an accepted WebSocket for a user."""
+        self._loop = asyncio.get_running_loop()
+        with self._lock:
+            self.active_connections[user_id].add(websocket)
+            self.connection_info[websocket] = (user_id, close_friends_only)
+        self.outbound.open(websocket, user_id)
+        logger.info(f"User {user_id} subscribed to friend locations")
+
+    def disconnect(self, websocket: WebSocket):
+        """Forget a WebSocket. Runs on the event loop."""
+        self.outbound.close(websocket)
+        with self._lock:
+            info = self.connection_info.pop(websocket, None)
+            if not info:
+                return
+            user_id = info[0]
+            connections = self.active_connections.get(user_id)
+            if connections is not None:
+                connections.discard(websocket)
+                if not connections:
+                    del self.active_connections[user_id]
+
+    def subscribed_user_ids(self) -> Set[int]:
+        """IDs of users with at least one open location socket."""
+        with self._lock:
+            return set(self.active_connections)
+
+    def publish(self, message: dict, recipients: Dict[int, bool]):
+        """
+        Push a message to the sockets of the given recipients without blocking.
+        recipients maps user_id -> whether the sender is their close friend;
+        sockets subscribed with close_friends_only skip non-close friends.
+        """
+        targets = []
+        with self._lock:
+            for user_id, is_close_friend in recipients.items():
+                for websocket in self.active_connections.get(user_id, ()):
+                    _, close_friends_only = self.connection_info[websocket]
+                    if close_friends_only and not is_close_friend:
+                        continue
+                    targets.append(websocket)
+
+        if not targets or not self._loop or self._loop.is_closed():
+            return
+
+        message_json = json.dumps(message, default=str)
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._deliver(targets, message_json)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, targets, message_json)
+
+    def send(self, websocket: WebSocket, message: dict) -> bool:
+        """Queue a frame for one connected socket. False if it was not queued."""
+        return self.outbound.enqueue(websocket, json.dumps(message, default=str))
+
+    def _deliver(self, targets: List[WebSocket], message_json: str):
+        for websocket in targets:
+            self.outbound.enqueue(websocket, message_json)
+
+    async def flush(self):
+        """Wait until every location queued so far has been sent (or dropped)."""
+        await self.outbound.flush()
+
+    def get_connection_count(self, user_id: int) -> int:
+        """Get number of open location sockets for a user."""
+        with self._lock:
+            return len(self.active_connections.get(user_id, set()))
+
+
+location_subscriptions = LocationSubscriptionManager(
+    queue_size=settings.CHAT_OUTBOUND_QUEUE_SIZE,
+    overflow_policy=settings.CHAT_OUTBOUND_OVERFLOW_POLICY,
+    send_timeout_seconds=settings.CHAT_SEND_TIMEOUT_SECONDS
+)
@@ -0,0 +1,37 @@
+"""Process-level counters for location update writes."""
+import threading
+
+
+class LocationWriteStats:
+    """Counts location updates that were written versus suppressed as stationary."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.written = 0
+        self.suppressed = 0
+
+    def record_written(self):
+        with self._lock:
+            self.written += 1
+
+    def record_suppressed(self):
+        with self._lock:
+            self.suppressed += 1
+
+    def snapshot(self) -> dict:
+        """Current counts and the share of updates that were suppressed."""
+        with self._lock:
+            total = self.written + self.suppressed
+            return {
+                "written": self.written,
+                "suppressed": self.suppressed,
+                "suppressed_ratio": round(self.suppressed / total, 4) if total else 0.0
+            }
+
+    def reset(self):
+        with self._lock:
+            self.written = 0
+            self.suppressed = 0
+
+
+location_write_stats = LocationWriteStats()
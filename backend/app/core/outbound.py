@@ -0,0 +1,126 @@
+"""Bounded per-socket send queues shared by the WebSocket managers."""
+from fastapi import WebSocket
+from typing import Callable, Dict, Optional, Set
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# What to do with a frame for a socket whose outbound queue is full
+OVERFLOW_POLICIES = ("disconnect", "drop_oldest", "drop_newest")
+
+
+class OutboundQueues:
+    """
+    Frames are never sent inline: each socket has a bounded outbound queue
+    drained by its own writer task, so broadcasting only enqueues and a slow
+    client cannot hold up the others. When a queue is full, overflow_policy
+    disconnects the socket (the client reconnects and reloads) or drops its
+    oldest or the new frame. A socket stuck on one send for
+    send_timeout_seconds is disconnected.
+
+    on_disconnect is the owning manager's disconnect(); it is called for
+    sockets dropped here and must in turn call close(). All methods run on
+    the event loop.
+    """
+
+    def __init__(
+        self,
+        on_disconnect: Callable[[WebSocket], None],
+        queue_size: int = 256,
+        overflow_policy: str = "disconnect",
+        send_timeout_seconds: float = 10.0
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy!r}")
+        self.on_disconnect = on_disconnect
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.send_timeout_seconds = send_timeout_seconds
+        # Map: WebSocket -> queue of serialized frames waiting to be sent
+        self.queues: Dict[WebSocket, asyncio.Queue] = {}
+        # Map: WebSocket -> task draining its outbound queue
+        self.writer_tasks: Dict[WebSocket, asyncio.Task] = {}
+        # Map: WebSocket -> user_id, for log messages
+        self.owners: Dict[WebSocket, int] = {}
+        # Close handshakes of sockets disconnected for being too slow
+        self._closing: Set[asyncio.Task] = set()
+        self.dropped_frames = 0
+
+    def open(self, websocket: WebSocket, user_id: int):
+        """Give a socket its queue and start its writer."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.queues[websocket] = queue
+        self.owners[websocket] = user_id
+        self.writer_tasks[websocket] = asyncio.create_task(self._write(websocket, queue))
+
+    def close(self, websocket: WebSocket):
+        """Stop a socket's writer and discard the frames it still had queued."""
+        self.owners.pop(websocket, None)
+        writer = self.writer_tasks.pop(websocket, None)
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+        queue = self.queues.pop(websocket, None)
+        # Frames that will never be sent no longer hold up flush()
+        while queue is not None and not queue.empty():
+            queue.get_nowait()
+            queue.task_done()
+
+    async def flush(self):
+        """Wait until every frame queued so far has been sent (or dropped)."""
+        await asyncio.gather(*(queue.join() for queue in list(self.queues.values())))
+
+    async def _write(self, websocket: WebSocket, queue: asyncio.Queue):
+        """Send a socket's queued frames in order until it goes away."""
+        while True:
+            message_json = await queue.get()
+            try:
+                await asyncio.wait_for(websocket.send_text(message_json), timeout=self.send_timeout_seconds)
+            except asyncio.TimeoutError:
+                queue.task_done()
+                logger.warning(f"Disconnecting WebSocket of user {self.owners.get(websocket)}: send timed out")
+                self._drop_connection(websocket, reason="Send timed out")
+                return
+            except Exception as e:
+                queue.task_done()
+                logger.error(f"Error sending to WebSocket: {e}")
+                self.on_disconnect(websocket)
+                return
+            queue.task_done()
+
+    def enqueue(self, websocket: WebSocket, message_json: str) -> bool:
+        """Queue a serialized frame for a socket. False if it was not queued."""
+        queue = self.queues.get(websocket)
+        if queue is None:
+            return False
+        try:
+            queue.put_nowait(message_json)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        self.dropped_frames += 1
+        if self.overflow_policy == "drop_newest":
+            return False
+        if self.overflow_policy == "drop_oldest":
+            queue.get_nowait()
+            queue.task_done()
+            queue.put_nowait(message_json)
+            return True
+        logger.warning(f"Disconnecting WebSocket of user {self.owners.get(websocket)}: outbound queue full")
+        self._drop_connection(websocket, reason="Too slow")
+        return False
+
+    def _drop_connection(self, websocket: WebSocket, reason: str):
+        """Forget a socket and close it in the background."""
+        self.on_disconnect(websocket)
+        task = asyncio.create_task(self._close(websocket, reason))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, websocket: WebSocket, reason: str):
+        try:
+            # 1013: try again later
+            await asyncio.wait_for(websocket.close(code=1013, reason=reason), timeout=self.send_timeout_seconds)
+        except Exception:
+            pass
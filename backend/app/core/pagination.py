@@ -0,0 +1,23 @@
+"""Opaque cursors for keyset pagination."""
+import base64
+import binascii
+import json
+from app.core.exceptions import ValidationError
+
+
+def encode_cursor(values: dict) -> str:
+    """Encode the sort key of the last returned row as an opaque URL-safe cursor."""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode a cursor produced by encode_cursor. Raises ValidationError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise ValidationError("Invalid pagination cursor")
+    if not isinstance(values, dict):
+        raise ValidationError("Invalid pagination cursor")
+    return values
@@ -0,0 +1,143 @@
+"""Publish/subscribe backends fanning chat events out across worker processes."""
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, List, Optional
+import asyncio
+import json
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[dict], Awaitable[None]]
+
+
+class BroadcastBackend(ABC):
+    """
+    Carries messages published by one worker to the subscribers of every
+    worker. Subscribers also receive their own worker's messages; callers tag
+    messages with an origin to skip those.
+    """
+
+    @abstractmethod
+    async def subscribe(self, handler: MessageHandler):
+        """Start calling handler(message) for every message published."""
+
+    @abstractmethod
+    async def publish(self, message: dict):
+        """Send message to the subscribers of every worker."""
+
+    @abstractmethod
+    async def close(self):
+        """Stop receiving and release connections."""
+
+
+class InProcessBroadcastBackend(BroadcastBackend):
+    """
+    Backend for a single process: delivers to subscribers in the same
+    process only. Sharing one instance between managers lets tests stand in
+    for several workers.
+    """
+
+    def __init__(self):
+        self._handlers: List[MessageHandler] = []
+
+    async def subscribe(self, handler: MessageHandler):
+        self._handlers.append(handler)
+
+    async def publish(self, message: dict):
+        for handler in list(self._handlers):
+            try:
+                await handler(message)
+            except Exception as e:
+                logger.error(f"Broadcast handler failed: {e}")
+
+    async def close(self):
+        self._handlers.clear()
+
+
+class RedisBroadcastBackend(BroadcastBackend):
+    """
+    Fans messages out through Redis PUBLISH and SUBSCRIBE on one channel,
+    using redis.asyncio (the `redis` package, only needed for this backend).
+    The URL takes everything redis-py does: redis:// or rediss:// (TLS),
+    username and password for ACL authentication, and the database index.
+
+    The subscriber reconnects on its own after the connection drops, waiting
+    reconnect_delay_seconds and doubling up to max_reconnect_delay_seconds.
+    Redis pub/sub keeps no backlog: messages published while a subscriber is
+    disconnected are lost to it.
+    """
+
+    def __init__(self, url: str, channel: str, connect_timeout_seconds: float = 1.0,
+                 reconnect_delay_seconds: float = 1.0, max_reconnect_delay_seconds: float = 30.0):
+        from redis import asyncio as redis_asyncio
+
+        self.channel = channel
+        self.reconnect_delay_seconds = reconnect_delay_seconds
+        self.max_reconnect_delay_seconds = max_reconnect_delay_seconds
+        # RESP2 is all pub/sub needs and every Redis version speaks it
+        self._redis = redis_asyncio.Redis.from_url(url, socket_connect_timeout=connect_timeout_seconds, protocol=2)
+        self._handler: Optional[MessageHandler] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._subscribed = asyncio.Event()
+
+    async def subscribe(self, handler: MessageHandler):
+        self._handler = handler
+        self._subscribed = asyncio.Event()
+        self._reader_task = asyncio.create_task(self._listen())
+
+    async def wait_until_subscribed(self, timeout: float):
+        """Block until the subscriber connection is up (mainly for tests)."""
+        await asyncio.wait_for(self._subscribed.wait(), timeout=timeout)
+
+    async def _listen(self):
+        delay = self.reconnect_delay_seconds
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                self._subscribed.set()
+                delay = self.reconnect_delay_seconds
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        await self._dispatch(message["data"])
+                raise ConnectionError("Subscription ended")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Connection loss and error replies alike: resubscribe after a growing delay
+                self._subscribed.clear()
+                logger.warning(f"Broadcast subscriber lost {self.channel!r}, retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay_seconds)
+            finally:
+                await pubsub.aclose()
+
+    async def _dispatch(self, payload: bytes):
+        try:
+            await self._handler(json.loads(payload))
+        except Exception as e:
+            logger.error(f"Broadcast handler failed: {e}")
+
+    async def publish(self, message: dict):
+        """Publish to the channel; raises redis.exceptions.RedisError when Redis cannot be reached."""
+        await self._redis.publish(self.channel, json.dumps(message, default=str))
+
+    async def close(self):
+        if self._reader_task:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+        await self._redis.aclose()
+
+
+def build_broadcast_backend() -> BroadcastBackend:
+    """The broadcast backend selected by CHAT_BROADCAST_BACKEND."""
+    if settings.CHAT_BROADCAST_BACKEND == "redis":
+        return RedisBroadcastBackend(settings.CHAT_BROADCAST_URL, settings.CHAT_BROADCAST_CHANNEL)
+    if settings.CHAT_BROADCAST_BACKEND == "memory":
+        return InProcessBroadcastBackend()
+    raise ValueError(f"Unknown CHAT_BROADCAST_BACKEND: {settings.CHAT_BROADCAST_BACKEND!r}")
@@ -0,0 +1,528 @@
+"""In-memory matchmaking of concurrent shakes."""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from math import ceil, log
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+import asyncio
+import heapq
+import secrets
+import threading
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+from app.core.config import settings
+from app.core.geo import degree_deltas, haversine_distances
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+MIN_ACCURACY_M = 1.0  # Reported accuracies below this are treated as this
+SESSION_ID_BITS = 53  # Random session IDs stay exact as JavaScript numbers
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int) -> str:
+    """Standard base-32 geohash of a point."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """(height, width) in degrees of a geohash cell at this precision."""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def parse_accuracy(accuracy_m: Optional[str], default_m: float) -> float:
+    """Accuracy radius in meters from the client's string; default_m when missing or malformed."""
+    try:
+        value = float(accuracy_m)
+    except (TypeError, ValueError):
+        return default_m
+    if value != value or value <= 0:  # NaN or non-positive
+        return default_m
+    return max(value, MIN_ACCURACY_M)
+
+
+def match_scores(
+    distances_m: Sequence[float],
+    own_accuracy_m: float,
+    accuracies_m: Sequence[float],
+    time_deltas_s: Sequence[float],
+    spread_m: float,
+    time_scale_s: float
+) -> List[float]:
+    """
+    Score candidates for a shake in one pass over parallel columns; lower is better.
+
+    The score is the negative log-likelihood (up to a constant) that two
+    shakes come from people standing together at the same moment: the
+    distance between the fixes is weighed against both accuracy radii plus
+    spread_m (how far apart people shaking together usually are), so a far
+    fix with a tight accuracy loses to a closer or fuzzier one, while a
+    fuzzy fix pays for its uncertainty through the log term. The shake-time
+    difference adds a Gaussian penalty with scale time_scale_s.
+    """
+    base_variance = own_accuracy_m * own_accuracy_m + spread_m * spread_m
+    time_weight = 1.0 / (2.0 * time_scale_s * time_scale_s) if time_scale_s > 0 else 0.0
+    scores = []
+    for distance, accuracy, time_delta in zip(distances_m, accuracies_m, time_deltas_s):
+        variance = base_variance + accuracy * accuracy
+        scores.append(distance * distance / (2.0 * variance) + log(variance) + time_delta * time_delta * time_weight)
+    return scores
+
+
+def new_session_id() -> int:
+    """
+    Random shake session ID. Unlike a per-process counter, IDs from different
+    processes or restarts do not collide in practice.
+    """
+    return secrets.randbits(SESSION_ID_BITS) or 1
+
+
+def claim_single_process(lock_path: str):
+    """
+    Make this process the only one serving shakes on this host, for as long
+    as it runs: pending shakes wait in this process's matcher only, so shakes
+    landing on different worker processes would never meet.
+
+    Takes an exclusive lock on lock_path, which every worker started by
+    `uvicorn --workers N` or `gunicorn -w N` competes for; all but the first
+    fail with RuntimeError. Returns the open lock file; closing it (or the
+    process exiting) releases the lock.
+    """
+    handle = open(lock_path, "a")
+    if fcntl is None:
+        return handle
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        handle.close()
+        raise RuntimeError(
+            f"Another process holds {lock_path}: the shake matcher keeps pending shakes in "
+            f"process memory and cannot match across worker processes; run a single worker"
+        )
+    return handle
+
+
+@dataclass
+class PendingShake:
+    """A shake waiting for a partner."""
+    session_id: int
+    user_id: int
+    latitude: float
+    longitude: float
+    accuracy_m: Optional[str]
+    friend_ids: FrozenSet[int]
+    created_at: datetime
+    expires_at: datetime
+    geohash: str = field(default="", compare=False)
+    group: bool = False  # Waiting to be clustered with every friend nearby, not just one
+    shaken_at: Optional[datetime] = field(default=None, compare=False)  # Latest shake, moves included
+    record_id: Optional[int] = field(default=None, compare=False)  # shake_sessions row, if the store keeps one
+
+
+class ShakeMatcher:
+    """
+    Process-level registry of pending shakes, bucketed by geohash.
+
+    Each pending shake lives in the bucket of its geohash cell until it is
+    matched or its TTL passes. Matching only looks at the cells around the
+    shaker, and the shaker's friend IDs are kept with the entry, so finding a
+    partner needs no database access. Expired entries are evicted from a
+    min-heap of expiry times on every call.
+
+    Match results for the partner of a match are handed to a request waiting
+    in wait_for_match(), or kept for ttl_seconds for the partner's next call.
+    Between claim_match() and delivery both users are marked as claimed, so a
+    concurrent request from the partner waits for the result instead of
+    starting a second match.
+
+    Candidates within the radius are ranked by match_scores(), which weighs
+    distance against both fixes' accuracy and the time between the shakes.
+
+    Group shakes are matched separately from one-to-one shakes: claim_group()
+    clusters every group shake nearby whose users are all friends with each
+    other, once the cluster has had settle_seconds to gather.
+    """
+
+    def __init__(self, precision: int = 7, ttl_seconds: float = 15.0, default_accuracy_m: float = 20.0,
+                 spread_m: float = 10.0, time_scale_seconds: float = 3.0):
+        self.precision = precision
+        self.ttl_seconds = ttl_seconds
+        self.default_accuracy_m = default_accuracy_m
+        self.spread_m = spread_m
+        self.time_scale_seconds = time_scale_seconds
+        self._cell_height, self._cell_width = geohash_cell_size(precision)
+        self._lock = threading.RLock()
+        # Map: user_id -> pending shake
+        self._pending: Dict[int, PendingShake] = {}
+        # Map: geohash -> Set of user_ids
+        self._buckets: Dict[str, Set[int]] = defaultdict(set)
+        # Heap of (expires_at, session_id, user_id)
+        self._expiry: List[Tuple[datetime, int, int]] = []
+        # Map: user_id -> (event loop, future) of a request waiting for a match
+        self._waiters: Dict[int, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        # Map: user_id -> (match result, kept until)
+        self._results: Dict[int, Tuple[dict, datetime]] = {}
+        # Map: user_id -> Event set once the match claimed for the user is finalized
+        self._claims: Dict[int, threading.Event] = {}
+
+    def add(self, user_id: int, latitude: float, longitude: float, accuracy_m: Optional[str],
+            friend_ids: Iterable[int], now: Optional[datetime] = None, group: bool = False) -> PendingShake:
+        """Register a new pending shake for a user, replacing any previous one."""
+        now = now or datetime.utcnow()
+        with self._lock:
+            self._evict_expired(now)
+            self._remove(user_id)
+            shake = PendingShake(
+                session_id=new_session_id(),
+                user_id=user_id,
+                latitude=latitude,
+                longitude=longitude,
+                accuracy_m=accuracy_m,
+                friend_ids=frozenset(friend_ids),
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.ttl_seconds),
+                geohash=geohash_encode(latitude, longitude, self.precision),
+                group=group,
+                shaken_at=now
+            )
+            self._insert(shake)
+            return shake
+
+    def move(self, user_id: int, latitude: float, longitude: float,
+             accuracy_m: Optional[str] = None, now: Optional[datetime] = None) -> Optional[PendingShake]:
+        """Update the position of a user's pending shake, keeping its expiry."""
+        now = now or datetime.utcnow()
+        with self._lock:
+            self._evict_expired(now)
+            shake = self._pending.get(user_id)
+            if not shake:
+                return None
+            self._buckets_discard(shake)
+            shake.latitude = latitude
+            shake.longitude = longitude
+            if accuracy_m:
+                shake.accuracy_m = accuracy_m
+            shake.shaken_at = now
+            shake.geohash = geohash_encode(latitude, longitude, self.precision)
+            self._buckets[shake.geohash].add(user_id)
+            return shake
+
+    def get(self, user_id: int, now: Optional[datetime] = None) -> Optional[PendingShake]:
+        """Get a user's pending shake, if it has not expired."""
+        with self._lock:
+            self._evict_expired(now or datetime.utcnow())
+            return self._pending.get(user_id)
+
+    def nearby(self, latitude: float, longitude: float, radius_m: float,
+               user_ids: Optional[Set[int]] = None,
+               now: Optional[datetime] = None) -> List[Tuple[PendingShake, float]]:
+        """Pending shakes within radius_m of a point, closest first."""
+        with self._lock:
+            self._evict_expired(now or datetime.utcnow())
+            candidates = [
+                self._pending[user_id]
+                for geohash in self._cells_around(latitude, longitude, radius_m)
+                for user_id in self._buckets.get(geohash, ())
+                if user_ids is None or user_id in user_ids
+            ]
+            distances = haversine_distances(
+                latitude, longitude,
+                [shake.latitude for shake in candidates],
+                [shake.longitude for shake in candidates]
+            )
+        results = [(shake, distance) for shake, distance in zip(candidates, distances) if distance <= radius_m]
+        results.sort(key=lambda item: item[1])
+        return results
+
+    def ranked(self, shake: PendingShake, radius_m: float, group: bool,
+               now: Optional[datetime] = None) -> List[PendingShake]:
+        """
+        Friends' pending shakes of the same mode (group or not) within radius_m
+        of a shake, best match first by match_scores().
+        """
+        with self._lock:
+            candidates = [
+                candidate
+                for candidate in self.nearby(shake.latitude, shake.longitude, radius_m, set(shake.friend_ids), now)
+                if candidate[0].group == group
+            ]
+        if not candidates:
+            return []
+        shaken_at = shake.shaken_at or shake.created_at
+        scores = match_scores(
+            [distance for _, distance in candidates],
+            parse_accuracy(shake.accuracy_m, self.default_accuracy_m),
+            [parse_accuracy(candidate.accuracy_m, self.default_accuracy_m) for candidate, _ in candidates],
+            [((candidate.shaken_at or candidate.created_at) - shaken_at).total_seconds() for candidate, _ in candidates],
+            self.spread_m,
+            self.time_scale_seconds
+        )
+        order = sorted(range(len(candidates)), key=scores.__getitem__)
+        return [candidates[i][0] for i in order]
+
+    def claim_match(self, user_id: int, radius_m: float,
+                    now: Optional[datetime] = None) -> Optional[Tuple[PendingShake, PendingShake]]:
+        """
+        Find the best-scoring friend shaking within radius_m of the user's
+        pending shake and take both out of the registry in one step, so a
+        partner can never be matched twice. Returns (own shake, partner's shake) or None.
+        """
+        with self._lock:
+            now = now or datetime.utcnow()
+            shake = self.get(user_id, now)
+            if not shake or shake.group or not shake.friend_ids:
+                return None
+            candidates = self.ranked(shake, radius_m, group=False, now=now)
+            if not candidates:
+                return None
+            partner = candidates[0]
+            self._claim([shake, partner])
+            return shake, partner
+
+    def cluster(self, user_id: int, radius_m: float, max_size: int,
+                now: Optional[datetime] = None) -> List[PendingShake]:
+        """
+        The group a user's group shake would be matched into right now: the
+        user's shake first, then group shakes within radius_m of it whose users
+        are friends with every member already taken, best match first. Empty if
+        the user has no pending group shake.
+        """
+        with self._lock:
+            now = now or datetime.utcnow()
+            shake = self.get(user_id, now)
+            if not shake or not shake.group:
+                return []
+            members = [shake]
+            if not shake.friend_ids:
+                return members
+            # Friend sets travel with the shakes, so checking mutual friendship
+            # is a set lookup per member instead of a query per pair
+            for candidate in self.ranked(shake, radius_m, group=True, now=now):
+                if len(members) >= max_size:
+                    break
+                if all(member.user_id in candidate.friend_ids for member in members):
+                    members.append(candidate)
+            return members
+
+    def claim_group(self, user_id: int, radius_m: float, settle_seconds: float, max_size: int,
+                    now: Optional[datetime] = None) -> Optional[List[PendingShake]]:
+        """
+        Take the user's group (see cluster()) out of the registry in one step
+        once it has at least two members and either its oldest shake has waited
+        settle_seconds or it reached max_size. Until then the group keeps
+        gathering and None is returned.
+        """
+        with self._lock:
+            now = now or datetime.utcnow()
+            members = self.cluster(user_id, radius_m, max_size, now)
+            if len(members) < 2:
+                return None
+            oldest = min(member.created_at for member in members)
+            if len(members) < max_size and (now - oldest).total_seconds() < settle_seconds:
+                return None
+            self._claim(members)
+            return members
+
+    def is_claimed(self, user_id: int) -> bool:
+        """Whether a match involving the user is being finalized right now."""
+        with self._lock:
+            return user_id in self._claims
+
+    def wait_for_claim(self, user_id: int, timeout: float) -> Optional[dict]:
+        """
+        Block until the match claimed for the user is finalized, then take its
+        result. Returns None if there is no claim, it failed, or it timed out.
+        """
+        with self._lock:
+            event = self._claims.get(user_id)
+        if event:
+            event.wait(timeout)
+        return self.pop_result(user_id)
+
+    def release(self, user_ids: Iterable[int]):
+        """End the claims of these users, waking anyone blocked in wait_for_claim."""
+        with self._lock:
+            events = [self._claims.pop(user_id, None) for user_id in user_ids]
+        for event in events:
+            if event:
+                event.set()
+
+    def restore(self, shakes: Iterable[PendingShake], now: Optional[datetime] = None):
+        """Put claimed shakes back (e.g. when creating the meeting failed) if still live."""
+        now = now or datetime.utcnow()
+        shakes = list(shakes)
+        with self._lock:
+            for shake in shakes:
+                if shake.expires_at > now and shake.user_id not in self._pending:
+                    self._insert(shake)
+        self.release(shake.user_id for shake in shakes)
+
+    def deliver(self, user_id: int, result: dict, now: Optional[datetime] = None):
+        """
+        Hand a match result to the user: wake their waiting request if there is
+        one, otherwise keep it until they ask again. Safe to call from any thread.
+        """
+        now = now or datetime.utcnow()
+        with self._lock:
+            waiter = self._waiters.pop(user_id, None)
+            if not waiter:
+                self._results[user_id] = (result, now + timedelta(seconds=self.ttl_seconds))
+        if waiter:
+            loop, future = waiter
+            try:
+                loop.call_soon_threadsafe(self._resolve, user_id, future, result)
+            except RuntimeError:
+                # The waiter's loop is gone; keep the result for the next call
+                with self._lock:
+                    self._results[user_id] = (result, now + timedelta(seconds=self.ttl_seconds))
+        self.release([user_id])
+
+    def pop_result(self, user_id: int, now: Optional[datetime] = None) -> Optional[dict]:
+        """Take a match result delivered while the user was not waiting."""
+        with self._lock:
+            self._evict_expired(now or datetime.utcnow())
+            entry = self._results.pop(user_id, None)
+            return entry[0] if entry else None
+
+    async def wait_for_match(self, user_id: int, timeout: float) -> Optional[dict]:
+        """Wait up to timeout seconds for a match result for the user."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            result = self.pop_result(user_id)
+            if result:
+                return result
+            previous = self._waiters.get(user_id)
+            self._waiters[user_id] = (loop, future)
+        if previous:
+            # A newer request from the same user supersedes the old one
+            previous[0].call_soon_threadsafe(self._resolve, user_id, previous[1], None)
+
+        try:
+            return await asyncio.wait_for(future, timeout=max(timeout, 0))
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            with self._lock:
+                if self._waiters.get(user_id, (None, None))[1] is future:
+                    del self._waiters[user_id]
+
+    def _resolve(self, user_id: int, future: asyncio.Future, result: Optional[dict]):
+        if not future.done():
+            future.set_result(result)
+        elif result is not None:
+            # The wait timed out just as the match arrived; keep it for the next call
+            with self._lock:
+                self._results[user_id] = (result, datetime.utcnow() + timedelta(seconds=self.ttl_seconds))
+
+    def remove(self, user_id: int):
+        """Cancel a user's pending shake."""
+        with self._lock:
+            self._remove(user_id)
+
+    def purge_expired(self, now: Optional[datetime] = None) -> int:
+        """Evict every expired shake. Returns number evicted."""
+        with self._lock:
+            return self._evict_expired(now or datetime.utcnow())
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._buckets.clear()
+            self._expiry.clear()
+            self._results.clear()
+        self.release(list(self._claims))
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _claim(self, shakes: Iterable[PendingShake]):
+        for shake in shakes:
+            self._remove(shake.user_id)
+            self._claims[shake.user_id] = threading.Event()
+
+    def _insert(self, shake: PendingShake):
+        self._pending[shake.user_id] = shake
+        self._buckets[shake.geohash].add(shake.user_id)
+        heapq.heappush(self._expiry, (shake.expires_at, shake.session_id, shake.user_id))
+
+    def _remove(self, user_id: int):
+        shake = self._pending.pop(user_id, None)
+        if shake:
+            self._buckets_discard(shake)
+
+    def _buckets_discard(self, shake: PendingShake):
+        members = self._buckets.get(shake.geohash)
+        if members is not None:
+            members.discard(shake.user_id)
+            if not members:
+                del self._buckets[shake.geohash]
+
+    def _evict_expired(self, now: datetime) -> int:
+        evicted = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            _, session_id, user_id = heapq.heappop(self._expiry)
+            shake = self._pending.get(user_id)
+            # Heap entries of matched or replaced shakes are stale; skip them
+            if shake and shake.session_id == session_id:
+                self._remove(user_id)
+                evicted += 1
+        for user_id in [user_id for user_id, (_, kept_until) in self._results.items() if kept_until <= now]:
+            del self._results[user_id]
+        return evicted
+
+    def _cells_around(self, latitude: float, longitude: float, radius_m: float) -> Set[str]:
+        """Geohashes of every cell that may hold a point within radius_m."""
+        lat_delta, lon_delta = degree_deltas(latitude, radius_m)
+        lat_steps = ceil(lat_delta / self._cell_height)
+        lon_steps = ceil(180.0 / self._cell_width)
+        if lon_delta is not None:
+            lon_steps = min(ceil(lon_delta / self._cell_width), lon_steps)
+        cells = set()
+        for i in range(-lat_steps, lat_steps + 1):
+            lat = min(max(latitude + i * self._cell_height, -90.0), 90.0)
+            for j in range(-lon_steps, lon_steps + 1):
+                lon = (longitude + j * self._cell_width + 180.0) % 360.0 - 180.0
+                cells.add(geohash_encode(lat, lon, self.precision))
+        return cells
+
+
+shake_matcher = ShakeMatcher(
+    precision=settings.SHAKE_GEOHASH_PRECISION,
+    ttl_seconds=settings.SHAKE_SESSION_TTL_SECONDS,
+    default_accuracy_m=settings.SHAKE_DEFAULT_ACCURACY_M,
+    spread_m=settings.SHAKE_MATCH_SPREAD_M,
+    time_scale_seconds=settings.SHAKE_MATCH_TIME_SCALE_SECONDS
+)
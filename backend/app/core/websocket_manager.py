@@ -1,89 +1,236 @@
 """WebSocket connection manager for real-time chat."""
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, List, Set
+from typing import Dict, Iterable, List, Optional, Set
 from collections import defaultdict
+import asyncio
 import json
 import logging
+import uuid
+from app.core.config import settings
+from app.core.outbound import OutboundQueues
+from app.core.pubsub import BroadcastBackend, InProcessBroadcastBackend, build_broadcast_backend
 from app.core.security import decode_access_token
 
 logger = logging.getLogger(__name__)
 
 
 class WebSocketManager:
-    """Manages WebSocket connections for chat."""
-    
-    def __init__(self):
-        # Map: conversation_id -> Set of WebSocket connections
+    """
+    Manages WebSocket connections for chat.
+
+    A socket belongs to one user and is subscribed to one or more
+    conversations; messages are routed by conversation. Sockets opened on
+    /chat/ws/{conversation_id} are subscribed to that conversation only.
+    Multiplexed sockets (/chat/ws) carry every conversation of their user:
+    they start subscribed to all of them, can subscribe/unsubscribe per
+    conversation, and are subscribed automatically when a conversation they
+    did not know about gets a message for their user.
+
+    Every worker process has its own manager. Broadcasts are delivered to
+    this worker's sockets and published through the broadcast backend, so
+    the managers of the other workers deliver them to theirs.
+
+    Frames go through OutboundQueues: one bounded queue and writer task per
+    socket, so broadcasting only enqueues and a slow client cannot hold up
+    the others.
+
+    All methods run on the event loop, so the maps need no lock.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[BroadcastBackend] = None,
+        queue_size: int = 256,
+        overflow_policy: str = "disconnect",
+        send_timeout_seconds: float = 10.0
+    ):
+        self.backend = backend or InProcessBroadcastBackend()
+        self.outbound = OutboundQueues(self.disconnect, queue_size, overflow_policy, send_timeout_seconds)
+        # Tags published messages so this worker skips its own
+        self.worker_id = uuid.uuid4().hex
+        # Map: conversation_id -> Set of WebSocket connections subscribed to it
         self.active_connections: Dict[int, Set[WebSocket]] = defaultdict(set)
-        # Map: WebSocket -> (conversation_id, user_id)
-        self.connection_info: Dict[WebSocket, tuple] = {}
-    
+        # Map: WebSocket -> user_id
+        self.connection_users: Dict[WebSocket, int] = {}
+        # Map: WebSocket -> Set of conversation_ids it is subscribed to
+        self.connection_subscriptions: Dict[WebSocket, Set[int]] = {}
+        # Map: user_id -> Set of multiplexed WebSocket connections
+        self.user_connections: Dict[int, Set[WebSocket]] = defaultdict(set)
+        # Map: multiplexed WebSocket -> conversation_ids the client unsubscribed from
+        self.unsubscribed: Dict[WebSocket, Set[int]] = {}
+
+    async def start(self):
+        """Start receiving broadcasts published by other workers."""
+        await self.backend.subscribe(self._on_remote)
+
+    async def stop(self):
+        """Give queued frames a last chance to go out, then stop."""
+        try:
+            await asyncio.wait_for(self.flush(), timeout=self.outbound.send_timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.warning("Chat frames still queued at shutdown were dropped")
+        for websocket in list(self.outbound.writer_tasks):
+            self.disconnect(websocket)
+        await self.backend.close()
+
+    async def flush(self):
+        """Wait until every frame queued so far has been sent (or dropped)."""
+        await self.outbound.flush()
+
+    def authenticate(self, token: str) -> Optional[int]:
+        """User ID from a JWT access token, or None if it is invalid."""
+        payload = decode_access_token(token)
+        if not payload or not payload.get("sub"):
+            return None
+        return int(payload["sub"])
+
     async def connect(self, websocket: WebSocket, conversation_id: int, token: str):
-        """Connect a WebSocket to a conversation."""
+        """Connect a WebSocket to a single conversation."""
         try:
             # Decode JWT token to get user_id
-            payload = decode_access_token(token)
-            if not payload:
-                await websocket.close(code=1008, reason="Invalid token")
-                return
-            
-            user_id = payload.get("sub")
+            user_id = self.authenticate(token)
             if not user_id:
                 await websocket.close(code=1008, reason="Invalid token")
                 return
-            
-            # Add connection
-            self.active_connections[conversation_id].add(websocket)
-            self.connection_info[websocket] = (conversation_id, int(user_id))
-            
+
+            await websocket.accept()
+            self._register(websocket, user_id, [conversation_id])
+
             logger.info(f"User {user_id} connected to conversation {conversation_id}")
-            
+
         except Exception as e:
             logger.error(f"Error connecting WebSocket: {e}")
             await websocket.close(code=1011, reason="Internal error")
-    
-    def disconnect(self, websocket: WebSocket, conversation_id: int):
-        """Disconnect a WebSocket from a conversation."""
-        if websocket in self.active_connections[conversation_id]:
-            self.active_connections[conversation_id].remove(websocket)
-        
-        if websocket in self.connection_info:
-            del self.connection_info[websocket]
-        
-        # Clean up empty conversation sets
-        if not self.active_connections[conversation_id]:
-            del self.active_connections[conversation_id]
-    
+
+    async def connect_user(self, websocket: WebSocket, user_id: int, conversation_ids: Iterable[int]):
+        """Accept a multiplexed WebSocket carrying all of a user's conversations."""
+        await websocket.accept()
+        self._register(websocket, user_id, conversation_ids)
+        self.user_connections[user_id].add(websocket)
+        self.unsubscribed[websocket] = set()
+        logger.info(f"User {user_id} connected to all conversations")
+
+    def _register(self, websocket: WebSocket, user_id: int, conversation_ids: Iterable[int]):
+        self.connection_users[websocket] = user_id
+        self.connection_subscriptions[websocket] = set()
+        for conversation_id in conversation_ids:
+            self._subscribe(websocket, conversation_id)
+        self.outbound.open(websocket, user_id)
+
+    def send(self, websocket: WebSocket, message: dict) -> bool:
+        """Queue a frame for one connected socket. False if it was not queued."""
+        return self.outbound.enqueue(websocket, json.dumps(message, default=str))
+
+    def subscribe(self, websocket: WebSocket, conversation_id: int):
+        """Route a conversation's messages to a connected socket."""
+        if websocket not in self.connection_users:
+            return
+        self._subscribe(websocket, conversation_id)
+        self.unsubscribed.get(websocket, set()).discard(conversation_id)
+
+    def unsubscribe(self, websocket: WebSocket, conversation_id: int):
+        """Stop routing a conversation's messages to a socket."""
+        self._unsubscribe(websocket, conversation_id)
+        if websocket in self.unsubscribed:
+            self.unsubscribed[websocket].add(conversation_id)
+
+    def _subscribe(self, websocket: WebSocket, conversation_id: int):
+        self.active_connections[conversation_id].add(websocket)
+        self.connection_subscriptions[websocket].add(conversation_id)
+
+    def _unsubscribe(self, websocket: WebSocket, conversation_id: int):
+        connections = self.active_connections.get(conversation_id)
+        if connections is not None:
+            connections.discard(websocket)
+            # Clean up empty conversation sets
+            if not connections:
+                del self.active_connections[conversation_id]
+        subscriptions = self.connection_subscriptions.get(websocket)
+        if subscriptions is not None:
+            subscriptions.discard(conversation_id)
+
+    def disconnect(self, websocket: WebSocket, conversation_id: Optional[int] = None):
+        """Forget a WebSocket and all its subscriptions."""
+        for subscribed_id in list(self.connection_subscriptions.get(websocket, ())):
+            self._unsubscribe(websocket, subscribed_id)
+        if conversation_id is not None:
+            self._unsubscribe(websocket, conversation_id)
+        self.connection_subscriptions.pop(websocket, None)
+        self.unsubscribed.pop(websocket, None)
+
+        self.outbound.close(websocket)
+
+        user_id = self.connection_users.pop(websocket, None)
+        if user_id is not None and websocket in self.user_connections.get(user_id, ()):
+            self.user_connections[user_id].discard(websocket)
+            if not self.user_connections[user_id]:
+                del self.user_connections[user_id]
+
+    def _subscribe_participants(self, conversation_id: int, participant_ids: Iterable[int]):
+        """Subscribe participants' multiplexed sockets that do not know the conversation yet."""
+        for user_id in participant_ids:
+            for websocket in self.user_connections.get(user_id, ()):
+                if conversation_id not in self.unsubscribed.get(websocket, ()):
+                    self._subscribe(websocket, conversation_id)
+
     async def broadcast_to_conversation(
         self,
         conversation_id: int,
         message: dict,
-        exclude_user_id: int = None
+        exclude_user_id: int = None,
+        participant_ids: Optional[Iterable[int]] = None
     ):
-        """Broadcast a message to all connections in a conversation."""
+        """
+        Broadcast a message to all connections subscribed to a conversation,
+        on every worker. The message is tagged with its conversation_id so
+        multiplexed clients can route it. participant_ids lets a brand-new
+        conversation reach the participants' multiplexed sockets.
+        """
+        participant_ids = list(participant_ids) if participant_ids else None
+        self._deliver_local(conversation_id, message, exclude_user_id, participant_ids)
+        try:
+            await self.backend.publish({
+                "origin": self.worker_id,
+                "conversation_id": conversation_id,
+                "message": message,
+                "exclude_user_id": exclude_user_id,
+                "participant_ids": participant_ids,
+            })
+        except Exception as e:
+            # Local delivery already happened; other workers miss this one
+            logger.error(f"Error publishing broadcast for conversation {conversation_id}: {e}")
+
+    async def _on_remote(self, envelope: dict):
+        """Deliver a broadcast published by another worker."""
+        if envelope.get("origin") == self.worker_id:
+            return
+        self._deliver_local(
+            envelope["conversation_id"],
+            envelope["message"],
+            envelope.get("exclude_user_id"),
+            envelope.get("participant_ids")
+        )
+
+    def _deliver_local(
+        self,
+        conversation_id: int,
+        message: dict,
+        exclude_user_id: Optional[int],
+        participant_ids: Optional[List[int]]
+    ):
+        """Queue a message for this worker's sockets subscribed to a conversation."""
+        if participant_ids:
+            self._subscribe_participants(conversation_id, participant_ids)
         if conversation_id not in self.active_connections:
             return
-        
-        disconnected = []
-        message_json = json.dumps(message)
-        
-        for websocket in self.active_connections[conversation_id]:
-            try:
-                # Skip if this is the sender
-                if websocket in self.connection_info:
-                    _, user_id = self.connection_info[websocket]
-                    if exclude_user_id and user_id == exclude_user_id:
-                        continue
-                
-                await websocket.send_text(message_json)
-            except Exception as e:
-                logger.error(f"Error broadcasting to WebSocket: {e}")
-                disconnected.append(websocket)
-        
-        # Clean up disconnected connections
-        for ws in disconnected:
-            self.disconnect(ws, conversation_id)
-    
+
+        message_json = json.dumps({**message, "conversation_id": conversation_id}, default=str)
+        for websocket in list(self.active_connections.get(conversation_id, ())):
+            # Skip if this is the sender
+            if exclude_user_id and self.connection_users.get(websocket) == exclude_user_id:
+                continue
+            self.outbound.enqueue(websocket, message_json)
+
     async def broadcast_typing(
         self,
         conversation_id: int,
@@ -101,8 +248,19 @@ class WebSocketManager:
             message=message,
             exclude_user_id=user_id
         )
-    
+
     def get_connection_count(self, conversation_id: int) -> int:
         """Get number of active connections for a conversation."""
         return len(self.active_connections.get(conversation_id, set()))
 
+    def get_user_connection_count(self, user_id: int) -> int:
+        """Get number of multiplexed connections of a user."""
+        return len(self.user_connections.get(user_id, set()))
+
+
+websocket_manager = WebSocketManager(
+    build_broadcast_backend(),
+    queue_size=settings.CHAT_OUTBOUND_QUEUE_SIZE,
+    overflow_policy=settings.CHAT_OUTBOUND_OVERFLOW_POLICY,
+    send_timeout_seconds=settings.CHAT_SEND_TIMEOUT_SECONDS
+)
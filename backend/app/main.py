@@ -1,11 +1,23 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.core.database import dispose_async_engine
+from app.core.location_history_buffer import location_history_buffer
+from app.core.location_write_stats import location_write_stats
+from app.core.background_jobs import PeriodicJob
+from app.core.expiry_sweeper import expiry_sweeper
+from app.core.geocoding import reverse_geocoder
+from app.core.shake_matcher import claim_single_process
+from app.core.websocket_manager import websocket_manager
 from app.core.middleware import exception_handler, general_exception_handler
 from app.core.exceptions import MeetUpException
 from app.core.logging_config import setup_logging
 from app.core.firebase_admin import initialize_firebase
+from app.services.location_retention_service import LocationRetentionTask
+from app.services.shake_service import register_shake_sweeps
 from app.api.v1 import auth, friends, location, users, meetings, invitations, notifications, points, shake, chat
 
 logger = setup_logging()
@@ -16,10 +28,49 @@ try:
 except Exception as e:
     logger.warning(f"Firebase initialization failed: {e}. FCM notifications will not work.")
 
+location_retention_job = PeriodicJob(
+    name="location-history-retention",
+    task=LocationRetentionTask(),
+    interval_seconds=settings.LOCATION_HISTORY_RETENTION_INTERVAL_SECONDS,
+    # Every worker starts the job; the lock keeps partition DDL to one of them at a time
+    lock_name="meetup-location-history-retention"
+)
+
+register_shake_sweeps(expiry_sweeper)
+expiry_sweep_job = PeriodicJob(
+    name="expiry-sweeper",
+    task=expiry_sweeper,
+    interval_seconds=settings.EXPIRY_SWEEP_INTERVAL_SECONDS
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup/shutdown hooks."""
+    process_lock = claim_single_process(settings.SHAKE_MATCHER_LOCK_PATH)
+    if settings.LOCATION_HISTORY_BUFFER_ENABLED:
+        location_history_buffer.start()
+    if settings.LOCATION_HISTORY_RETENTION_ENABLED:
+        location_retention_job.start()
+    if settings.EXPIRY_SWEEP_ENABLED:
+        expiry_sweep_job.start()
+    await websocket_manager.start()
+    yield
+    await websocket_manager.stop()
+    await run_in_threadpool(expiry_sweep_job.stop)
+    await run_in_threadpool(location_retention_job.stop)
+    # Write out buffered location history before the process exits
+    await run_in_threadpool(location_history_buffer.stop)
+    await run_in_threadpool(reverse_geocoder.shutdown)
+    await dispose_async_engine()
+    process_lock.close()
+
+
 app = FastAPI(
     title="MeetUp API",
     description="Backend API for MeetUp mobile application",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -53,5 +104,5 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
+    return {"status": "healthy", "location_writes": location_write_stats.snapshot()}
 
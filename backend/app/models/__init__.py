@@ -11,6 +11,7 @@ from .event import Event, EventParticipant
 from .location import Location, LocationReview, LocationCampaign
 from .shake_session import ShakeSession, ShakeSessionStatus
 from .chat import Conversation, Message
+from .job_state import BackgroundJobState
 
 __all__ = [
     "User",
@@ -38,5 +39,6 @@ __all__ = [
     "ShakeSessionStatus",
     "Conversation",
     "Message",
+    "BackgroundJobState",
 ]
 
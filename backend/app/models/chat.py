@@ -41,6 +41,7 @@ class Message(Base):
     sender_id = Column(BigInteger, nullable=False, index=True)
     content = Column(Text, nullable=False)
     message_type = Column(String(20), default="text", nullable=False)  # text, image, location, etc.
+    client_message_id = Column(String(64), nullable=True)  # Sender's idempotency key, so retries are not duplicated
     is_read = Column(Boolean, default=False, nullable=False, index=True)
     read_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, server_default=func.now(), nullable=False, index=True)
@@ -50,9 +51,12 @@ class Message(Base):
     conversation = relationship("Conversation", back_populates="messages")
 
     __table_args__ = (
-        # Index for efficient message history queries
-        Index('idx_message_conversation_created', 'conversation_id', 'created_at'),
+        # Index for message history pages; id breaks created_at ties for keyset pagination
+        Index('idx_message_conversation_created', 'conversation_id', 'created_at', 'id'),
         # Index for unread message queries
         Index('idx_message_unread', 'conversation_id', 'is_read', 'sender_id'),
+        # One message per conversation, sender and idempotency key
+        UniqueConstraint('conversation_id', 'sender_id', 'client_message_id',
+                         name='unique_message_conversation_client_id'),
     )
 
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, BigInteger, String, DateTime, Text, Integer, Boolean
+from sqlalchemy import Column, BigInteger, String, DateTime, Text, Integer, Boolean, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.types import Coordinate
 
 class Event(Base):
     __tablename__ = "events"
@@ -10,8 +11,8 @@ class Event(Base):
     description = Column(Text, nullable=False)
     organizer_user_id = Column(BigInteger, nullable=False, index=True)
     location_id = Column(BigInteger, nullable=True, index=True)
-    latitude = Column(String(20), nullable=True)
-    longitude = Column(String(20), nullable=True)
+    latitude = Column(Coordinate, nullable=True)
+    longitude = Column(Coordinate, nullable=True)
     address = Column(String(255), nullable=True)
     visibility = Column(String(20), default="public", nullable=False, index=True)
     status = Column(String(20), default="draft", nullable=False, index=True)
@@ -23,6 +24,10 @@ class Event(Base):
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
 
+    __table_args__ = (
+        Index('idx_event_lat_lon', 'latitude', 'longitude'),
+    )
+
 class EventParticipant(Base):
     __tablename__ = "event_participants"
 
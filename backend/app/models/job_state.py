@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class BackgroundJobState(Base):
+    """Progress a periodic job keeps across runs, shared by every worker."""
+    __tablename__ = "background_job_state"
+
+    name = Column(String(100), primary_key=True)
+    watermark = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, BigInteger, String, Boolean, DateTime, Text, Integer, Numeric
+from sqlalchemy import Column, BigInteger, String, Boolean, DateTime, Text, Integer, Numeric, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.types import Coordinate
 
 class Location(Base):
     __tablename__ = "locations"
@@ -14,8 +15,8 @@ class Location(Base):
     city = Column(String(100), nullable=False, index=True)
     postal_code = Column(String(20), nullable=True)
     country = Column(String(100), nullable=False)
-    latitude = Column(String(20), nullable=False)
-    longitude = Column(String(20), nullable=False)
+    latitude = Column(Coordinate, nullable=False)
+    longitude = Column(Coordinate, nullable=False)
     place_type = Column(String(40), nullable=True)
     phone_number = Column(String(30), nullable=True)
     website_url = Column(String(255), nullable=True)
@@ -26,6 +27,10 @@ class Location(Base):
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
 
+    __table_args__ = (
+        Index('idx_location_lat_lon', 'latitude', 'longitude'),
+    )
+
 class LocationReview(Base):
     __tablename__ = "location_reviews"
 
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, BigInteger, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, BigInteger, String, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.types import Coordinate
 
 class Meeting(Base):
     __tablename__ = "meetings"
@@ -11,14 +12,18 @@ class Meeting(Base):
     title = Column(String(200), nullable=True)
     description = Column(Text, nullable=True)
     location_id = Column(BigInteger, nullable=True, index=True)
-    latitude = Column(String(20), nullable=True)
-    longitude = Column(String(20), nullable=True)
+    latitude = Column(Coordinate, nullable=True)
+    longitude = Column(Coordinate, nullable=True)
     address = Column(String(255), nullable=True)
     scheduled_at = Column(DateTime, nullable=False, index=True)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
     status = Column(String(20), default="pending", nullable=False, index=True)
 
+    __table_args__ = (
+        Index('idx_meeting_lat_lon', 'latitude', 'longitude'),
+    )
+
 class MeetingParticipant(Base):
     __tablename__ = "meeting_participants"
 
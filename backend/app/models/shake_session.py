@@ -1,6 +1,7 @@
-from sqlalchemy import Column, BigInteger, String, DateTime, Integer, Enum as SQLEnum
+from sqlalchemy import Column, BigInteger, String, DateTime, Integer, Index, Enum as SQLEnum
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.types import Coordinate
 import enum
 
 class ShakeSessionStatus(str, enum.Enum):
@@ -13,8 +14,8 @@ class ShakeSession(Base):
 
     id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
     user_id = Column(BigInteger, nullable=False, index=True)
-    latitude = Column(String(20), nullable=False)
-    longitude = Column(String(20), nullable=False)
+    latitude = Column(Coordinate, nullable=False)
+    longitude = Column(Coordinate, nullable=False)
     accuracy_m = Column(String(20), nullable=True)
     created_at = Column(DateTime, server_default=func.now(), nullable=False, index=True)
     expires_at = Column(DateTime, nullable=False, index=True)
@@ -23,3 +24,8 @@ class ShakeSession(Base):
     status = Column(SQLEnum(ShakeSessionStatus), default=ShakeSessionStatus.ACTIVE, nullable=False, index=True)
     meeting_id = Column(BigInteger, nullable=True, index=True)
 
+    __table_args__ = (
+        # Proximity search over active sessions: status equality, then latitude range
+        Index('idx_shake_status_lat_lon', 'status', 'latitude', 'longitude'),
+    )
+
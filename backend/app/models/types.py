@@ -0,0 +1,25 @@
+"""Custom column types shared by the models."""
+from decimal import Decimal
+from sqlalchemy import Double
+from sqlalchemy.types import TypeDecorator
+
+
+class Coordinate(TypeDecorator):
+    """
+    Latitude/longitude stored as DOUBLE so range predicates can use indexes.
+    Accepts the legacy string representation on write and always returns float.
+    """
+    impl = Double
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, (str, Decimal, int)):
+            return float(value)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return float(value)
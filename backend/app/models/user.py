@@ -1,7 +1,8 @@
-from sqlalchemy import Column, BigInteger, String, Boolean, Integer, DateTime, Text, Time
+from sqlalchemy import Column, BigInteger, String, Boolean, Integer, DateTime, Text, Time, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.types import Coordinate
 
 class User(Base):
     __tablename__ = "users"
@@ -31,10 +32,17 @@ class UserLocation(Base):
 
     id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
     user_id = Column(BigInteger, unique=True, nullable=False, index=True)
-    latitude = Column(String(20), nullable=False)  # Using String for decimal precision
-    longitude = Column(String(20), nullable=False)
+    latitude = Column(Coordinate, nullable=False)
+    longitude = Column(Coordinate, nullable=False)
     accuracy_m = Column(String(20), nullable=True)
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False, index=True)
+    # When the position itself was last written; stationary fixes only refresh updated_at
+    last_written_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Bounding-box queries: range scan on latitude, longitude filtered in the index
+        Index('idx_user_location_lat_lon', 'latitude', 'longitude'),
+    )
 
 class AvailabilitySchedule(Base):
     __tablename__ = "availability_schedules"
@@ -1,15 +1,16 @@
-from sqlalchemy import Column, BigInteger, DateTime, String, Float, Numeric
+from sqlalchemy import Column, BigInteger, DateTime, String, Float, Numeric, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.types import Coordinate
 
 class UserLocationHistory(Base):
     __tablename__ = "user_location_history"
 
     id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
-    user_id = Column(BigInteger, nullable=False, index=True)
+    user_id = Column(BigInteger, nullable=False)
     recorded_at = Column(DateTime, nullable=False, index=True)
-    latitude = Column(String(20), nullable=False)  # Using String for decimal precision
-    longitude = Column(String(20), nullable=False)
+    latitude = Column(Coordinate, nullable=False)
+    longitude = Column(Coordinate, nullable=False)
     altitude_m = Column(String(20), nullable=True)
     accuracy_m = Column(String(20), nullable=True)
     speed_mps = Column(String(20), nullable=True)
@@ -17,3 +18,12 @@ class UserLocationHistory(Base):
     source = Column(String(20), default="gps", nullable=False)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
 
+    # On MySQL the table is RANGE-partitioned by month on recorded_at (see the
+    # partition_location_history migration), which makes the physical primary
+    # key (id, recorded_at). id stays unique on its own, so the ORM keys on it.
+    __table_args__ = (
+        # Per-user range scans and keyset pagination on (recorded_at, id);
+        # also serves every user_id-only lookup
+        Index('idx_history_user_recorded', 'user_id', 'recorded_at', 'id'),
+    )
+
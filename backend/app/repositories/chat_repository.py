@@ -1,6 +1,7 @@
 """Repository for chat-related database operations."""
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, desc, func, select, update
 from app.models.chat import Conversation, Message
 from app.models.user import User
 from typing import List, Optional
@@ -81,14 +82,19 @@ class ChatRepository:
         conversation_id: int,
         sender_id: int,
         content: str,
-        message_type: str = "text"
+        message_type: str = "text",
+        client_message_id: Optional[str] = None
     ) -> Message:
-        """Create a new message in a conversation."""
+        """
+        Create a new message in a conversation.
+        Raises IntegrityError if the sender already used client_message_id in this conversation.
+        """
         message = Message(
             conversation_id=conversation_id,
             sender_id=sender_id,
             content=content,
-            message_type=message_type
+            message_type=message_type,
+            client_message_id=client_message_id
         )
         self.db.add(message)
         
@@ -107,16 +113,64 @@ class ChatRepository:
         self.db.refresh(message)
         return message
     
+    def get_message_by_client_id(self, conversation_id: int, sender_id: int,
+                                 client_message_id: str) -> Optional[Message]:
+        """Get the message a sender sent to a conversation with an idempotency key."""
+        return self.db.query(Message).filter(
+            and_(
+                Message.conversation_id == conversation_id,
+                Message.sender_id == sender_id,
+                Message.client_message_id == client_message_id
+            )
+        ).first()
+    
+    def get_message(self, conversation_id: int, message_id: int) -> Optional[Message]:
+        """Get a message by ID, ensuring it belongs to the conversation."""
+        return self.db.query(Message).filter(
+            and_(
+                Message.id == message_id,
+                Message.conversation_id == conversation_id
+            )
+        ).first()
+    
     def get_messages(
         self,
         conversation_id: int,
         limit: int = 50,
-        offset: int = 0
+        offset: int = 0,
+        before: Optional[tuple] = None,
+        after: Optional[tuple] = None
     ) -> List[Message]:
-        """Get messages for a conversation with pagination, ordered by creation time."""
-        messages = self.db.query(Message).filter(
-            Message.conversation_id == conversation_id
-        ).order_by(desc(Message.created_at)).limit(limit).offset(offset).all()
+        """
+        Get messages for a conversation, in chronological order (oldest first).
+        
+        By default the newest `limit` messages, skipping `offset`, or only those
+        strictly before the keyset position `before` = (created_at, id). With
+        `after`, the oldest `limit` messages strictly after that position.
+        Keyset positions seek on idx_message_conversation_created, so a page
+        costs the same at any depth; offset has to skip every row before it.
+        """
+        query = self.db.query(Message).filter(Message.conversation_id == conversation_id)
+        
+        if after:
+            after_created_at, after_id = after
+            query = query.filter(
+                or_(
+                    Message.created_at > after_created_at,
+                    and_(Message.created_at == after_created_at, Message.id > after_id)
+                )
+            )
+            return query.order_by(Message.created_at, Message.id).limit(limit).all()
+        
+        if before:
+            before_created_at, before_id = before
+            query = query.filter(
+                or_(
+                    Message.created_at < before_created_at,
+                    and_(Message.created_at == before_created_at, Message.id < before_id)
+                )
+            )
+        messages = query.order_by(desc(Message.created_at), desc(Message.id)).limit(limit).offset(offset).all()
         
         # Return in chronological order (oldest first)
         return list(reversed(messages))
@@ -172,3 +226,159 @@ class ChatRepository:
         ).order_by(desc(Message.created_at)).first()
         return message
 
+
+
+class AsyncChatRepository:
+    """AsyncSession variant of ChatRepository."""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_or_create_conversation(self, user1_id: int, user2_id: int) -> Conversation:
+        """
+        Get existing conversation between two users or create a new one.
+        Ensures user1_id < user2_id for consistency.
+        """
+        if user1_id > user2_id:
+            user1_id, user2_id = user2_id, user1_id
+        
+        conversation = await self.get_conversation_with_friend(user1_id, user2_id)
+        
+        if not conversation:
+            conversation = Conversation(
+                user1_id=user1_id,
+                user2_id=user2_id
+            )
+            self.db.add(conversation)
+            await self.db.commit()
+            await self.db.refresh(conversation)
+        
+        return conversation
+    
+    async def get_conversation_by_id(self, conversation_id: int, user_id: int) -> Optional[Conversation]:
+        """Get conversation by ID, ensuring user is a participant."""
+        result = await self.db.execute(
+            select(Conversation).where(
+                and_(
+                    Conversation.id == conversation_id,
+                    or_(
+                        Conversation.user1_id == user_id,
+                        Conversation.user2_id == user_id
+                    )
+                )
+            )
+        )
+        return result.scalars().first()
+    
+    async def get_user_conversations(self, user_id: int) -> List[Conversation]:
+        """Get all conversations for a user, ordered by last message time."""
+        result = await self.db.execute(
+            select(Conversation).where(
+                or_(
+                    Conversation.user1_id == user_id,
+                    Conversation.user2_id == user_id
+                )
+            ).order_by(desc(Conversation.last_message_at))
+        )
+        return list(result.scalars().all())
+    
+    async def get_user_conversation_ids(self, user_id: int) -> List[int]:
+        """Get IDs of all conversations a user takes part in."""
+        result = await self.db.execute(
+            select(Conversation.id).where(
+                or_(
+                    Conversation.user1_id == user_id,
+                    Conversation.user2_id == user_id
+                )
+            )
+        )
+        return list(result.scalars().all())
+    
+    async def get_conversation_with_friend(self, user_id: int, friend_id: int) -> Optional[Conversation]:
+        """Get conversation between user and friend."""
+        user1_id, user2_id = (user_id, friend_id) if user_id < friend_id else (friend_id, user_id)
+        
+        result = await self.db.execute(
+            select(Conversation).where(
+                and_(
+                    Conversation.user1_id == user1_id,
+                    Conversation.user2_id == user2_id
+                )
+            )
+        )
+        return result.scalars().first()
+    
+    async def create_message(
+        self,
+        conversation_id: int,
+        sender_id: int,
+        content: str,
+        message_type: str = "text",
+        client_message_id: Optional[str] = None
+    ) -> Message:
+        """
+        Create a new message in a conversation.
+        Raises IntegrityError if the sender already used client_message_id in this conversation.
+        """
+        message = Message(
+            conversation_id=conversation_id,
+            sender_id=sender_id,
+            content=content,
+            message_type=message_type,
+            client_message_id=client_message_id
+        )
+        self.db.add(message)
+        
+        conversation = await self.db.get(Conversation, conversation_id)
+        if conversation:
+            preview = content[:252] + "..." if len(content) > 255 else content
+            conversation.last_message_at = datetime.utcnow()
+            conversation.last_message_preview = preview
+            conversation.updated_at = datetime.utcnow()
+        
+        await self.db.commit()
+        await self.db.refresh(message)
+        return message
+    
+    async def get_messages(
+        self,
+        conversation_id: int,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[Message]:
+        """Get messages for a conversation with pagination, ordered by creation time."""
+        result = await self.db.execute(
+            select(Message).where(
+                Message.conversation_id == conversation_id
+            ).order_by(desc(Message.created_at), desc(Message.id)).limit(limit).offset(offset)
+        )
+        
+        # Return in chronological order (oldest first)
+        return list(reversed(result.scalars().all()))
+    
+    async def mark_messages_as_read(self, conversation_id: int, user_id: int) -> int:
+        """Mark all unread messages in a conversation as read (except user's own messages)."""
+        result = await self.db.execute(
+            update(Message).where(
+                and_(
+                    Message.conversation_id == conversation_id,
+                    Message.sender_id != user_id,
+                    Message.is_read == False
+                )
+            ).values(is_read=True, read_at=datetime.utcnow())
+        )
+        await self.db.commit()
+        return result.rowcount
+    
+    async def get_conversation_unread_count(self, conversation_id: int, user_id: int) -> int:
+        """Get unread message count for a specific conversation."""
+        result = await self.db.execute(
+            select(func.count(Message.id)).where(
+                and_(
+                    Message.conversation_id == conversation_id,
+                    Message.sender_id != user_id,
+                    Message.is_read == False
+                )
+            )
+        )
+        return result.scalar() or 0
@@ -2,7 +2,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
 from app.models.friendship import Friendship
 from app.models.user import User
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class FriendshipRepository:
     def __init__(self, db: Session):
@@ -79,6 +79,31 @@ class FriendshipRepository:
         
         return query.all()
     
+    def get_friend_ids(self, user_id: int, status_filter: str = "accepted") -> List[int]:
+        """Get IDs of all friends of a user with specific status, without loading the users."""
+        return list(self.get_friend_close_flags(user_id, status_filter))
+    
+    def get_friend_close_flags(self, user_id: int, status_filter: str = "accepted") -> Dict[int, bool]:
+        """Map each friend's ID to whether the friendship is marked close."""
+        friendships = self.db.query(
+            Friendship.user_id,
+            Friendship.friend_id,
+            Friendship.is_close_friend
+        ).filter(
+            and_(
+                or_(
+                    Friendship.user_id == user_id,
+                    Friendship.friend_id == user_id
+                ),
+                Friendship.status == status_filter
+            )
+        ).all()
+        
+        return {
+            (friendship.friend_id if friendship.user_id == user_id else friendship.user_id): friendship.is_close_friend
+            for friendship in friendships
+        }
+    
     def delete_friendship(self, user_id: int, friend_id: int) -> bool:
         """Delete friendship between two users."""
         friendship = self.get_friendship(user_id, friend_id)
@@ -125,4 +150,3 @@ class FriendshipRepository:
                 Friendship.status == "pending"
             )
         ).all()
-
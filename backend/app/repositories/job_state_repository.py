@@ -0,0 +1,22 @@
+from sqlalchemy.orm import Session
+from app.models.job_state import BackgroundJobState
+from datetime import datetime
+from typing import Optional
+
+class JobStateRepository:
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def get_watermark(self, name: str) -> Optional[datetime]:
+        """Watermark stored by the named job, None if it never stored one."""
+        state = self.db.get(BackgroundJobState, name)
+        return state.watermark if state else None
+    
+    def set_watermark(self, name: str, watermark: Optional[datetime]):
+        """Store the named job's watermark."""
+        state = self.db.get(BackgroundJobState, name)
+        if state is None:
+            state = BackgroundJobState(name=name)
+            self.db.add(state)
+        state.watermark = watermark
+        self.db.commit()
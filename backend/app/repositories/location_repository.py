@@ -1,24 +1,30 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, or_, insert, delete, text
 from app.models.user import UserLocation, User
 from app.models.user_location_history import UserLocationHistory
-from typing import Optional, List
+from typing import Optional, List, Iterator
 from datetime import datetime
 
 class LocationRepository:
     def __init__(self, db: Session):
         self.db = db
     
-    def update_user_location(self, user_id: int, latitude: str, longitude: str, accuracy_m: Optional[str] = None) -> UserLocation:
-        """Update or create user's current location."""
-        location = self.db.query(UserLocation).filter(UserLocation.user_id == user_id).first()
+    def update_user_location(self, user_id: int, latitude: float, longitude: float, accuracy_m: Optional[str] = None,
+                             location: Optional[UserLocation] = None) -> UserLocation:
+        """
+        Update or create user's current location. location is the user's row
+        if the caller already loaded it, which saves looking it up again.
+        """
+        now = datetime.utcnow()
+        if location is None:
+            location = self.db.query(UserLocation).filter(UserLocation.user_id == user_id).first()
         
         if location:
             location.latitude = latitude
             location.longitude = longitude
             if accuracy_m:
                 location.accuracy_m = accuracy_m
-            location.updated_at = datetime.utcnow()
+            location.updated_at = now
         else:
             location = UserLocation(
                 user_id=user_id,
@@ -27,15 +33,30 @@ class LocationRepository:
                 accuracy_m=accuracy_m
             )
             self.db.add(location)
+        location.last_written_at = now
         
         self.db.commit()
         self.db.refresh(location)
         return location
     
+    def touch_user_location(self, location: UserLocation, updated_at: Optional[datetime] = None) -> UserLocation:
+        """Refresh a stored location's updated_at without moving it (last_written_at is kept)."""
+        location.updated_at = updated_at or datetime.utcnow()
+        self.db.commit()
+        self.db.refresh(location)
+        return location
+    
     def get_user_location(self, user_id: int) -> Optional[UserLocation]:
         """Get user's current location."""
         return self.db.query(UserLocation).filter(UserLocation.user_id == user_id).first()
     
+    def get_user_locations_updated_since(self, since: Optional[datetime] = None) -> List[UserLocation]:
+        """Get current locations changed at or after `since` (all locations when None)."""
+        query = self.db.query(UserLocation)
+        if since:
+            query = query.filter(UserLocation.updated_at >= since)
+        return query.all()
+    
     def get_friends_locations(self, user_id: int, friend_ids: List[int]) -> List[dict]:
         """Get locations for multiple friends."""
         locations = self.db.query(UserLocation, User).join(
@@ -59,7 +80,7 @@ class LocationRepository:
         
         return result
     
-    def add_location_history(self, user_id: int, latitude: str, longitude: str, 
+    def add_location_history(self, user_id: int, latitude: float, longitude: float, 
                            recorded_at: datetime, altitude_m: Optional[str] = None,
                            accuracy_m: Optional[str] = None, speed_mps: Optional[str] = None,
                            heading_deg: Optional[str] = None, source: str = "gps") -> UserLocationHistory:
@@ -80,6 +101,42 @@ class LocationRepository:
         self.db.refresh(history)
         return history
     
+    def add_location_history_batch(self, user_id: int, points: List[dict]) -> int:
+        """
+        Insert many location history records for one user.
+        Each point holds the LocationHistoryCreate fields. Returns number of rows inserted.
+        """
+        return self.add_location_history_rows([
+            {
+                "user_id": user_id,
+                "latitude": point["latitude"],
+                "longitude": point["longitude"],
+                "recorded_at": point["recorded_at"],
+                "altitude_m": point.get("altitude_m"),
+                "accuracy_m": point.get("accuracy_m"),
+                "speed_mps": point.get("speed_mps"),
+                "heading_deg": point.get("heading_deg"),
+                "source": point.get("source") or "gps"
+            }
+            for point in points
+        ])
+    
+    def add_location_history_rows(self, rows: List[dict]) -> int:
+        """
+        Insert location history rows (any users) with one multi-row INSERT and one commit.
+        Returns number of rows inserted.
+        """
+        if not rows:
+            return 0
+        
+        try:
+            self.db.execute(insert(UserLocationHistory), rows)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return len(rows)
+    
     def get_location_history(self, user_id: int, start_date: Optional[datetime] = None, 
                             end_date: Optional[datetime] = None) -> List[UserLocationHistory]:
         """Get user's location history."""
@@ -91,4 +148,176 @@ class LocationRepository:
             query = query.filter(UserLocationHistory.recorded_at <= end_date)
         
         return query.order_by(UserLocationHistory.recorded_at.desc()).all()
-
+    
+    def get_location_history_page(self, user_id: int, limit: int,
+                                  before: Optional[tuple] = None,
+                                  start_date: Optional[datetime] = None,
+                                  end_date: Optional[datetime] = None) -> List[UserLocationHistory]:
+        """
+        Get up to `limit` history records, most recent first, strictly after the
+        keyset position `before` = (recorded_at, id) of the previous page's last row.
+        """
+        query = self.db.query(UserLocationHistory).filter(UserLocationHistory.user_id == user_id)
+        
+        if start_date:
+            query = query.filter(UserLocationHistory.recorded_at >= start_date)
+        if end_date:
+            query = query.filter(UserLocationHistory.recorded_at <= end_date)
+        if before:
+            before_recorded_at, before_id = before
+            query = query.filter(
+                or_(
+                    UserLocationHistory.recorded_at < before_recorded_at,
+                    and_(
+                        UserLocationHistory.recorded_at == before_recorded_at,
+                        UserLocationHistory.id < before_id
+                    )
+                )
+            )
+        
+        return query.order_by(
+            UserLocationHistory.recorded_at.desc(),
+            UserLocationHistory.id.desc()
+        ).limit(limit).all()
+    
+    def iter_location_history(self, user_id: int, start_date: Optional[datetime] = None,
+                              end_date: Optional[datetime] = None, batch_size: int = 1000) -> Iterator:
+        """
+        Stream a user's location history oldest first without loading it all in memory.
+        Uses a server-side cursor and yields plain rows (no ORM identity map) in batches of batch_size.
+        """
+        query = self.db.query(
+            UserLocationHistory.id,
+            UserLocationHistory.recorded_at,
+            UserLocationHistory.latitude,
+            UserLocationHistory.longitude,
+            UserLocationHistory.accuracy_m,
+            UserLocationHistory.altitude_m,
+            UserLocationHistory.speed_mps,
+            UserLocationHistory.heading_deg,
+            UserLocationHistory.source
+        ).filter(UserLocationHistory.user_id == user_id)
+        
+        if start_date:
+            query = query.filter(UserLocationHistory.recorded_at >= start_date)
+        if end_date:
+            query = query.filter(UserLocationHistory.recorded_at <= end_date)
+        
+        return iter(query.order_by(UserLocationHistory.recorded_at.asc(), UserLocationHistory.id.asc()).yield_per(batch_size))
+    
+    def get_history_for_downsampling_page(self, start: datetime, end: datetime, limit: int,
+                                          after: Optional[tuple] = None) -> List:
+        """
+        Get up to `limit` (id, user_id, recorded_at) rows of history in
+        [start, end), grouped by user and ordered by time within each user,
+        strictly after the keyset position `after` = (user_id, recorded_at, id)
+        of the previous page's last row.
+        """
+        query = self.db.query(
+            UserLocationHistory.id,
+            UserLocationHistory.user_id,
+            UserLocationHistory.recorded_at
+        ).filter(
+            UserLocationHistory.recorded_at >= start,
+            UserLocationHistory.recorded_at < end
+        )
+        if after:
+            after_user_id, after_recorded_at, after_id = after
+            query = query.filter(
+                or_(
+                    UserLocationHistory.user_id > after_user_id,
+                    and_(
+                        UserLocationHistory.user_id == after_user_id,
+                        or_(
+                            UserLocationHistory.recorded_at > after_recorded_at,
+                            and_(
+                                UserLocationHistory.recorded_at == after_recorded_at,
+                                UserLocationHistory.id > after_id
+                            )
+                        )
+                    )
+                )
+            )
+        
+        return query.order_by(
+            UserLocationHistory.user_id.asc(),
+            UserLocationHistory.recorded_at.asc(),
+            UserLocationHistory.id.asc()
+        ).limit(limit).all()
+    
+    def delete_location_history_by_ids(self, ids: List[int]) -> int:
+        """Delete history rows by id in one statement. Returns number of rows deleted."""
+        if not ids:
+            return 0
+        try:
+            result = self.db.execute(
+                delete(UserLocationHistory).where(UserLocationHistory.id.in_(ids))
+            )
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return result.rowcount
+    
+    def delete_location_history_before(self, cutoff: datetime, batch_size: int = 5000) -> int:
+        """
+        Delete every history row recorded before cutoff, batch_size rows per
+        transaction so the table is never locked for long. Returns rows deleted.
+        """
+        deleted = 0
+        while True:
+            ids = [
+                row.id for row in self.db.query(UserLocationHistory.id)
+                .filter(UserLocationHistory.recorded_at < cutoff)
+                .limit(batch_size)
+                .all()
+            ]
+            if not ids:
+                return deleted
+            deleted += self.delete_location_history_by_ids(ids)
+    
+    def supports_history_partitions(self) -> bool:
+        """Monthly partitions of user_location_history only exist on MySQL."""
+        return self.db.get_bind().dialect.name == "mysql"
+    
+    def get_history_partitions(self) -> List[str]:
+        """Names of the partitions of user_location_history, in boundary order."""
+        if not self.supports_history_partitions():
+            return []
+        rows = self.db.execute(
+            text(
+                "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table "
+                "AND PARTITION_NAME IS NOT NULL "
+                "ORDER BY PARTITION_ORDINAL_POSITION"
+            ),
+            {"table": UserLocationHistory.__tablename__}
+        ).all()
+        return [row[0] for row in rows]
+    
+    def drop_history_partitions(self, names: List[str]):
+        """Drop whole partitions (and every row in them) without a row-by-row DELETE."""
+        if not names:
+            return
+        self.db.execute(text(
+            f"ALTER TABLE {UserLocationHistory.__tablename__} DROP PARTITION {', '.join(names)}"
+        ))
+        self.db.commit()
+    
+    def add_history_partitions(self, partitions: List[tuple], catch_all: str = "pmax"):
+        """
+        Split new partitions off the MAXVALUE catch-all partition.
+        partitions is a list of (name, upper_bound) with upper_bound a date (exclusive).
+        """
+        if not partitions:
+            return
+        definitions = [
+            f"PARTITION {name} VALUES LESS THAN (TO_DAYS('{upper_bound.isoformat()}'))"
+            for name, upper_bound in partitions
+        ]
+        definitions.append(f"PARTITION {catch_all} VALUES LESS THAN MAXVALUE")
+        self.db.execute(text(
+            f"ALTER TABLE {UserLocationHistory.__tablename__} "
+            f"REORGANIZE PARTITION {catch_all} INTO ({', '.join(definitions)})"
+        ))
+        self.db.commit()
@@ -13,7 +13,7 @@ class MeetingRepository:
     
     def create(self, organizer_id: int, title: Optional[str] = None, 
                description: Optional[str] = None, location_id: Optional[int] = None,
-               latitude: Optional[str] = None, longitude: Optional[str] = None,
+               latitude: Optional[float] = None, longitude: Optional[float] = None,
                address: Optional[str] = None, scheduled_at: datetime = None,
                status: str = "pending") -> Meeting:
         """Create a new meeting."""
@@ -70,6 +70,18 @@ class MeetingRepository:
         self.db.refresh(meeting)
         return meeting
     
+    def replace_address(self, meeting_id: int, expected: str, address: str) -> bool:
+        """
+        Set a meeting's address only if it is still `expected`, so an address
+        edited in the meantime is never overwritten. Returns whether it changed.
+        """
+        updated = self.db.query(Meeting).filter(
+            Meeting.id == meeting_id,
+            Meeting.address == expected
+        ).update({"address": address}, synchronize_session=False)
+        self.db.commit()
+        return updated > 0
+    
     def delete(self, meeting_id: int) -> bool:
         """Delete a meeting (cascade will delete participants)."""
         meeting = self.get_by_id(meeting_id)
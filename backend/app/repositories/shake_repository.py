@@ -1,31 +1,58 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, cast
-from sqlalchemy.types import Float
+from sqlalchemy import and_
 from app.models.shake_session import ShakeSession, ShakeSessionStatus
-from typing import Optional, List
-from datetime import datetime, timedelta
+from typing import Dict, Optional, List
+from datetime import datetime
 
 class ShakeRepository:
     def __init__(self, db: Session):
         self.db = db
     
-    def create_session(
-        self,
-        user_id: int,
-        latitude: str,
-        longitude: str,
-        accuracy_m: Optional[str] = None,
-        expires_in_seconds: int = 15
-    ) -> ShakeSession:
-        """Create a new shake session."""
-        expires_at = datetime.utcnow() + timedelta(seconds=expires_in_seconds)
+    def mark_sessions_matched(self, matched_user_ids: Dict[int, int], meeting_id: int) -> List[ShakeSession]:
+        """
+        Mark ACTIVE sessions as MATCHED in one transaction. matched_user_ids maps
+        session ID -> the user it matched with. Every row is claimed with a
+        conditional UPDATE on status; if any is no longer active nothing is
+        changed and ValueError is raised. Returns the sessions in the given order.
+        """
+        now = datetime.utcnow()
+        for session_id, matched_user_id in matched_user_ids.items():
+            claimed = self.db.query(ShakeSession).filter(
+                and_(
+                    ShakeSession.id == session_id,
+                    ShakeSession.status == ShakeSessionStatus.ACTIVE
+                )
+            ).update({
+                "status": ShakeSessionStatus.MATCHED,
+                "matched_user_id": matched_user_id,
+                "matched_at": now,
+                "meeting_id": meeting_id
+            }, synchronize_session=False)
+            if claimed != 1:
+                self.db.rollback()
+                raise ValueError("One or more sessions are not active")
         
+        self.db.commit()
+        sessions = {
+            session.id: session
+            for session in self.db.query(ShakeSession).filter(ShakeSession.id.in_(list(matched_user_ids))).all()
+        }
+        for session in sessions.values():
+            self.db.refresh(session)
+        return [sessions[session_id] for session_id in matched_user_ids]
+    
+    def create_active_session(self, shake) -> ShakeSession:
+        """
+        Persist a pending shake as an ACTIVE session.
+        shake needs user_id, latitude, longitude, accuracy_m, created_at and expires_at.
+        """
         session = ShakeSession(
-            user_id=user_id,
-            latitude=latitude,
-            longitude=longitude,
-            accuracy_m=accuracy_m,
-            expires_at=expires_at,
+            user_id=shake.user_id,
+            latitude=shake.latitude,
+            longitude=shake.longitude,
+            accuracy_m=shake.accuracy_m,
+            created_at=shake.created_at,
+            expires_at=shake.expires_at,
             status=ShakeSessionStatus.ACTIVE
         )
         self.db.add(session)
@@ -33,109 +60,49 @@ class ShakeRepository:
         self.db.refresh(session)
         return session
     
-    def get_active_session_by_user(self, user_id: int) -> Optional[ShakeSession]:
-        """Get user's active shake session."""
-        return self.db.query(ShakeSession).filter(
-            and_(
-                ShakeSession.user_id == user_id,
-                ShakeSession.status == ShakeSessionStatus.ACTIVE,
-                ShakeSession.expires_at > datetime.utcnow()
-            )
-        ).first()
-    
-    def find_nearby_active_sessions(
-        self,
-        user_id: int,
-        latitude: float,
-        longitude: float,
-        max_distance_m: float = 100.0,
-        time_window_seconds: int = 15
-    ) -> List[ShakeSession]:
-        """
-        Find nearby active shake sessions from friends.
-        Uses a bounding box approximation for initial filtering, then calculates exact distance.
-        """
-        # Bounding box approximation (rough, but fast for initial filtering)
-        # 1 degree latitude ≈ 111 km, so 100m ≈ 0.0009 degrees
-        # For longitude, it varies by latitude, but we'll use a conservative estimate
-        lat_delta = max_distance_m / 111000.0  # ~0.0009 for 100m
-        lon_delta = max_distance_m / (111000.0 * abs(1.0 / (1.0 + latitude / 90.0)))  # Adjust for latitude
-        
-        time_threshold = datetime.utcnow() - timedelta(seconds=time_window_seconds)
-        
-        # Get all active sessions within bounding box
-        sessions = self.db.query(ShakeSession).filter(
+    def update_session_location(self, session_id: int, latitude: float, longitude: float,
+                                accuracy_m: Optional[str] = None) -> int:
+        """Move an ACTIVE session. Returns number of rows updated."""
+        values = {"latitude": latitude, "longitude": longitude}
+        if accuracy_m:
+            values["accuracy_m"] = accuracy_m
+        updated = self.db.query(ShakeSession).filter(
             and_(
-                ShakeSession.user_id != user_id,  # Exclude self
-                ShakeSession.status == ShakeSessionStatus.ACTIVE,
-                ShakeSession.expires_at > datetime.utcnow(),
-                ShakeSession.created_at >= time_threshold,
-                # Bounding box filter - cast string columns to float for comparison
-                func.abs(cast(ShakeSession.latitude, Float) - latitude) <= lat_delta,
-                func.abs(cast(ShakeSession.longitude, Float) - longitude) <= lon_delta,
+                ShakeSession.id == session_id,
+                ShakeSession.status == ShakeSessionStatus.ACTIVE
             )
-        ).all()
-        
-        # Filter by exact distance using Haversine formula
-        nearby_sessions = []
-        for session in sessions:
-            try:
-                session_lat = float(session.latitude)
-                session_lon = float(session.longitude)
-                distance = self._haversine_distance(latitude, longitude, session_lat, session_lon)
-                if distance <= max_distance_m:
-                    nearby_sessions.append(session)
-            except (ValueError, TypeError):
-                continue  # Skip invalid coordinates
-        
-        return nearby_sessions
+        ).update(values, synchronize_session=False)
+        self.db.commit()
+        return updated
     
-    def _haversine_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    def create_matched_group(self, shakes, meeting_id: int) -> List[ShakeSession]:
         """
-        Calculate distance between two points using Haversine formula.
-        Returns distance in meters.
+        Persist a group of shakes matched in memory as MATCHED sessions, in the
+        given order. Each session's matched_user_id is the lowest other member ID.
         """
-        from math import radians, sin, cos, sqrt, atan2
-        
-        R = 6371000  # Earth radius in meters
-        
-        lat1_rad = radians(lat1)
-        lat2_rad = radians(lat2)
-        delta_lat = radians(lat2 - lat1)
-        delta_lon = radians(lon2 - lon1)
-        
-        a = sin(delta_lat / 2) ** 2 + cos(lat1_rad) * cos(lat2_rad) * sin(delta_lon / 2) ** 2
-        c = 2 * atan2(sqrt(a), sqrt(1 - a))
-        
-        return R * c
-    
-    def match_sessions(self, session1_id: int, session2_id: int, meeting_id: int) -> tuple[ShakeSession, ShakeSession]:
-        """Match two shake sessions and mark them as matched."""
-        session1 = self.db.query(ShakeSession).filter(ShakeSession.id == session1_id).first()
-        session2 = self.db.query(ShakeSession).filter(ShakeSession.id == session2_id).first()
-        
-        if not session1 or not session2:
-            raise ValueError("One or both sessions not found")
-        
-        if session1.status != ShakeSessionStatus.ACTIVE or session2.status != ShakeSessionStatus.ACTIVE:
-            raise ValueError("One or both sessions are not active")
-        
         now = datetime.utcnow()
-        session1.status = ShakeSessionStatus.MATCHED
-        session1.matched_user_id = session2.user_id
-        session1.matched_at = now
-        session1.meeting_id = meeting_id
-        
-        session2.status = ShakeSessionStatus.MATCHED
-        session2.matched_user_id = session1.user_id
-        session2.matched_at = now
-        session2.meeting_id = meeting_id
+        user_ids = sorted(shake.user_id for shake in shakes)
+        sessions = []
+        for shake in shakes:
+            session = ShakeSession(
+                user_id=shake.user_id,
+                latitude=shake.latitude,
+                longitude=shake.longitude,
+                accuracy_m=shake.accuracy_m,
+                created_at=shake.created_at,
+                expires_at=shake.expires_at,
+                matched_user_id=next(user_id for user_id in user_ids if user_id != shake.user_id),
+                matched_at=now,
+                meeting_id=meeting_id,
+                status=ShakeSessionStatus.MATCHED
+            )
+            self.db.add(session)
+            sessions.append(session)
         
         self.db.commit()
-        self.db.refresh(session1)
-        self.db.refresh(session2)
-        
-        return session1, session2
+        for session in sessions:
+            self.db.refresh(session)
+        return sessions
     
     def expire_old_sessions(self) -> int:
         """Expire sessions that have passed their expiration time. Returns count of expired sessions."""
@@ -144,11 +111,28 @@ class ShakeRepository:
                 ShakeSession.status == ShakeSessionStatus.ACTIVE,
                 ShakeSession.expires_at <= datetime.utcnow()
             )
-        ).update({"status": ShakeSessionStatus.EXPIRED})
+        ).update({"status": ShakeSessionStatus.EXPIRED}, synchronize_session=False)
         self.db.commit()
         return expired
     
-    def get_session_by_id(self, session_id: int) -> Optional[ShakeSession]:
-        """Get shake session by ID."""
-        return self.db.query(ShakeSession).filter(ShakeSession.id == session_id).first()
-
+    def delete_finished_sessions_before(self, cutoff: datetime, batch_size: int = 5000) -> int:
+        """
+        Delete matched and expired sessions created before cutoff, batch_size rows
+        per transaction. Returns number of rows deleted.
+        """
+        deleted = 0
+        while True:
+            ids = [
+                row.id for row in self.db.query(ShakeSession.id).filter(
+                    and_(
+                        ShakeSession.status.in_([ShakeSessionStatus.MATCHED, ShakeSessionStatus.EXPIRED]),
+                        ShakeSession.created_at < cutoff
+                    )
+                ).limit(batch_size).all()
+            ]
+            if not ids:
+                return deleted
+            deleted += self.db.query(ShakeSession).filter(
+                ShakeSession.id.in_(ids)
+            ).delete(synchronize_session=False)
+            self.db.commit()
@@ -0,0 +1,82 @@
+"""Storage backends deciding which shakes reach the shake_sessions table."""
+from abc import ABC, abstractmethod
+from sqlalchemy.orm import Session
+from typing import List
+from app.core.config import settings
+from app.core.shake_matcher import PendingShake
+from app.models.shake_session import ShakeSession
+from app.repositories.shake_repository import ShakeRepository
+
+
+class ShakeStore(ABC):
+    """
+    Pending shakes always wait for a partner in the in-memory shake matcher;
+    a store decides what of their life cycle is written to the database.
+    Neither store shares pending shakes between worker processes.
+    """
+
+    def __init__(self, db: Session):
+        self.shake_repo = ShakeRepository(db)
+
+    def shake_started(self, shake: PendingShake):
+        """A new pending shake was registered."""
+
+    def shake_moved(self, shake: PendingShake):
+        """A pending shake was re-sent from a new position."""
+
+    @abstractmethod
+    def shakes_matched(self, shakes: List[PendingShake], meeting_id: int) -> List[ShakeSession]:
+        """Persist the outcome of a match. Returns one MATCHED session per shake, in order."""
+
+
+class EphemeralShakeStore(ShakeStore):
+    """
+    Only matches are written. Pending shakes live and expire in memory, so an
+    unmatched shake costs no database write at all; they are also only visible
+    to the worker process that received them.
+    """
+
+    def shakes_matched(self, shakes: List[PendingShake], meeting_id: int) -> List[ShakeSession]:
+        return self.shake_repo.create_matched_group(shakes, meeting_id)
+
+
+class SqlShakeStore(ShakeStore):
+    """
+    Every shake is written as an ACTIVE row when it starts, for audit. A match
+    marks those rows MATCHED and the expiry sweeper marks the rest EXPIRED.
+    """
+
+    def shake_started(self, shake: PendingShake):
+        shake.record_id = self.shake_repo.create_active_session(shake).id
+
+    def shake_moved(self, shake: PendingShake):
+        if shake.record_id:
+            self.shake_repo.update_session_location(shake.record_id, shake.latitude, shake.longitude, shake.accuracy_m)
+
+    def shakes_matched(self, shakes: List[PendingShake], meeting_id: int) -> List[ShakeSession]:
+        for shake in shakes:
+            if not shake.record_id:
+                self.shake_started(shake)
+        # Same rule as create_matched_group: matched with the lowest other member ID
+        user_ids = sorted(shake.user_id for shake in shakes)
+        return self.shake_repo.mark_sessions_matched(
+            {
+                shake.record_id: next(user_id for user_id in user_ids if user_id != shake.user_id)
+                for shake in shakes
+            },
+            meeting_id
+        )
+
+
+SHAKE_STORES = {
+    "memory": EphemeralShakeStore,
+    "sql": SqlShakeStore,
+}
+
+
+def get_shake_store(db: Session) -> ShakeStore:
+    """The shake store selected by SHAKE_STORAGE_BACKEND."""
+    store_class = SHAKE_STORES.get(settings.SHAKE_STORAGE_BACKEND)
+    if store_class is None:
+        raise ValueError(f"Unknown SHAKE_STORAGE_BACKEND: {settings.SHAKE_STORAGE_BACKEND!r}")
+    return store_class(db)
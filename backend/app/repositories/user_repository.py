@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, and_, select
 from app.models.user import User
 from app.core.security import get_password_hash, verify_password
 from typing import Optional, List
@@ -86,3 +87,52 @@ class UserRepository:
             query_builder = query_builder.filter(User.id != exclude_user_id)
         
         return query_builder.limit(limit).all()
+
+
+class AsyncUserRepository:
+    """AsyncSession variant of UserRepository for code running on the event loop."""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_by_id(self, user_id: int) -> Optional[User]:
+        """Get user by ID."""
+        return await self.db.get(User, user_id)
+    
+    async def get_by_ids(self, user_ids: List[int]) -> List[User]:
+        """Get several users in one query."""
+        if not user_ids:
+            return []
+        result = await self.db.execute(select(User).where(User.id.in_(user_ids)))
+        return list(result.scalars().all())
+    
+    async def get_by_email(self, email: str) -> Optional[User]:
+        """Get user by email."""
+        result = await self.db.execute(select(User).where(User.email == email))
+        return result.scalars().first()
+    
+    async def get_by_username(self, username: str) -> Optional[User]:
+        """Get user by username."""
+        result = await self.db.execute(select(User).where(User.username == username))
+        return result.scalars().first()
+    
+    async def get_by_email_or_username(self, identifier: str) -> Optional[User]:
+        """Get user by email or username."""
+        result = await self.db.execute(
+            select(User).where(or_(User.email == identifier, User.username == identifier))
+        )
+        return result.scalars().first()
+    
+    async def update(self, user_id: int, **kwargs) -> Optional[User]:
+        """Update user fields. Pass fields to update as keyword arguments."""
+        user = await self.get_by_id(user_id)
+        if not user:
+            return None
+        
+        for key, value in kwargs.items():
+            if hasattr(user, key) and value is not None:
+                setattr(user, key, value)
+        
+        await self.db.commit()
+        await self.db.refresh(user)
+        return user
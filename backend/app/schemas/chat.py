@@ -9,6 +9,10 @@ class MessageCreate(BaseModel):
     friend_id: int = Field(..., description="ID of the friend to send message to")
     content: str = Field(..., min_length=1, max_length=10000, description="Message content")
     message_type: str = Field(default="text", description="Type of message: text, image, location")
+    client_message_id: Optional[str] = Field(
+        None, min_length=1, max_length=64,
+        description="Client-generated idempotency key; resending with the same key returns the original message"
+    )
 
 
 class UserInfo(BaseModel):
@@ -27,6 +31,7 @@ class MessageResponse(BaseModel):
     sender_id: int
     content: str
     message_type: str
+    client_message_id: Optional[str] = None
     is_read: bool
     read_at: Optional[datetime] = None
     created_at: datetime
@@ -52,6 +57,7 @@ class MessagesResponse(BaseModel):
     conversation_id: int
     messages: List[MessageResponse]
     has_more: bool
+    next_cursor: Optional[str] = Field(None, description="Opaque cursor for the next page in the same direction")
 
 
 class MarkReadResponse(BaseModel):
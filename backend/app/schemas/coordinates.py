@@ -0,0 +1,28 @@
+"""Coordinate types keeping the string wire format of the API."""
+from decimal import Decimal
+from typing import Annotated
+from pydantic import BeforeValidator
+
+
+def _parse_coordinate(value):
+    """Accept coordinates sent as strings (legacy clients) or numbers."""
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            raise ValueError("Latitude and longitude must be valid numbers")
+    return value
+
+
+def _coordinate_to_str(value):
+    """Render stored float coordinates as strings, as the API always has."""
+    if isinstance(value, (float, int, Decimal)) and not isinstance(value, bool):
+        return str(float(value))
+    return value
+
+
+# Request field: accepts "45.123456" or 45.123456, validated as a float
+CoordinateIn = Annotated[float, BeforeValidator(_parse_coordinate)]
+
+# Response field: float from the database, serialized as a string
+CoordinateStr = Annotated[str, BeforeValidator(_coordinate_to_str)]
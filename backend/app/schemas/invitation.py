@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
+from app.schemas.coordinates import CoordinateStr
 
 
 class OrganizerInfo(BaseModel):
@@ -16,8 +17,8 @@ class MeetingInfo(BaseModel):
     id: int
     title: Optional[str]
     description: Optional[str]
-    latitude: Optional[str]
-    longitude: Optional[str]
+    latitude: Optional[CoordinateStr]
+    longitude: Optional[CoordinateStr]
     address: Optional[str]
     scheduled_at: datetime
     status: str
@@ -1,33 +1,38 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
+from app.schemas.coordinates import CoordinateIn, CoordinateStr
 
 class LocationUpdate(BaseModel):
-    latitude: str = Field(..., description="Latitude as string for precision")
-    longitude: str = Field(..., description="Longitude as string for precision")
+    latitude: CoordinateIn = Field(..., description="Latitude (number or numeric string)")
+    longitude: CoordinateIn = Field(..., description="Longitude (number or numeric string)")
     accuracy_m: Optional[str] = Field(None, description="GPS accuracy in meters")
     save_history: bool = Field(True, description="Whether to save to location history")
 
 class LocationResponse(BaseModel):
     user_id: int
-    latitude: str
-    longitude: str
+    latitude: CoordinateStr
+    longitude: CoordinateStr
     accuracy_m: Optional[str]
     updated_at: datetime
+    history_suppressed: bool = False  # True when the update was within the stationary threshold
 
 class FriendLocationResponse(BaseModel):
     user_id: int
     username: str
     full_name: str
-    latitude: str
-    longitude: str
+    latitude: CoordinateStr
+    longitude: CoordinateStr
     accuracy_m: Optional[str]
     updated_at: datetime
     availability_status: str
 
+class NearbyFriendLocationResponse(FriendLocationResponse):
+    distance_m: float
+
 class LocationHistoryCreate(BaseModel):
-    latitude: str
-    longitude: str
+    latitude: CoordinateIn
+    longitude: CoordinateIn
     recorded_at: datetime
     altitude_m: Optional[str] = None
     accuracy_m: Optional[str] = None
@@ -35,10 +40,18 @@ class LocationHistoryCreate(BaseModel):
     heading_deg: Optional[str] = None
     source: str = Field("gps", description="Source: gps, wifi, network, manual")
 
+class LocationHistoryBatchCreate(BaseModel):
+    points: List[LocationHistoryCreate] = Field(..., min_length=1, max_length=1000, description="Buffered location fixes")
+
+class LocationHistoryBatchResponse(BaseModel):
+    inserted: int
+    first_recorded_at: datetime
+    last_recorded_at: datetime
+
 class LocationHistoryResponse(BaseModel):
     id: int
-    latitude: str
-    longitude: str
+    latitude: CoordinateStr
+    longitude: CoordinateStr
     recorded_at: datetime
     accuracy_m: Optional[str]
     altitude_m: Optional[str]
@@ -46,3 +59,7 @@ class LocationHistoryResponse(BaseModel):
     heading_deg: Optional[str]
     source: str
 
+class LocationHistoryPage(BaseModel):
+    items: List[LocationHistoryResponse]
+    next_cursor: Optional[str] = Field(None, description="Opaque cursor for the next (older) page")
+    has_more: bool
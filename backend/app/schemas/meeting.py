@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
+from app.schemas.coordinates import CoordinateIn, CoordinateStr
 
 
 class MeetingCreate(BaseModel):
@@ -8,8 +9,8 @@ class MeetingCreate(BaseModel):
     title: Optional[str] = Field(None, max_length=200, description="Meeting title")
     description: Optional[str] = Field(None, description="Meeting description")
     location_id: Optional[int] = Field(None, description="Location ID if using a registered location")
-    latitude: Optional[str] = Field(None, description="Latitude coordinate")
-    longitude: Optional[str] = Field(None, description="Longitude coordinate")
+    latitude: Optional[CoordinateIn] = Field(None, description="Latitude coordinate")
+    longitude: Optional[CoordinateIn] = Field(None, description="Longitude coordinate")
     address: Optional[str] = Field(None, max_length=255, description="Address string")
     scheduled_at: datetime = Field(..., description="When the meeting is scheduled")
     participant_ids: List[int] = Field(default_factory=list, description="List of friend IDs to invite")
@@ -20,8 +21,8 @@ class MeetingUpdate(BaseModel):
     title: Optional[str] = Field(None, max_length=200)
     description: Optional[str] = None
     location_id: Optional[int] = None
-    latitude: Optional[str] = None
-    longitude: Optional[str] = None
+    latitude: Optional[CoordinateIn] = None
+    longitude: Optional[CoordinateIn] = None
     address: Optional[str] = Field(None, max_length=255)
     scheduled_at: Optional[datetime] = None
     status: Optional[str] = Field(None, description="Meeting status: pending, confirmed, cancelled, completed")
@@ -57,8 +58,8 @@ class MeetingResponse(BaseModel):
     title: Optional[str]
     description: Optional[str]
     location_id: Optional[int]
-    latitude: Optional[str]
-    longitude: Optional[str]
+    latitude: Optional[CoordinateStr]
+    longitude: Optional[CoordinateStr]
     address: Optional[str]
     scheduled_at: datetime
     status: str
@@ -1,13 +1,15 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
+from app.schemas.coordinates import CoordinateIn, CoordinateStr
 
 
 class ShakeInitiateRequest(BaseModel):
     """Schema for shake initiation request."""
-    latitude: str = Field(..., description="Latitude coordinate")
-    longitude: str = Field(..., description="Longitude coordinate")
+    latitude: CoordinateIn = Field(..., description="Latitude coordinate")
+    longitude: CoordinateIn = Field(..., description="Longitude coordinate")
     accuracy_m: Optional[str] = Field(None, description="Location accuracy in meters")
+    group: bool = Field(False, description="Match with every friend shaking nearby instead of just one")
 
 
 class NearbyFriendInfo(BaseModel):
@@ -22,13 +24,15 @@ class NearbyFriendInfo(BaseModel):
 
 class ShakeInitiateResponse(BaseModel):
     """Schema for shake initiation response."""
-    session_id: int
+    session_id: int  # Same for every response about one shake, from the first to the match
+    record_id: Optional[int] = None  # The matched shake_sessions row
     status: str  # "active" or "matched"
     matched: bool
     message: str
     nearby_friends_count: int = 0
     matched_user_id: Optional[int] = None
     matched_user_name: Optional[str] = None
+    matched_user_ids: Optional[List[int]] = None  # Every other member of a group match
     meeting_id: Optional[int] = None
     meeting_title: Optional[str] = None
     points_awarded: Optional[int] = None
@@ -43,8 +47,8 @@ class NearbyFriendsResponse(BaseModel):
 class ShakeSessionResponse(BaseModel):
     """Schema for active shake session response."""
     session_id: int
-    latitude: str
-    longitude: str
+    latitude: CoordinateStr
+    longitude: CoordinateStr
     created_at: str
     expires_at: str
     status: str
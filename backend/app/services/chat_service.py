@@ -5,8 +5,10 @@ from app.repositories.friendship_repository import FriendshipRepository
 from app.repositories.user_repository import UserRepository
 from app.services.notification_service import NotificationService
 from app.core.exceptions import NotFoundError, ValidationError, ForbiddenError
+from app.core.pagination import encode_cursor, decode_cursor
 from app.models.chat import Conversation, Message
-from typing import List, Dict, Optional
+from sqlalchemy.exc import IntegrityError
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 
 
@@ -101,12 +103,25 @@ class ChatService:
         user_id: int,
         friend_id: int,
         content: str,
-        message_type: str = "text"
-    ) -> Dict:
+        message_type: str = "text",
+        client_message_id: Optional[str] = None
+    ) -> Tuple[Dict, bool]:
         """
         Send a message to a friend.
         Creates conversation if it doesn't exist.
+        
+        Returns the message and whether it was created. A retry carrying a
+        client_message_id the sender already used with this friend returns
+        the original message instead of creating (and notifying) it twice.
         """
+        if client_message_id:
+            conversation = self.chat_repo.get_conversation_with_friend(user_id, friend_id)
+            existing = conversation and self.chat_repo.get_message_by_client_id(
+                conversation.id, user_id, client_message_id
+            )
+            if existing:
+                return self._message_to_dict(existing), False
+        
         if not content or not content.strip():
             raise ValidationError("Message content cannot be empty")
         
@@ -122,12 +137,23 @@ class ChatService:
         conversation = self.chat_repo.get_or_create_conversation(user_id, friend_id)
         
         # Create message
-        message = self.chat_repo.create_message(
-            conversation_id=conversation.id,
-            sender_id=user_id,
-            content=content.strip(),
-            message_type=message_type
-        )
+        try:
+            message = self.chat_repo.create_message(
+                conversation_id=conversation.id,
+                sender_id=user_id,
+                content=content.strip(),
+                message_type=message_type,
+                client_message_id=client_message_id
+            )
+        except IntegrityError:
+            # A concurrent retry with the same key got there first
+            self.db.rollback()
+            existing = self.chat_repo.get_message_by_client_id(
+                conversation.id, user_id, client_message_id
+            ) if client_message_id else None
+            if not existing:
+                raise
+            return self._message_to_dict(existing), False
         
         # Get recipient info for notification
         recipient = self.user_repo.get_by_id(friend_id)
@@ -148,56 +174,75 @@ class ChatService:
                 # Log but don't fail the message send
                 print(f"Failed to send chat notification: {e}")
         
-        return {
-            "id": message.id,
-            "conversation_id": message.conversation_id,
-            "sender_id": message.sender_id,
-            "content": message.content,
-            "message_type": message.message_type,
-            "is_read": message.is_read,
-            "created_at": message.created_at.isoformat(),
-        }
+        return self._message_to_dict(message), True
     
     def get_messages(
         self,
         user_id: int,
         conversation_id: int,
         limit: int = 50,
-        offset: int = 0
+        offset: int = 0,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None,
+        cursor: Optional[str] = None
     ) -> Dict:
         """
-        Get message history for a conversation with pagination.
+        Get one page of a conversation's messages, oldest first.
+        
+        Without paging arguments this is the latest page. before_id pages back
+        from a message (older messages), after_id forward from one (newer
+        messages), and the returned next_cursor continues in the same
+        direction. offset is still accepted but gets slower the deeper it goes.
         """
+        if sum(1 for given in (before_id is not None, after_id is not None, cursor, offset) if given) > 1:
+            raise ValidationError("Use only one of before_id, after_id, cursor and offset")
+        
         # Verify user is part of conversation
         conversation = self.chat_repo.get_conversation_by_id(conversation_id, user_id)
         if not conversation:
             raise NotFoundError("Conversation not found")
         
-        # Get messages
-        messages = self.chat_repo.get_messages(conversation_id, limit, offset)
-        
-        # Format messages
-        message_list = []
-        for msg in messages:
-            message_list.append({
-                "id": msg.id,
-                "conversation_id": msg.conversation_id,
-                "sender_id": msg.sender_id,
-                "content": msg.content,
-                "message_type": msg.message_type,
-                "is_read": msg.is_read,
-                "read_at": msg.read_at.isoformat() if msg.read_at else None,
-                "created_at": msg.created_at.isoformat(),
+        forward = after_id is not None
+        position = None
+        if cursor:
+            values = decode_cursor(cursor)
+            try:
+                forward = bool(values["forward"])
+                position = (datetime.fromisoformat(values["created_at"]), int(values["id"]))
+            except (KeyError, TypeError, ValueError):
+                raise ValidationError("Invalid pagination cursor")
+        elif before_id is not None or after_id is not None:
+            anchor = self.chat_repo.get_message(conversation_id, after_id if forward else before_id)
+            if not anchor:
+                raise NotFoundError("Message not found")
+            position = (anchor.created_at, anchor.id)
+        
+        # One extra row tells whether another page exists
+        if forward:
+            messages = self.chat_repo.get_messages(conversation_id, limit + 1, after=position)
+            has_more = len(messages) > limit
+            messages = messages[:limit]
+        else:
+            messages = self.chat_repo.get_messages(conversation_id, limit + 1, offset, before=position)
+            has_more = len(messages) > limit
+            messages = messages[-limit:] if has_more else messages
+        
+        next_cursor = None
+        if has_more:
+            edge = messages[-1] if forward else messages[0]
+            next_cursor = encode_cursor({
+                "created_at": edge.created_at.isoformat(), "id": edge.id, "forward": forward
             })
         
-        # Mark messages as read when user views them
-        if offset == 0:  # Only mark as read when viewing latest messages
+        # Mark messages as read when the page reaches the latest message
+        if (forward and not has_more) or (not forward and position is None and offset == 0):
             self.chat_repo.mark_messages_as_read(conversation_id, user_id)
         
         return {
             "conversation_id": conversation_id,
-            "messages": message_list,
-            "has_more": len(messages) == limit,
+            "messages": [self._message_to_dict(msg) for msg in messages],
+            "has_more": has_more,
+            "next_cursor": next_cursor,
         }
     
     def mark_as_read(self, user_id: int, conversation_id: int) -> Dict:
@@ -219,4 +264,17 @@ class ChatService:
         return {
             "unread_count": count,
         }
-
+    
+    @staticmethod
+    def _message_to_dict(message: Message) -> Dict:
+        return {
+            "id": message.id,
+            "conversation_id": message.conversation_id,
+            "sender_id": message.sender_id,
+            "content": message.content,
+            "message_type": message.message_type,
+            "client_message_id": message.client_message_id,
+            "is_read": message.is_read,
+            "read_at": message.read_at.isoformat() if message.read_at else None,
+            "created_at": message.created_at.isoformat(),
+        }
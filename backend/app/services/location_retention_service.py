@@ -0,0 +1,182 @@
+"""Service for ageing out location history (downsampling and expiry)."""
+from sqlalchemy.orm import Session
+from app.repositories.job_state_repository import JobStateRepository
+from app.repositories.location_repository import LocationRepository
+from app.core.config import settings
+from typing import List, Optional, Tuple
+from datetime import datetime, date, timedelta
+import re
+
+PARTITION_NAME = re.compile(r"^p(\d{4})(\d{2})$")
+EPOCH = datetime(1970, 1, 1)
+
+
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _next_month(value: date) -> date:
+    if value.month == 12:
+        return date(value.year + 1, 1, 1)
+    return date(value.year, value.month + 1, 1)
+
+
+def _day_start(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class LocationRetentionService:
+    """
+    Applies the location history retention policy:
+
+    - rows newer than `full_resolution_days` are kept as recorded;
+    - older rows are thinned to the first point per user per `downsample_minutes`;
+    - rows older than `retention_days` are removed, by dropping whole monthly
+      partitions where the table is partitioned (MySQL) and by batched DELETE
+      for whatever is left.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        full_resolution_days: int = settings.LOCATION_HISTORY_FULL_RESOLUTION_DAYS,
+        downsample_minutes: int = settings.LOCATION_HISTORY_DOWNSAMPLE_MINUTES,
+        retention_days: int = settings.LOCATION_HISTORY_RETENTION_DAYS,
+        batch_size: int = settings.LOCATION_HISTORY_RETENTION_BATCH_SIZE,
+        future_partitions: int = settings.LOCATION_HISTORY_FUTURE_PARTITIONS
+    ):
+        self.location_repo = LocationRepository(db)
+        self.full_resolution_days = full_resolution_days
+        self.downsample_minutes = downsample_minutes
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.future_partitions = future_partitions
+        self.db = db
+
+    def run(self, now: Optional[datetime] = None, downsample_from: Optional[datetime] = None) -> dict:
+        """
+        Run one retention pass.
+
+        downsample_from skips history already thinned by an earlier pass (the
+        `downsampled_until` value it returned); when None, everything between the
+        retention horizon and the full-resolution cutoff is scanned.
+        """
+        now = now or datetime.utcnow()
+        horizon = now - timedelta(days=self.retention_days)
+        cutoff = now - timedelta(days=self.full_resolution_days)
+
+        partitions_added = self.ensure_future_partitions(now.date())
+        partitions_dropped = self.drop_expired_partitions(horizon)
+        expired = self.location_repo.delete_location_history_before(horizon, self.batch_size)
+
+        start = max(downsample_from or horizon, horizon)
+        downsampled = self.downsample(start, cutoff)
+
+        return {
+            "partitions_added": partitions_added,
+            "partitions_dropped": partitions_dropped,
+            "expired_deleted": expired,
+            "downsampled_deleted": downsampled,
+            "downsampled_until": max(start, cutoff)
+        }
+
+    def downsample(self, start: datetime, end: datetime) -> int:
+        """
+        Keep only the first point per user per downsample_minutes bucket for
+        history recorded in [start, end). Returns number of rows deleted.
+
+        Works one UTC day at a time, reading each day in keyset pages of
+        batch_size rows and deleting a page's surplus points before reading the
+        next, so neither the rows held nor one DELETE exceed batch_size.
+        Re-running over an already thinned range is a no-op.
+        """
+        if self.downsample_minutes <= 0 or start >= end:
+            return 0
+
+        bucket_seconds = self.downsample_minutes * 60
+        deleted = 0
+        day = _day_start(start)
+        while day < end:
+            window_start = max(day, start)
+            window_end = min(day + timedelta(days=1), end)
+
+            last_key: Optional[Tuple[int, int]] = None
+            after = None
+            while True:
+                rows = self.location_repo.get_history_for_downsampling_page(
+                    window_start, window_end, self.batch_size, after
+                )
+                if not rows:
+                    break
+                drop_ids = []
+                for row in rows:
+                    bucket = int((row.recorded_at - EPOCH).total_seconds()) // bucket_seconds
+                    key = (row.user_id, bucket)
+                    if key == last_key:
+                        drop_ids.append(row.id)
+                    else:
+                        last_key = key
+                deleted += self.location_repo.delete_location_history_by_ids(drop_ids)
+                last = rows[-1]
+                after = (last.user_id, last.recorded_at, last.id)
+            day += timedelta(days=1)
+
+        return deleted
+
+    def ensure_future_partitions(self, today: date) -> List[str]:
+        """
+        Make sure monthly partitions exist up to future_partitions months ahead,
+        so new rows never land in the catch-all partition.
+        """
+        months = self._partition_months()
+        if not months:
+            return []
+
+        wanted = _month_start(today)
+        for _ in range(self.future_partitions):
+            wanted = _next_month(wanted)
+
+        new_partitions = []
+        month = _next_month(max(months))
+        while month <= wanted:
+            new_partitions.append((f"p{month:%Y%m}", _next_month(month)))
+            month = _next_month(month)
+
+        self.location_repo.add_history_partitions(new_partitions)
+        return [name for name, _ in new_partitions]
+
+    def drop_expired_partitions(self, horizon: datetime) -> List[str]:
+        """Drop monthly partitions whose whole range is older than the horizon."""
+        expired = [
+            f"p{month:%Y%m}"
+            for month in self._partition_months()
+            if datetime.combine(_next_month(month), datetime.min.time()) <= horizon
+        ]
+        self.location_repo.drop_history_partitions(expired)
+        return expired
+
+    def _partition_months(self) -> List[date]:
+        """First day of every monthly (pYYYYMM) partition of the history table."""
+        months = []
+        for name in self.location_repo.get_history_partitions():
+            match = PARTITION_NAME.match(name)
+            if match:
+                months.append(date(int(match.group(1)), int(match.group(2)), 1))
+        return sorted(months)
+
+
+class LocationRetentionTask:
+    """
+    Periodic job task running LocationRetentionService. Stores how far history
+    has already been downsampled in background_job_state, so later passes only
+    scan new days, whichever worker runs them and across restarts.
+    """
+
+    def __init__(self, name: str = "location-history-retention"):
+        self.name = name
+
+    def __call__(self, db: Session) -> dict:
+        state = JobStateRepository(db)
+        result = LocationRetentionService(db).run(downsample_from=state.get_watermark(self.name))
+        state.set_watermark(self.name, result["downsampled_until"])
+        return result
@@ -2,88 +2,239 @@ from sqlalchemy.orm import Session
 from app.repositories.location_repository import LocationRepository
 from app.repositories.friendship_repository import FriendshipRepository
 from app.repositories.user_repository import UserRepository
+from app.core.config import settings
 from app.core.exceptions import NotFoundError, ValidationError
-from typing import List, Optional
+from app.core.location_index import location_index
+from app.core.geo import haversine_distance
+from app.core.location_history_buffer import location_history_buffer
+from app.core.location_subscriptions import location_subscriptions
+from app.core.location_write_stats import location_write_stats
+from app.core.pagination import encode_cursor, decode_cursor
+from app.schemas.location import FriendLocationResponse
+from typing import Iterator, List, Optional, Tuple
 from datetime import datetime
+import csv
+import io
+import json
 
 class LocationService:
+    DEFAULT_HISTORY_PAGE_SIZE = 100
+    
+    # Column order of exported history records
+    EXPORT_FIELDS = [
+        "id", "recorded_at", "latitude", "longitude", "accuracy_m",
+        "altitude_m", "speed_mps", "heading_deg", "source"
+    ]
+    
     def __init__(self, db: Session):
         self.location_repo = LocationRepository(db)
         self.friendship_repo = FriendshipRepository(db)
         self.user_repo = UserRepository(db)
         self.db = db
     
-    def update_location(self, user_id: int, latitude: str, longitude: str, 
+    def update_location(self, user_id: int, latitude: float, longitude: float, 
                        accuracy_m: Optional[str] = None, save_history: bool = True) -> dict:
-        """Update user's current location."""
-        # Validate coordinates
-        try:
-            lat_float = float(latitude)
-            lon_float = float(longitude)
-            if not (-90 <= lat_float <= 90) or not (-180 <= lon_float <= 180):
-                raise ValidationError("Invalid latitude or longitude values")
-        except ValueError:
-            raise ValidationError("Latitude and longitude must be valid numbers")
+        """
+        Update user's current location.
+        
+        An update that stays within the stationary threshold of a recently stored
+        position only refreshes its timestamp: no move, no history row, no push.
+        """
+        latitude, longitude = self._validate_coordinates(latitude, longitude)
+        
+        now = datetime.utcnow()
+        previous = self.location_repo.get_user_location(user_id)
+        if previous and self._is_stationary(previous, latitude, longitude, accuracy_m, now):
+            location = self.location_repo.touch_user_location(previous, now)
+            location_index.upsert(
+                location.user_id,
+                location.latitude,
+                location.longitude,
+                location.accuracy_m,
+                location.updated_at
+            )
+            location_write_stats.record_suppressed()
+            return {
+                "user_id": location.user_id,
+                "latitude": location.latitude,
+                "longitude": location.longitude,
+                "accuracy_m": location.accuracy_m,
+                "updated_at": location.updated_at,
+                "history_suppressed": True
+            }
         
         # Update current location
         location = self.location_repo.update_user_location(
             user_id=user_id,
             latitude=latitude,
             longitude=longitude,
-            accuracy_m=accuracy_m
+            accuracy_m=accuracy_m,
+            location=previous
+        )
+        location_index.upsert(
+            location.user_id,
+            location.latitude,
+            location.longitude,
+            location.accuracy_m,
+            location.updated_at
         )
         
-        # Save to history if enabled (independent of sharing preference)
+        # Save to history if enabled (independent of sharing preference).
+        # Buffered rows are written in batches by the write-behind buffer.
         if save_history:
-            self.location_repo.add_location_history(
-                user_id=user_id,
-                latitude=latitude,
-                longitude=longitude,
-                recorded_at=datetime.utcnow(),
-                accuracy_m=accuracy_m,
-                source="gps"
-            )
+            history_row = {
+                "user_id": user_id,
+                "latitude": latitude,
+                "longitude": longitude,
+                "recorded_at": now,
+                "altitude_m": None,
+                "accuracy_m": accuracy_m,
+                "speed_mps": None,
+                "heading_deg": None,
+                "source": "gps"
+            }
+            if not location_history_buffer.add(history_row):
+                self.location_repo.add_location_history_rows([history_row])
         
-        return {
+        result = {
             "user_id": location.user_id,
             "latitude": location.latitude,
             "longitude": location.longitude,
             "accuracy_m": location.accuracy_m,
-            "updated_at": location.updated_at
+            "updated_at": location.updated_at,
+            "history_suppressed": False
         }
+        location_write_stats.record_written()
+        self._push_location_to_friends(user_id, result)
+        return result
+    
+    def _is_stationary(self, previous, latitude: float, longitude: float,
+                       accuracy_m: Optional[str], now: datetime) -> bool:
+        """
+        Whether a new fix is indistinguishable from the stored one: closer than
+        the reported accuracy (capped) or the configured distance, and the stored
+        position was written recently. Recency is judged by last_written_at, so a
+        device that keeps reporting the same spot still writes history once the
+        stored position is older than the max age.
+        """
+        if not settings.LOCATION_SUPPRESSION_ENABLED or not previous.last_written_at:
+            return False
+        if (now - previous.last_written_at).total_seconds() > settings.LOCATION_STATIONARY_MAX_AGE_SECONDS:
+            return False
+        
+        threshold = settings.LOCATION_STATIONARY_DISTANCE_M
+        try:
+            accuracy = float(accuracy_m) if accuracy_m else 0.0
+        except ValueError:
+            accuracy = 0.0
+        if accuracy <= settings.LOCATION_STATIONARY_MAX_ACCURACY_M:
+            threshold = max(threshold, accuracy)
+        
+        distance = haversine_distance(previous.latitude, previous.longitude, latitude, longitude)
+        return distance <= threshold
+    
+    def _push_location_to_friends(self, user_id: int, location: dict):
+        """Send a new position to friends subscribed to live locations, if sharing is on."""
+        subscribed = location_subscriptions.subscribed_user_ids()
+        if not subscribed:
+            return
+        
+        user = self.user_repo.get_by_id(user_id)
+        if not user or not user.location_sharing_enabled:
+            return
+        
+        recipients = {
+            friend_id: is_close_friend
+            for friend_id, is_close_friend in self.friendship_repo.get_friend_close_flags(user_id).items()
+            if friend_id in subscribed
+        }
+        if not recipients:
+            return
+        
+        friend_location = FriendLocationResponse(**self._friend_location(user, location))
+        location_subscriptions.publish(
+            {"type": "friend_location", "location": friend_location.model_dump(mode="json")},
+            recipients
+        )
+    
+    def _validate_coordinates(self, latitude, longitude) -> Tuple[float, float]:
+        """
+        Parse coordinates (numbers or numeric strings) and check their range.
+        Raises ValidationError, otherwise returns (latitude, longitude) as floats.
+        """
+        try:
+            lat_float = float(latitude)
+            lon_float = float(longitude)
+        except (TypeError, ValueError):
+            raise ValidationError("Latitude and longitude must be valid numbers")
+        if not (-90 <= lat_float <= 90) or not (-180 <= lon_float <= 180):
+            raise ValidationError("Invalid latitude or longitude values")
+        return lat_float, lon_float
     
     def get_friends_locations(self, user_id: int, close_friends_only: bool = False) -> List[dict]:
-        """Get locations of user's friends."""
-        # Get friends list
+        """Get locations of user's friends, served from the in-memory location index."""
+        # Get friends list (already filtered to close friends if requested)
         friends = self.friendship_repo.get_friends(user_id, include_close_only=close_friends_only)
         
         if not friends:
             return []
         
-        # Get friend IDs
-        friend_ids = [friend.id for friend in friends]
+        location_index.refresh_if_stale(self.location_repo.get_user_locations_updated_since)
+        locations = location_index.get_many(friend.id for friend in friends)
         
-        # Get locations
-        locations = self.location_repo.get_friends_locations(user_id, friend_ids)
-        
-        # Filter by location sharing enabled and close friends if needed
+        # Filter by location sharing enabled
         result = []
-        for loc in locations:
-            friend = self.user_repo.get_by_id(loc["user_id"])
-            if not friend or not friend.location_sharing_enabled:
+        for friend in friends:
+            location = locations.get(friend.id)
+            if not location or not friend.location_sharing_enabled:
                 continue
-            
-            # If close_friends_only, check if this friend is marked as close
-            if close_friends_only:
-                friendship = self.friendship_repo.get_friendship(user_id, loc["user_id"])
-                if not friendship or not friendship.is_close_friend:
-                    continue
-            
-            result.append(loc)
+            result.append(self._friend_location(friend, location))
         
         return result
     
-    def add_location_history(self, user_id: int, latitude: str, longitude: str,
+    def get_nearby_friends(self, user_id: int, radius_m: float = 1000.0,
+                           close_friends_only: bool = False) -> List[dict]:
+        """Get friends whose current location is within radius_m of the user, closest first."""
+        location_index.refresh_if_stale(self.location_repo.get_user_locations_updated_since)
+        own_location = location_index.get(user_id)
+        if not own_location:
+            raise NotFoundError("Your location is not known yet")
+        
+        friends = self.friendship_repo.get_friends(user_id, include_close_only=close_friends_only)
+        sharing_friends = {friend.id: friend for friend in friends if friend.location_sharing_enabled}
+        
+        if not sharing_friends:
+            return []
+        
+        nearby = location_index.nearby(
+            own_location["latitude"],
+            own_location["longitude"],
+            radius_m,
+            user_ids=set(sharing_friends)
+        )
+        
+        result = []
+        for location, distance in nearby:
+            friend_location = self._friend_location(sharing_friends[location["user_id"]], location)
+            friend_location["distance_m"] = round(distance, 1)
+            result.append(friend_location)
+        
+        return result
+    
+    def _friend_location(self, friend, location: dict) -> dict:
+        """Format an indexed location for a friend."""
+        return {
+            "user_id": friend.id,
+            "username": friend.username,
+            "full_name": friend.full_name,
+            "latitude": location["latitude"],
+            "longitude": location["longitude"],
+            "accuracy_m": location["accuracy_m"],
+            "updated_at": location["updated_at"],
+            "availability_status": friend.availability_status
+        }
+    
+    def add_location_history(self, user_id: int, latitude: float, longitude: float,
                            recorded_at: datetime, altitude_m: Optional[str] = None,
                            accuracy_m: Optional[str] = None, speed_mps: Optional[str] = None,
                            heading_deg: Optional[str] = None, source: str = "gps") -> dict:
@@ -109,23 +260,118 @@ class LocationService:
             "accuracy_m": history.accuracy_m
         }
     
+    def add_location_history_batch(self, user_id: int, points: List[dict]) -> dict:
+        """
+        Add many location history records in a single transaction.
+        All points are validated first; one invalid point rejects the whole batch.
+        """
+        errors = []
+        for position, point in enumerate(points):
+            try:
+                self._validate_coordinates(point["latitude"], point["longitude"])
+            except ValidationError as e:
+                errors.append(f"points[{position}]: {e.detail}")
+        
+        if errors:
+            raise ValidationError("; ".join(errors[:10]))
+        
+        inserted = self.location_repo.add_location_history_batch(user_id, points)
+        
+        return {
+            "inserted": inserted,
+            "first_recorded_at": min(point["recorded_at"] for point in points),
+            "last_recorded_at": max(point["recorded_at"] for point in points)
+        }
+    
     def get_location_history(self, user_id: int, start_date: Optional[datetime] = None,
                            end_date: Optional[datetime] = None) -> List[dict]:
         """Get user's location history."""
         history = self.location_repo.get_location_history(user_id, start_date, end_date)
         
-        return [
-            {
-                "id": h.id,
-                "latitude": h.latitude,
-                "longitude": h.longitude,
-                "recorded_at": h.recorded_at,
-                "accuracy_m": h.accuracy_m,
-                "altitude_m": h.altitude_m,
-                "speed_mps": h.speed_mps,
-                "heading_deg": h.heading_deg,
-                "source": h.source
-            }
-            for h in history
-        ]
-
+        return [self._history_to_dict(h) for h in history]
+    
+    def get_location_history_page(self, user_id: int, limit: int = DEFAULT_HISTORY_PAGE_SIZE,
+                                  cursor: Optional[str] = None,
+                                  start_date: Optional[datetime] = None,
+                                  end_date: Optional[datetime] = None) -> dict:
+        """
+        Get one page of user's location history, most recent first.
+        Pass the returned next_cursor to get the following page.
+        """
+        before = None
+        if cursor:
+            values = decode_cursor(cursor)
+            try:
+                before = (datetime.fromisoformat(values["recorded_at"]), int(values["id"]))
+            except (KeyError, TypeError, ValueError):
+                raise ValidationError("Invalid pagination cursor")
+        
+        # One extra row tells whether another page exists
+        history = self.location_repo.get_location_history_page(
+            user_id, limit + 1, before=before, start_date=start_date, end_date=end_date
+        )
+        has_more = len(history) > limit
+        history = history[:limit]
+        
+        next_cursor = None
+        if has_more:
+            last = history[-1]
+            next_cursor = encode_cursor({"recorded_at": last.recorded_at.isoformat(), "id": last.id})
+        
+        return {
+            "items": [self._history_to_dict(h) for h in history],
+            "next_cursor": next_cursor,
+            "has_more": has_more
+        }
+    
+    def _history_to_dict(self, h) -> dict:
+        """Format a location history record."""
+        return {
+            "id": h.id,
+            "latitude": h.latitude,
+            "longitude": h.longitude,
+            "recorded_at": h.recorded_at,
+            "accuracy_m": h.accuracy_m,
+            "altitude_m": h.altitude_m,
+            "speed_mps": h.speed_mps,
+            "heading_deg": h.heading_deg,
+            "source": h.source
+        }
+    
+    def export_location_history(self, user_id: int, start_date: Optional[datetime] = None,
+                                end_date: Optional[datetime] = None, export_format: str = "ndjson",
+                                batch_size: int = 1000) -> Iterator[str]:
+        """
+        Export user's location history (oldest first) as NDJSON or CSV text chunks.
+        Rows are read through a server-side cursor, so memory stays flat for any range.
+        """
+        if export_format not in ("ndjson", "csv"):
+            raise ValidationError("Export format must be 'ndjson' or 'csv'")
+        
+        rows = self.location_repo.iter_location_history(user_id, start_date, end_date, batch_size)
+        buffer = io.StringIO()
+        writer = None
+        if export_format == "csv":
+            writer = csv.writer(buffer)
+            writer.writerow(self.EXPORT_FIELDS)
+        
+        pending = 0
+        for row in rows:
+            record = dict(zip(self.EXPORT_FIELDS, row))
+            record["recorded_at"] = record["recorded_at"].isoformat()
+            if writer:
+                writer.writerow(record[field] for field in self.EXPORT_FIELDS)
+            else:
+                buffer.write(json.dumps(record))
+                buffer.write("\n")
+            
+            pending += 1
+            if pending >= batch_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        
+        chunk = buffer.getvalue()
+        if chunk:
+            yield chunk
@@ -1,31 +1,77 @@
 """Shake to MeetUp Service - Handles shake detection and matching."""
 from sqlalchemy.orm import Session
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from datetime import datetime, timedelta
 from app.repositories.shake_repository import ShakeRepository
+from app.repositories.shake_store import get_shake_store
 from app.repositories.friendship_repository import FriendshipRepository
 from app.repositories.user_repository import UserRepository
 from app.repositories.meeting_repository import MeetingRepository
 from app.services.meetings_service import MeetingsService
 from app.services.points_service import PointsService
 from app.services.notification_service import NotificationService
+from app.core.config import settings
+from app.core.database import SessionLocal
 from app.core.exceptions import NotFoundError, ConflictError, ValidationError
+from app.core.shake_matcher import shake_matcher, PendingShake
+from app.core.expiry_sweeper import ExpirySweeper
+from app.core.geocoding import reverse_geocoder
+from app.core.geo import centroid
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _fill_meeting_address(session_factory: Callable, meeting_id: int, placeholder: str, address: Optional[str]):
+    """Geocoding callback: replace a meeting's coordinate placeholder with the resolved address."""
+    if not address:
+        return
+    db = session_factory()
+    try:
+        MeetingRepository(db).replace_address(meeting_id, placeholder, address)
+    finally:
+        db.close()
+
+
+def _join_names(names: List[str]) -> str:
+    """Join names for a message, e.g. 'Ana, Bob and Cris'."""
+    if len(names) <= 1:
+        return "".join(names)
+    return f"{', '.join(names[:-1])} and {names[-1]}"
+
+
+def register_shake_sweeps(sweeper: ExpirySweeper):
+    """Register the clean-up of expired shake data with an expiry sweeper."""
+    sweeper.register(
+        "shake_sessions_expired",
+        lambda db: ShakeRepository(db).expire_old_sessions()
+    )
+    sweeper.register(
+        "shake_sessions_deleted",
+        lambda db: ShakeRepository(db).delete_finished_sessions_before(
+            datetime.utcnow() - timedelta(days=settings.SHAKE_SESSION_RETENTION_DAYS),
+            batch_size=settings.EXPIRY_SWEEP_BATCH_SIZE
+        )
+    )
+    sweeper.register("pending_shakes_evicted", lambda db: shake_matcher.purge_expired())
+
+
 class ShakeService:
     """Service for managing shake sessions and matching."""
     
     # Configuration
     PROXIMITY_THRESHOLD_M = 100.0  # 100 meters
-    TIME_WINDOW_SECONDS = 15  # 15 seconds
-    SESSION_EXPIRY_SECONDS = 15
+    SESSION_EXPIRY_SECONDS = settings.SHAKE_SESSION_TTL_SECONDS
+    CLAIM_WAIT_SECONDS = 5.0  # How long a claimed partner's request waits for the match result
+    GROUP_SETTLE_SECONDS = settings.SHAKE_GROUP_SETTLE_SECONDS
+    GROUP_MAX_SIZE = settings.SHAKE_GROUP_MAX_SIZE
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, session_factory: Callable = SessionLocal):
         self.db = db
+        # Background geocoding writes the meeting address in a session of its own
+        self.session_factory = session_factory
         self.shake_repo = ShakeRepository(db)
+        self.shake_store = get_shake_store(db)
         self.friendship_repo = FriendshipRepository(db)
         self.user_repo = UserRepository(db)
         self.meeting_repo = MeetingRepository(db)
@@ -36,14 +82,21 @@ class ShakeService:
     def initiate_shake(
         self,
         user_id: int,
-        latitude: str,
-        longitude: str,
-        accuracy_m: Optional[str] = None
+        latitude: float,
+        longitude: float,
+        accuracy_m: Optional[str] = None,
+        group: bool = False
     ) -> Dict:
         """
         Initiate a shake session when user shakes their phone.
         Automatically checks for nearby friends and matches if found.
         
+        Pending shakes live in the in-memory shake matcher; the shake store
+        (SHAKE_STORAGE_BACKEND) decides whether every shake or only matches
+        are written to the database. A group shake matches every friend
+        group-shaking nearby who is also friends with the rest of the group,
+        into one meeting.
+        
         Returns:
             Dictionary with session info and match result (if any)
         """
@@ -56,160 +109,286 @@ class ShakeService:
         except ValueError:
             raise ValidationError("Latitude and longitude must be valid numbers")
         
-        # Check if user already has an active session
-        existing_session = self.shake_repo.get_active_session_by_user(user_id)
-        if existing_session:
-            # Return existing session info
-            return self._check_for_matches(existing_session, lat_float, lon_float)
+        # A friend's shake may have matched this user since their last call,
+        # or be creating the meeting for that match right now
+        delivered = shake_matcher.pop_result(user_id)
+        if not delivered and shake_matcher.is_claimed(user_id):
+            delivered = shake_matcher.wait_for_claim(user_id, self.CLAIM_WAIT_SECONDS)
+        if delivered:
+            return delivered
         
-        # Create new shake session
-        session = self.shake_repo.create_session(
-            user_id=user_id,
-            latitude=latitude,
-            longitude=longitude,
-            accuracy_m=accuracy_m,
-            expires_in_seconds=self.SESSION_EXPIRY_SECONDS
-        )
-        
-        logger.info(f"Shake session created for user {user_id} at ({latitude}, {longitude})")
+        # Shaking again during an active session only moves it
+        shake = shake_matcher.move(user_id, lat_float, lon_float, accuracy_m)
+        if shake and shake.group == group:
+            self.shake_store.shake_moved(shake)
+        else:
+            # Friend IDs are loaded once per session and kept with the pending shake
+            friend_ids = self.friendship_repo.get_friend_ids(user_id)
+            shake = shake_matcher.add(user_id, lat_float, lon_float, accuracy_m, friend_ids, group=group)
+            self.shake_store.shake_started(shake)
+            logger.info(f"Shake session created for user {user_id} at ({latitude}, {longitude})")
         
         # Check for nearby friends who are also shaking
-        return self._check_for_matches(session, lat_float, lon_float)
+        if group:
+            return self._check_for_group(shake)
+        return self._check_for_matches(shake)
     
-    def _check_for_matches(
-        self,
-        session: 'ShakeSession',
-        latitude: float,
-        longitude: float
-    ) -> Dict:
-        """Check for nearby friends shaking and match if found."""
-        # Get user's friends
-        friends = self.friendship_repo.get_friends(session.user_id, status_filter="accepted")
-        friend_ids = [f.id for f in friends]
+    def check_group_shake(self, user_id: int) -> Optional[Dict]:
+        """
+        Re-check a pending group shake, e.g. once its group has settled.
+        Returns None if the user has no pending group shake (it expired, or
+        another member's request already claimed the group).
+        """
+        shake = shake_matcher.get(user_id)
+        if not shake or not shake.group:
+            return None
+        return self._check_for_group(shake)
+    
+    def _check_for_matches(self, shake: PendingShake) -> Dict:
+        """Match a pending shake with the best-scoring friend shaking nearby, if any."""
+        no_match = {
+            "session_id": shake.session_id,
+            "status": "active",
+            "matched": False,
+            "message": "No nearby friends shaking. Keep shaking!",
+            "nearby_friends_count": 0
+        }
         
-        if not friend_ids:
+        # Claiming takes both shakes out of the matcher atomically: only this
+        # request creates the meeting, a concurrent one from the partner waits for it
+        claimed = shake_matcher.claim_match(shake.user_id, self.PROXIMITY_THRESHOLD_M)
+        if not claimed:
+            return no_match
+        _, partner = claimed
+        
+        try:
+            return self._finalize_match(shake, partner, no_match)
+        finally:
+            shake_matcher.release([shake.user_id, partner.user_id])
+    
+    def _check_for_group(self, shake: PendingShake) -> Dict:
+        """Match a pending group shake with its group of friends, once the group has settled."""
+        claimed = shake_matcher.claim_group(
+            shake.user_id, self.PROXIMITY_THRESHOLD_M, self.GROUP_SETTLE_SECONDS, self.GROUP_MAX_SIZE
+        )
+        if not claimed:
+            waiting = len(shake_matcher.cluster(shake.user_id, self.PROXIMITY_THRESHOLD_M, self.GROUP_MAX_SIZE)) - 1
             return {
-                "session_id": session.id,
+                "session_id": shake.session_id,
                 "status": "active",
                 "matched": False,
-                "message": "No nearby friends shaking. Keep shaking!",
-                "nearby_friends_count": 0
+                "message": (
+                    f"{waiting} friend(s) in your group so far. Keep shaking!" if waiting > 0
+                    else "No nearby friends shaking. Keep shaking!"
+                ),
+                "nearby_friends_count": max(waiting, 0)
             }
         
-        # Find nearby active shake sessions
-        nearby_sessions = self.shake_repo.find_nearby_active_sessions(
-            user_id=session.user_id,
-            latitude=latitude,
-            longitude=longitude,
-            max_distance_m=self.PROXIMITY_THRESHOLD_M,
-            time_window_seconds=self.TIME_WINDOW_SECONDS
-        )
-        
-        # Filter to only friends
-        friend_sessions = [s for s in nearby_sessions if s.user_id in friend_ids]
-        
-        if not friend_sessions:
+        try:
+            return self._finalize_group(claimed)
+        finally:
+            shake_matcher.release([member.user_id for member in claimed])
+    
+    def _finalize_group(self, members: List[PendingShake]) -> Dict:
+        """
+        Create one meeting for a claimed group, persist it and notify every
+        member. members[0] is the shake of the user whose request claimed it.
+        """
+        shake = members[0]
+        users = {member.user_id: self.user_repo.get_by_id(member.user_id) for member in members}
+        missing = [user_id for user_id, user in users.items() if not user]
+        if missing:
+            shake_matcher.restore(member for member in members if member.user_id not in missing)
             return {
-                "session_id": session.id,
+                "session_id": shake.session_id,
                 "status": "active",
                 "matched": False,
                 "message": "No nearby friends shaking. Keep shaking!",
                 "nearby_friends_count": 0
             }
+        names = {user_id: user.full_name or user.username for user_id, user in users.items()}
         
-        # Match with the first friend found (or could match with closest)
-        matched_session = friend_sessions[0]
-        matched_friend = self.user_repo.get_by_id(matched_session.user_id)
-        
-        if not matched_friend:
+        meeting = None
+        try:
+            meeting = self._create_group_meeting(members)
+            sessions = self.shake_store.shakes_matched(members, meeting['id'])
+        except Exception as e:
+            logger.error(f"Failed to create group shake meeting: {e}")
+            self._discard_meeting(meeting)
+            shake_matcher.restore(members)
             return {
-                "session_id": session.id,
+                "session_id": shake.session_id,
                 "status": "active",
                 "matched": False,
-                "message": "No nearby friends shaking. Keep shaking!",
-                "nearby_friends_count": len(friend_sessions)
+                "message": "Error creating meeting. Please try again.",
+                "error": str(e)
             }
         
-        # Create meeting automatically
-        try:
-            meeting = self._create_shake_meeting(session, matched_session, matched_friend)
-            
-            # Match the sessions
-            self.shake_repo.match_sessions(session.id, matched_session.id, meeting['id'])
+        results = {}
+        for member, session in zip(members, sessions):
+            others = sorted(user_id for user_id in names if user_id != member.user_id)
+            others_names = _join_names([names[user_id] for user_id in others])
             
-            # Award points to both users
             try:
                 self.points_service.award_points(
-                    user_id=session.user_id,
-                    points=PointsService.POINTS_SHAKE_MEETUP,
-                    transaction_type="shake_meetup",
-                    reference_id=meeting['id'],
-                    description=f"Shake MeetUp with {matched_friend.full_name or matched_friend.username}"
-                )
-                
-                self.points_service.award_points(
-                    user_id=matched_session.user_id,
+                    user_id=member.user_id,
                     points=PointsService.POINTS_SHAKE_MEETUP,
                     transaction_type="shake_meetup",
                     reference_id=meeting['id'],
-                    description=f"Shake MeetUp with {self.user_repo.get_by_id(session.user_id).full_name or self.user_repo.get_by_id(session.user_id).username}"
+                    description=f"Group Shake MeetUp with {others_names}"
                 )
             except Exception as e:
-                logger.error(f"Failed to award points for shake meetup: {e}")
+                logger.error(f"Failed to award points for group shake meetup: {e}")
             
-            # Send notifications
             try:
                 self.notification_service.send_shake_match_notification(
-                    user_id=session.user_id,
-                    friend_name=matched_friend.full_name or matched_friend.username,
-                    meeting_id=meeting['id']
-                )
-                self.notification_service.send_shake_match_notification(
-                    user_id=matched_session.user_id,
-                    friend_name=self.user_repo.get_by_id(session.user_id).full_name or self.user_repo.get_by_id(session.user_id).username,
+                    user_id=member.user_id,
+                    friend_name=others_names,
                     meeting_id=meeting['id']
                 )
             except Exception as e:
                 logger.error(f"Failed to send shake match notification: {e}")
             
-            logger.info(f"Shake match! User {session.user_id} matched with user {matched_session.user_id}")
+            result = self._match_result(member, session, others[0], others_names, meeting)
+            result["matched_user_ids"] = others
+            result["message"] = f"🎉 Group Shake! Meeting created with {others_names}!"
+            results[member.user_id] = result
+        
+        logger.info(f"Group shake match! Users {sorted(names)} matched")
+        
+        for member in members[1:]:
+            shake_matcher.deliver(member.user_id, results[member.user_id])
+        return results[shake.user_id]
+    
+    def _finalize_match(self, shake: PendingShake, partner: PendingShake, no_match: Dict) -> Dict:
+        """Create the meeting for a claimed pair, persist it and notify both sides."""
+        user = self.user_repo.get_by_id(shake.user_id)
+        matched_friend = self.user_repo.get_by_id(partner.user_id)
+        if not user or not matched_friend:
+            shake_matcher.restore([shake] if user else [])
+            return no_match
+        
+        # Create meeting automatically
+        meeting = None
+        try:
+            meeting = self._create_shake_meeting(shake, partner, matched_friend)
             
-            return {
-                "session_id": session.id,
-                "status": "matched",
-                "matched": True,
-                "matched_user_id": matched_session.user_id,
-                "matched_user_name": matched_friend.full_name or matched_friend.username,
-                "meeting_id": meeting['id'],
-                "meeting_title": meeting['title'],
-                "points_awarded": PointsService.POINTS_SHAKE_MEETUP,
-                "message": f"🎉 Shake Match! Meeting created with {matched_friend.full_name or matched_friend.username}!"
-            }
+            # Persist the matched pair
+            own_session, partner_session = self.shake_store.shakes_matched([shake, partner], meeting['id'])
         except Exception as e:
             logger.error(f"Failed to create shake meeting: {e}")
+            self._discard_meeting(meeting)
+            shake_matcher.restore([shake, partner])
             return {
-                "session_id": session.id,
+                "session_id": shake.session_id,
                 "status": "active",
                 "matched": False,
                 "message": "Error creating meeting. Please try again.",
                 "error": str(e)
             }
+        
+        user_name = user.full_name or user.username
+        friend_name = matched_friend.full_name or matched_friend.username
+        
+        # Award points to both users
+        try:
+            self.points_service.award_points(
+                user_id=shake.user_id,
+                points=PointsService.POINTS_SHAKE_MEETUP,
+                transaction_type="shake_meetup",
+                reference_id=meeting['id'],
+                description=f"Shake MeetUp with {friend_name}"
+            )
+            
+            self.points_service.award_points(
+                user_id=partner.user_id,
+                points=PointsService.POINTS_SHAKE_MEETUP,
+                transaction_type="shake_meetup",
+                reference_id=meeting['id'],
+                description=f"Shake MeetUp with {user_name}"
+            )
+        except Exception as e:
+            logger.error(f"Failed to award points for shake meetup: {e}")
+        
+        # Send notifications
+        try:
+            self.notification_service.send_shake_match_notification(
+                user_id=shake.user_id,
+                friend_name=friend_name,
+                meeting_id=meeting['id']
+            )
+            self.notification_service.send_shake_match_notification(
+                user_id=partner.user_id,
+                friend_name=user_name,
+                meeting_id=meeting['id']
+            )
+        except Exception as e:
+            logger.error(f"Failed to send shake match notification: {e}")
+        
+        logger.info(f"Shake match! User {shake.user_id} matched with user {partner.user_id}")
+        
+        # The partner gets the same result from their side, pushed to a waiting request if any
+        shake_matcher.deliver(
+            partner.user_id,
+            self._match_result(partner, partner_session, shake.user_id, user_name, meeting)
+        )
+        return self._match_result(shake, own_session, partner.user_id, friend_name, meeting)
+    
+    def _discard_meeting(self, meeting: Optional[Dict]):
+        """
+        Delete the meeting of a match that could not be persisted. The shakes
+        are restored to match again, which would otherwise leave a second meeting.
+        """
+        if not meeting:
+            return
+        try:
+            self.db.rollback()
+            for participant in self.meeting_repo.get_participants_by_meeting(meeting['id']):
+                self.meeting_repo.delete_participant(meeting['id'], participant.user_id)
+            self.meeting_repo.delete(meeting['id'])
+        except Exception as e:
+            logger.error(f"Failed to delete meeting {meeting['id']} of a failed shake match: {e}")
+    
+    def _match_result(self, shake: PendingShake, session, matched_user_id: int, matched_user_name: str,
+                      meeting: Dict) -> Dict:
+        """
+        Format a match for one side of it. session_id stays the shake's own ID,
+        as in every earlier response; the shake_sessions row is record_id.
+        """
+        return {
+            "session_id": shake.session_id,
+            "record_id": session.id,
+            "status": "matched",
+            "matched": True,
+            "matched_user_id": matched_user_id,
+            "matched_user_name": matched_user_name,
+            "meeting_id": meeting['id'],
+            "meeting_title": meeting['title'],
+            "points_awarded": PointsService.POINTS_SHAKE_MEETUP,
+            "message": f"🎉 Shake Match! Meeting created with {matched_user_name}!"
+        }
+    
+    def expired_result(self, session_id: int) -> Dict:
+        """Result for a shake that waited its whole session without a match."""
+        return {
+            "session_id": session_id,
+            "status": "expired",
+            "matched": False,
+            "message": "No friends shook nearby in time. Shake again!",
+            "nearby_friends_count": 0
+        }
     
     def _create_shake_meeting(
         self,
-        session1: 'ShakeSession',
-        session2: 'ShakeSession',
+        session1: PendingShake,
+        session2: PendingShake,
         friend: 'User'
     ) -> Dict:
         """Create a meeting for a shake match."""
         # Calculate midpoint location
-        lat1 = float(session1.latitude)
-        lon1 = float(session1.longitude)
-        lat2 = float(session2.latitude)
-        lon2 = float(session2.longitude)
-        
-        midpoint_lat = (lat1 + lat2) / 2
-        midpoint_lon = (lon1 + lon2) / 2
+        midpoint_lat, midpoint_lon = centroid(
+            [(session1.latitude, session1.longitude), (session2.latitude, session2.longitude)]
+        )
         
         # Use consistent organizer: always use the user with lower ID
         # This ensures both users see the same organizer
@@ -224,31 +403,39 @@ class ShakeService:
             other_user = self.user_repo.get_by_id(session1.user_id)
             friend_name = (other_user.full_name if other_user and other_user.full_name else other_user.username) if other_user else "Friend"
         
-        # Try to get address via reverse geocoding (fallback to coordinates)
-        address = f"Near {midpoint_lat:.6f}, {midpoint_lon:.6f}"
-        try:
-            import requests
-            # Use a free reverse geocoding service (OpenStreetMap Nominatim)
-            # Note: This is a simple implementation, you might want to use a proper geocoding service
-            geocode_url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={midpoint_lat}&lon={midpoint_lon}&zoom=18&addressdetails=1"
-            response = requests.get(geocode_url, headers={'User-Agent': 'MeetUpApp/1.0'}, timeout=2)
-            if response.status_code == 200:
-                data = response.json()
-                if 'address' in data:
-                    addr = data['address']
-                    parts = []
-                    if 'road' in addr:
-                        parts.append(addr['road'])
-                    if 'house_number' in addr:
-                        parts.insert(0, addr['house_number'])
-                    if 'city' in addr or 'town' in addr or 'village' in addr:
-                        city = addr.get('city') or addr.get('town') or addr.get('village')
-                        if city:
-                            parts.append(city)
-                    if parts:
-                        address = ', '.join(parts)
-        except Exception as e:
-            logger.warning(f"Failed to geocode address: {e}, using coordinates")
+        meeting = self._create_meeting_at(
+            midpoint_lat, midpoint_lon, organizer_id, [participant_id], f"Shake MeetUp with {friend_name}"
+        )
+        
+        # Update meeting status to confirmed (since both agreed)
+        # Note: We might want to add a method to update status directly
+        # For now, the meeting will be created as "pending" but both users are already participants
+        
+        return meeting
+    
+    def _create_group_meeting(self, members: List[PendingShake]) -> Dict:
+        """Create one meeting for a group shake match, at the group's centroid."""
+        latitude, longitude = centroid((member.latitude, member.longitude) for member in members)
+        
+        # Same rule as for pairs: the lowest user ID organizes
+        user_ids = sorted(member.user_id for member in members)
+        return self._create_meeting_at(
+            latitude, longitude, user_ids[0], user_ids[1:], f"Group Shake MeetUp ({len(user_ids)} friends)"
+        )
+    
+    def _create_meeting_at(
+        self,
+        latitude: float,
+        longitude: float,
+        organizer_id: int,
+        participant_ids: List[int],
+        title: str
+    ) -> Dict:
+        """Create a shake meeting at a point and resolve its address in the background."""
+        # Address from the geocoding cache if known, coordinates otherwise;
+        # the real address is filled in once the background lookup resolves
+        placeholder = f"Near {latitude:.6f}, {longitude:.6f}"
+        address = reverse_geocoder.cached(latitude, longitude) or placeholder
         
         # Create meeting
         from app.schemas.meeting import MeetingCreate
@@ -258,20 +445,24 @@ class ShakeService:
         scheduled_time = datetime.utcnow() + timedelta(minutes=1)
         
         meeting_data = MeetingCreate(
-            title=f"Shake MeetUp with {friend_name}",
+            title=title,
             description="Created via Shake to MeetUp! 🎉",
             address=address,
-            latitude=str(midpoint_lat),
-            longitude=str(midpoint_lon),
+            latitude=latitude,
+            longitude=longitude,
             scheduled_at=scheduled_time,
-            participant_ids=[participant_id]
+            participant_ids=participant_ids
         )
         
         meeting = self.meetings_service.create_meeting(organizer_id, meeting_data)
         
-        # Update meeting status to confirmed (since both agreed)
-        # Note: We might want to add a method to update status directly
-        # For now, the meeting will be created as "pending" but both users are already participants
+        if address == placeholder:
+            session_factory = self.session_factory
+            reverse_geocoder.resolve(
+                latitude,
+                longitude,
+                lambda resolved: _fill_meeting_address(session_factory, meeting['id'], placeholder, resolved)
+            )
         
         return meeting
     
@@ -282,60 +473,39 @@ class ShakeService:
         longitude: float
     ) -> List[Dict]:
         """Get list of nearby friends who are currently shaking."""
-        # Get user's friends
-        friends = self.friendship_repo.get_friends(user_id, status_filter="accepted")
-        friend_ids = [f.id for f in friends]
+        friend_ids = set(self.friendship_repo.get_friend_ids(user_id))
         
         if not friend_ids:
             return []
         
-        # Find nearby active sessions
-        nearby_sessions = self.shake_repo.find_nearby_active_sessions(
-            user_id=user_id,
-            latitude=latitude,
-            longitude=longitude,
-            max_distance_m=self.PROXIMITY_THRESHOLD_M,
-            time_window_seconds=self.TIME_WINDOW_SECONDS
-        )
+        nearby = shake_matcher.nearby(latitude, longitude, self.PROXIMITY_THRESHOLD_M, user_ids=friend_ids)
         
-        # Filter to friends and get user info
         result = []
-        for session in nearby_sessions:
-            if session.user_id in friend_ids:
-                friend = self.user_repo.get_by_id(session.user_id)
-                if friend:
-                    try:
-                        session_lat = float(session.latitude)
-                        session_lon = float(session.longitude)
-                        distance = self.shake_repo._haversine_distance(
-                            latitude, longitude, session_lat, session_lon
-                        )
-                        
-                        result.append({
-                            "user_id": friend.id,
-                            "username": friend.username,
-                            "full_name": friend.full_name,
-                            "distance_m": round(distance, 1),
-                            "shake_session_id": session.id,
-                            "created_at": session.created_at.isoformat()
-                        })
-                    except (ValueError, TypeError):
-                        continue
+        for shake, distance in nearby:
+            friend = self.user_repo.get_by_id(shake.user_id)
+            if friend:
+                result.append({
+                    "user_id": friend.id,
+                    "username": friend.username,
+                    "full_name": friend.full_name,
+                    "distance_m": round(distance, 1),
+                    "shake_session_id": shake.session_id,
+                    "created_at": shake.created_at.isoformat()
+                })
         
         return result
     
     def get_active_session(self, user_id: int) -> Optional[Dict]:
         """Get user's active shake session."""
-        session = self.shake_repo.get_active_session_by_user(user_id)
-        if not session:
+        shake = shake_matcher.get(user_id)
+        if not shake:
             return None
         
         return {
-            "session_id": session.id,
-            "latitude": session.latitude,
-            "longitude": session.longitude,
-            "created_at": session.created_at.isoformat(),
-            "expires_at": session.expires_at.isoformat(),
-            "status": session.status.value
+            "session_id": shake.session_id,
+            "latitude": shake.latitude,
+            "longitude": shake.longitude,
+            "created_at": shake.created_at.isoformat(),
+            "expires_at": shake.expires_at.isoformat(),
+            "status": "active"
         }
-
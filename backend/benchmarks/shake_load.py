@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Shake matching load simulation.
+
+Seeds a scratch database with synthetic users standing in tight clusters
+(festival crowds) with a random friend graph, then has every user shake
+once, in random order, from a pool of worker threads. Reports matches per
+second, latency percentiles and database queries per shake.
+
+Usage (from backend/):
+    python -m benchmarks.shake_load --users 5000 --clusters 100 --workers 8
+    python -m benchmarks.shake_load --mode http --users 2000
+    python -m benchmarks.shake_load --database-url mysql+pymysql://user:pw@localhost/meetup_bench
+
+The default database is a temporary SQLite file. A --database-url must point
+at an empty scratch database: tables are created in it and left behind.
+Reverse geocoding is replaced with a local stand-in so no request leaves
+the process.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import BigInteger, Integer, MetaData, create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base, get_db, get_session_factory
+from app.core.geo import METERS_PER_DEGREE_LAT
+from app.core.geocoding import GeocodingCache, ReverseGeocoder, StaticGeocodingProvider
+from app.core.security import create_access_token
+from app.core.shake_matcher import shake_matcher
+from app.main import app
+from app.models.friendship import Friendship
+from app.models.meeting import Meeting
+from app.models.shake_session import ShakeSession
+from app.models.user import User
+from app.services import shake_service as shake_service_module
+from app.services.shake_service import ShakeService
+
+# Any valid hash will do: the benchmark never logs in with a password
+PASSWORD_HASH = "$argon2id$v=19$m=65536,t=3,p=4$benchmark$benchmark"
+
+
+class QueryCounter:
+    """Counts statements executed on an engine."""
+
+    def __init__(self, engine):
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def build_population(
+    users: int,
+    clusters: int,
+    cluster_radius_m: float,
+    friend_probability: float,
+    random_friends: int,
+    rng: random.Random
+) -> Tuple[List[Tuple[float, float]], List[Tuple[int, int]]]:
+    """
+    Positions (by user index) and friend pairs (index, index) of a synthetic crowd.
+
+    Users are spread over `clusters` spots a few kilometres apart, each within
+    cluster_radius_m of its spot. Users of the same cluster are friends with
+    probability friend_probability; every user also has about random_friends
+    friends anywhere.
+    """
+    centers = [
+        (45.0 + rng.uniform(-0.03, 0.03), 25.0 + rng.uniform(-0.03, 0.03))
+        for _ in range(clusters)
+    ]
+    positions = []
+    members: Dict[int, List[int]] = {}
+    for index in range(users):
+        cluster = index % clusters
+        center_lat, center_lon = centers[cluster]
+        distance = cluster_radius_m * math.sqrt(rng.random())
+        bearing = rng.uniform(0, 2 * math.pi)
+        lat = center_lat + distance * math.cos(bearing) / METERS_PER_DEGREE_LAT
+        lon = center_lon + distance * math.sin(bearing) / (METERS_PER_DEGREE_LAT * math.cos(math.radians(center_lat)))
+        positions.append((lat, lon))
+        members.setdefault(cluster, []).append(index)
+
+    pairs = set()
+    for indexes in members.values():
+        for i, first in enumerate(indexes):
+            for second in indexes[i + 1:]:
+                if rng.random() < friend_probability:
+                    pairs.add((first, second))
+    for first in range(users):
+        for _ in range(random_friends):
+            second = rng.randrange(users)
+            if second != first:
+                pairs.add((min(first, second), max(first, second)))
+    return positions, sorted(pairs)
+
+
+def create_schema(engine):
+    """
+    Create every table. SQLite only autoincrements INTEGER PRIMARY KEY columns,
+    so there the tables are created from a copy of the metadata with BigInteger
+    columns declared as Integer; the models themselves are left untouched.
+    """
+    metadata = Base.metadata
+    if engine.dialect.name == "sqlite":
+        metadata = MetaData()
+        for table in Base.metadata.sorted_tables:
+            for column in table.to_metadata(metadata).columns:
+                if isinstance(column.type, BigInteger):
+                    column.type = Integer()
+    metadata.create_all(bind=engine)
+
+
+def seed_database(session_factory, positions, pairs, batch_size: int = 1000) -> List[int]:
+    """Insert users and accepted friendships. Returns user IDs by user index."""
+    db = session_factory()
+    try:
+        rows = [
+            {
+                "username": f"bench_{index}",
+                "full_name": f"Bench User {index}",
+                "email": f"bench_{index}@example.com",
+                "password_hash": PASSWORD_HASH,
+                "is_active": True,
+                "email_verified": True
+            }
+            for index in range(len(positions))
+        ]
+        for start in range(0, len(rows), batch_size):
+            db.execute(insert(User), rows[start:start + batch_size])
+        db.commit()
+
+        ids_by_name = dict(db.query(User.username, User.id).filter(User.username.like("bench_%")).all())
+        user_ids = [ids_by_name[f"bench_{index}"] for index in range(len(positions))]
+
+        friendships = [
+            {"user_id": user_ids[first], "friend_id": user_ids[second], "status": "accepted"}
+            for first, second in pairs
+        ]
+        for start in range(0, len(friendships), batch_size):
+            db.execute(insert(Friendship), friendships[start:start + batch_size])
+        db.commit()
+        return user_ids
+    finally:
+        db.close()
+
+
+def _service_shaker(session_factory, group: bool):
+    def shake(user_id: int, latitude: float, longitude: float, accuracy: str) -> dict:
+        db = session_factory()
+        try:
+            return ShakeService(db, session_factory).initiate_shake(user_id, latitude, longitude, accuracy, group=group)
+        finally:
+            db.close()
+    return shake
+
+
+def _http_shaker(session_factory, group: bool):
+    from fastapi.testclient import TestClient
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: session_factory
+    local = threading.local()
+
+    def shake(user_id: int, latitude: float, longitude: float, accuracy: str) -> dict:
+        # One client per worker thread; no lifespan, so no background jobs start
+        if not hasattr(local, "client"):
+            local.client = TestClient(app)
+        token = create_access_token({"sub": str(user_id)})
+        response = local.client.post(
+            "/api/v1/shake/initiate",
+            json={"latitude": latitude, "longitude": longitude, "accuracy_m": accuracy, "group": group},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        response.raise_for_status()
+        return response.json()
+    return shake
+
+
+def _group_checker(session_factory):
+    def check(user_id: int) -> Optional[dict]:
+        db = session_factory()
+        try:
+            return ShakeService(db, session_factory).check_group_shake(user_id)
+        finally:
+            db.close()
+    return check
+
+
+def _run_phase(task, indexes: List[int], workers: int, errors: List[str]) -> Tuple[List[float], float]:
+    """Run task(index) for every index from `workers` threads. Returns (sorted latencies, duration)."""
+    work: "queue.Queue[int]" = queue.Queue()
+    for index in indexes:
+        work.put(index)
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                index = work.get_nowait()
+            except queue.Empty:
+                return
+            started = time.perf_counter()
+            try:
+                task(index)
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+                continue
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker, name=f"shaker-{i}") for i in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), time.perf_counter() - started
+
+
+def run_benchmark(
+    users: int = 2000,
+    clusters: int = 50,
+    cluster_radius_m: float = 30.0,
+    friend_probability: float = 0.2,
+    random_friends: int = 3,
+    workers: int = 8,
+    mode: str = "service",
+    group: bool = False,
+    database_url: Optional[str] = None,
+    seed: int = 42,
+    storage: Optional[str] = None
+) -> dict:
+    """Seed a database, run one shake per user and return the report."""
+    rng = random.Random(seed)
+    temp_path = None
+    if not database_url:
+        handle, temp_path = tempfile.mkstemp(prefix="shake_bench_", suffix=".db")
+        os.close(handle)
+        database_url = f"sqlite:///{temp_path}"
+
+    connect_args = {"check_same_thread": False, "timeout": 30} if database_url.startswith("sqlite") else {}
+    engine = create_engine(database_url, connect_args=connect_args, pool_size=workers, max_overflow=workers)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    original_geocoder = shake_service_module.reverse_geocoder
+    original_storage = settings.SHAKE_STORAGE_BACKEND
+    settings.SHAKE_STORAGE_BACKEND = storage or original_storage
+    try:
+        create_schema(engine)
+        positions, pairs = build_population(users, clusters, cluster_radius_m, friend_probability, random_friends, rng)
+        user_ids = seed_database(session_factory, positions, pairs)
+
+        shake_matcher.clear()
+        shake_service_module.reverse_geocoder = ReverseGeocoder(
+            StaticGeocodingProvider(), GeocodingCache(), max_workers=0
+        )
+        shake = _http_shaker(session_factory, group) if mode == "http" else _service_shaker(session_factory, group)
+
+        accuracies = [str(rng.choice((5, 10, 15, 30, 65))) for _ in range(users)]
+        order = list(range(users))
+        rng.shuffle(order)
+        errors: List[str] = []
+        counter = QueryCounter(engine)
+
+        def shake_user(index: int):
+            latitude, longitude = positions[index]
+            shake(user_ids[index], latitude, longitude, accuracies[index])
+
+        latencies, duration = _run_phase(shake_user, order, workers, errors)
+        check_latencies: List[float] = []
+        if group:
+            # A group only matches once it has settled; waiting clients then re-check it
+            time.sleep(ShakeService.GROUP_SETTLE_SECONDS)
+            check = _group_checker(session_factory)
+            pending = [index for index in order if shake_matcher.get(user_ids[index])]
+            check_latencies, check_duration = _run_phase(lambda index: check(user_ids[index]), pending, workers, errors)
+            duration += check_duration
+        queries = counter.count
+
+        db = session_factory()
+        try:
+            meetings = db.query(Meeting).count()
+            matched_users = db.query(ShakeSession).count()
+        finally:
+            db.close()
+
+        return {
+            "mode": mode,
+            "group": group,
+            "storage": settings.SHAKE_STORAGE_BACKEND,
+            "database": engine.dialect.name,
+            "users": users,
+            "clusters": clusters,
+            "friendships": len(pairs),
+            "workers": workers,
+            "shakes": len(latencies),
+            "errors": len(errors),
+            "duration_s": round(duration, 3),
+            "matches": meetings,
+            "matched_users": matched_users,
+            "matches_per_s": round(meetings / duration, 1) if duration else 0.0,
+            "shakes_per_s": round(len(latencies) / duration, 1) if duration else 0.0,
+            "latency_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "latency_p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "latency_p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "queries_per_shake": round(queries / max(len(latencies), 1), 2),
+            "group_checks": len(check_latencies),
+            "group_check_p95_ms": round(percentile(check_latencies, 95) * 1000, 2),
+            "first_error": errors[0] if errors else None
+        }
+    finally:
+        shake_service_module.reverse_geocoder = original_geocoder
+        settings.SHAKE_STORAGE_BACKEND = original_storage
+        app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_session_factory, None)
+        shake_matcher.clear()
+        engine.dispose()
+        if temp_path:
+            os.remove(temp_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shake matching load simulation")
+    parser.add_argument("--users", type=int, default=2000, help="Synthetic users, each shaking once")
+    parser.add_argument("--clusters", type=int, default=50, help="Crowd spots the users stand around")
+    parser.add_argument("--cluster-radius-m", type=float, default=30.0, help="Spread of users around their spot")
+    parser.add_argument("--friend-probability", type=float, default=0.2,
+                        help="Chance that two users of the same cluster are friends")
+    parser.add_argument("--random-friends", type=int, default=3, help="Extra friends per user anywhere")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent shaking threads")
+    parser.add_argument("--mode", choices=("service", "http"), default="service",
+                        help="Call ShakeService directly or POST /api/v1/shake/initiate")
+    parser.add_argument("--group", action="store_true", help="Send group shakes")
+    parser.add_argument("--storage", choices=("memory", "sql"), default=None,
+                        help="Shake storage backend (default: SHAKE_STORAGE_BACKEND)")
+    parser.add_argument("--database-url", default=None, help="Scratch database (default: temporary SQLite file)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Keep the app's INFO and WARNING logs")
+    args = parser.parse_args()
+    if not args.verbose:
+        # Per-shake logs (e.g. missing FCM tokens) would drown the report and skew timings
+        logging.disable(logging.WARNING)
+
+    report = run_benchmark(
+        users=args.users,
+        clusters=args.clusters,
+        cluster_radius_m=args.cluster_radius_m,
+        friend_probability=args.friend_probability,
+        random_friends=args.random_friends,
+        workers=args.workers,
+        mode=args.mode,
+        group=args.group,
+        database_url=args.database_url,
+        seed=args.seed,
+        storage=args.storage
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    width = max(len(key) for key in report)
+    for key, value in report.items():
+        print(f"{key.ljust(width)}  {value}")
+
+
+if __name__ == "__main__":
+    main()
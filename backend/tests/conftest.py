@@ -3,13 +3,19 @@ Pytest configuration and shared fixtures.
 This file is automatically loaded by pytest and provides fixtures for all tests.
 """
 import pytest
-from sqlalchemy import create_engine
+import pytest_asyncio
+from sqlalchemy import BigInteger, create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 from fastapi.testclient import TestClient
 
-from app.core.database import Base, get_db
-from app.main import app
+from app.core.config import settings
+from app.core.database import Base, get_db, get_session_factory
+from app.core.location_index import location_index
+from app.core.location_history_buffer import location_history_buffer
+from app.main import app, location_retention_job, expiry_sweep_job
 from app.models.user import User
 from app.models.role import Role, UserRole
 from app.models.friendship import Friendship
@@ -18,6 +24,13 @@ from app.models.user import UserLocation
 from app.core.security import get_password_hash
 
 
+# The models use BigInteger primary keys (BIGINT AUTO_INCREMENT on MySQL), but SQLite
+# only autoincrements an INTEGER PRIMARY KEY; render BigInteger as INTEGER there
+@compiles(BigInteger, "sqlite")
+def _compile_big_integer_for_sqlite(type_, compiler, **kw):
+    return "INTEGER"
+
+
 # In-memory SQLite database for testing (faster than real database)
 # Use sqlite:///:memory:?check_same_thread=false for better compatibility
 SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///:memory:?check_same_thread=false"
@@ -39,6 +52,8 @@ def db_session():
     """
     # Create all tables
     Base.metadata.create_all(bind=engine)
+    # Process-level caches must not leak between test databases
+    location_index.clear()
     
     # Create a new session
     session = TestingSessionLocal()
@@ -51,8 +66,32 @@ def db_session():
         Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture
+def session_factory(db_session):
+    """Session factory on the test database, for code that opens sessions of its own."""
+    return TestingSessionLocal
+
+
+@pytest_asyncio.fixture
+async def async_db():
+    """Fresh in-memory aiosqlite database per test, for code using AsyncSession."""
+    async_engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        yield session
+    
+    await async_engine.dispose()
+
+
 @pytest.fixture(scope="function")
-def client(db_session: Session):
+def client(db_session: Session, tmp_path):
     """
     Create a test client for API testing.
     Overrides the database dependency to use our test database.
@@ -64,11 +103,19 @@ def client(db_session: Session):
             pass
     
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
+    location_history_buffer.session_factory = TestingSessionLocal
+    location_retention_job.session_factory = TestingSessionLocal
+    expiry_sweep_job.session_factory = TestingSessionLocal
+    # Keep the single-process lock clear of a development server on this host
+    lock_path = settings.SHAKE_MATCHER_LOCK_PATH
+    settings.SHAKE_MATCHER_LOCK_PATH = str(tmp_path / "shake-matcher.lock")
     
     with TestClient(app) as test_client:
         yield test_client
     
     # Clean up
+    settings.SHAKE_MATCHER_LOCK_PATH = lock_path
     app.dependency_overrides.clear()
 
 
@@ -0,0 +1,96 @@
+"""In-process stand-in for a Redis broker, for the broadcast backend tests."""
+from typing import Dict, Optional, Set
+import asyncio
+
+
+def _bulk(data: bytes) -> bytes:
+    return f"${len(data)}\r\n".encode() + data + b"\r\n"
+
+
+async def _read_reply(reader: asyncio.StreamReader):
+    """Read one RESP value. Error replies raise RuntimeError."""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by broker")
+    prefix, body = line[:1], line[1:-2]
+    if prefix == b"+":
+        return body.decode()
+    if prefix == b"-":
+        raise RuntimeError(body.decode())
+    if prefix == b":":
+        return int(body)
+    if prefix == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if prefix == b"*":
+        length = int(body)
+        if length < 0:
+            return None
+        return [await _read_reply(reader) for _ in range(length)]
+    raise RuntimeError(f"Unexpected reply from broker: {line!r}")
+
+
+class LocalBroker:
+    """
+    Local stand-in for a Redis broker implementing the PUBLISH/SUBSCRIBE
+    subset RedisBroadcastBackend uses (plus PING and AUTH), so its tests
+    need no Redis server.
+    """
+
+    def __init__(self):
+        self._server: Optional[asyncio.AbstractServer] = None
+        # Map: channel -> Set of subscribed connections
+        self._channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+        self._clients: Set[asyncio.StreamWriter] = set()
+        self.port: Optional[int] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Start listening; returns the port (a free one when port=0)."""
+        self._server = await asyncio.start_server(self._serve, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            self._clients.clear()
+            self._channels.clear()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._clients.add(writer)
+        try:
+            while True:
+                command = await _read_reply(reader)
+                if not isinstance(command, list) or not command:
+                    continue
+                name = command[0].decode().upper()
+                if name == "SUBSCRIBE":
+                    for count, channel in enumerate(command[1:], start=1):
+                        self._channels.setdefault(channel, set()).add(writer)
+                        writer.write(b"*3\r\n" + _bulk(b"subscribe") + _bulk(channel) + f":{count}\r\n".encode())
+                elif name == "PUBLISH":
+                    channel, payload = command[1], command[2]
+                    subscribers = list(self._channels.get(channel, ()))
+                    for subscriber in subscribers:
+                        subscriber.write(b"*3\r\n" + _bulk(b"message") + _bulk(channel) + _bulk(payload))
+                    writer.write(f":{len(subscribers)}\r\n".encode())
+                elif name == "PING":
+                    writer.write(b"+PONG\r\n")
+                elif name == "AUTH":
+                    writer.write(b"+OK\r\n")
+                else:
+                    writer.write(f"-ERR unknown command '{name}'\r\n".encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, RuntimeError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            for writers in self._channels.values():
+                writers.discard(writer)
+            writer.close()
@@ -0,0 +1,20 @@
+"""
+End-to-end run of the shake load-simulation benchmark.
+"""
+import pytest
+from benchmarks.shake_load import run_benchmark
+
+
+@pytest.mark.integration
+@pytest.mark.slow
+class TestShakeBenchmarkRun:
+    """Test a full benchmark run against a temporary SQLite database."""
+
+    def test_small_run_reports_matches(self):
+        """Test a small end-to-end run on a temporary SQLite database."""
+        report = run_benchmark(users=60, clusters=3, friend_probability=0.8, workers=2)
+
+        assert report["errors"] == 0, report["first_error"]
+        assert report["shakes"] == 60
+        assert report["matches"] > 0
+        assert report["queries_per_shake"] > 0
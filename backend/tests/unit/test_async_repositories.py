@@ -0,0 +1,59 @@
+"""
+Unit tests for the AsyncSession repository variants.
+"""
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import get_password_hash
+from app.models.user import User
+from app.repositories.user_repository import AsyncUserRepository
+from app.repositories.chat_repository import AsyncChatRepository
+
+
+async def _create_user(db: AsyncSession, username: str) -> User:
+    user = User(
+        username=username,
+        email=f"{username}@example.com",
+        password_hash=get_password_hash("testpassword123"),
+        full_name=username.title(),
+        is_active=True
+    )
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+
+@pytest.mark.unit
+class TestAsyncRepositories:
+    """Test async repository variants."""
+    
+    @pytest.mark.asyncio
+    async def test_get_user_by_id(self, async_db):
+        """Test fetching a user through AsyncUserRepository."""
+        user = await _create_user(async_db, "alice")
+        
+        found = await AsyncUserRepository(async_db).get_by_id(user.id)
+        
+        assert found is not None
+        assert found.username == "alice"
+    
+    @pytest.mark.asyncio
+    async def test_chat_messages_and_unread(self, async_db):
+        """Test conversation creation, messages and read marking."""
+        alice = await _create_user(async_db, "alice")
+        bob = await _create_user(async_db, "bob")
+        chat_repo = AsyncChatRepository(async_db)
+        
+        conversation = await chat_repo.get_or_create_conversation(bob.id, alice.id)
+        await chat_repo.create_message(conversation.id, alice.id, "hi")
+        await chat_repo.create_message(conversation.id, alice.id, "there")
+        
+        assert conversation.user1_id == min(alice.id, bob.id)
+        assert await chat_repo.get_conversation_unread_count(conversation.id, bob.id) == 2
+        
+        messages = await chat_repo.get_messages(conversation.id)
+        assert [m.content for m in messages] == ["hi", "there"]
+        
+        assert await chat_repo.mark_messages_as_read(conversation.id, bob.id) == 2
+        assert await chat_repo.get_conversation_unread_count(conversation.id, bob.id) == 0
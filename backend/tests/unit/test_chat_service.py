@@ -0,0 +1,139 @@
+"""
+Unit tests for chat messages: sending and history pages.
+"""
+import pytest
+from datetime import datetime, timedelta
+from app.core.exceptions import ForbiddenError, NotFoundError, ValidationError
+from app.models.chat import Conversation, Message
+from app.models.friendship import Friendship
+from app.models.user import User
+from app.services.chat_service import ChatService
+
+
+@pytest.fixture
+def accepted_friendship(db_session, test_friendship):
+    test_friendship.status = "accepted"
+    db_session.commit()
+    return test_friendship
+
+
+@pytest.mark.unit
+class TestSendMessage:
+    """Test idempotent message sending."""
+
+    def test_send_message(self, db_session, test_user, test_user2, accepted_friendship):
+        """Test that a message is stored and reported as created."""
+        message, created = ChatService(db_session).send_message(test_user.id, test_user2.id, " hi ")
+
+        assert created
+        assert message["content"] == "hi"
+        assert message["client_message_id"] is None
+
+    def test_retry_returns_original(self, db_session, test_user, test_user2, accepted_friendship):
+        """Test that resending with the same client_message_id does not store a second message."""
+        service = ChatService(db_session)
+        first, created = service.send_message(test_user.id, test_user2.id, "hi", client_message_id="c-1")
+        retry, retried = service.send_message(test_user.id, test_user2.id, "hi", client_message_id="c-1")
+
+        assert created and not retried
+        assert retry["id"] == first["id"]
+        assert db_session.query(Message).count() == 1
+
+    def test_keys_are_per_sender(self, db_session, test_user, test_user2, accepted_friendship):
+        """Test that two senders may use the same client_message_id."""
+        service = ChatService(db_session)
+        service.send_message(test_user.id, test_user2.id, "hi", client_message_id="c-1")
+        _, created = service.send_message(test_user2.id, test_user.id, "hello", client_message_id="c-1")
+
+        assert created
+        assert db_session.query(Message).count() == 2
+
+    def test_keys_are_per_conversation(self, db_session, test_user, test_user2, accepted_friendship):
+        """Test that a sender reusing a client_message_id with another friend sends a new message."""
+        third = User(username="testuser3", email="test3@example.com", password_hash="x",
+                     full_name="Test User 3", is_active=True, email_verified=True)
+        db_session.add(third)
+        db_session.commit()
+        db_session.add(Friendship(user_id=test_user.id, friend_id=third.id, status="accepted"))
+        db_session.commit()
+        service = ChatService(db_session)
+
+        first, _ = service.send_message(test_user.id, test_user2.id, "hi", client_message_id="c-1")
+        other, created = service.send_message(test_user.id, third.id, "hi", client_message_id="c-1")
+
+        assert created
+        assert other["conversation_id"] != first["conversation_id"]
+        assert db_session.query(Message).count() == 2
+
+    def test_not_friends(self, db_session, test_user, test_user2, test_friendship):
+        """Test that a pending friendship cannot send messages."""
+        with pytest.raises(ForbiddenError):
+            ChatService(db_session).send_message(test_user.id, test_user2.id, "hi")
+
+
+@pytest.fixture
+def conversation_messages(db_session, test_user, test_user2):
+    """Seven messages, several sharing a created_at second as they do in bursts."""
+    conversation = Conversation(user1_id=test_user.id, user2_id=test_user2.id)
+    db_session.add(conversation)
+    db_session.commit()
+    start = datetime(2026, 1, 1, 12, 0, 0)
+    seconds = [0, 1, 1, 1, 2, 3, 3]
+    for n, second in enumerate(seconds):
+        db_session.add(Message(
+            conversation_id=conversation.id, sender_id=test_user2.id, content=f"m{n}",
+            created_at=start + timedelta(seconds=second)
+        ))
+    db_session.commit()
+    return conversation
+
+
+@pytest.mark.unit
+class TestGetMessages:
+    """Test message history pagination."""
+
+    def test_page_back_with_cursor(self, db_session, test_user, conversation_messages):
+        """Test that following next_cursor backwards visits every message once, across created_at ties."""
+        service = ChatService(db_session)
+        page = service.get_messages(test_user.id, conversation_messages.id, limit=3)
+        seen = [m["content"] for m in page["messages"]]
+        while page["next_cursor"]:
+            page = service.get_messages(test_user.id, conversation_messages.id, limit=3, cursor=page["next_cursor"])
+            seen = [m["content"] for m in page["messages"]] + seen
+
+        assert seen == [f"m{n}" for n in range(7)]
+        assert page["has_more"] is False
+
+    def test_before_and_after_id(self, db_session, test_user, conversation_messages):
+        """Test that before_id and after_id page around a message, oldest first."""
+        service = ChatService(db_session)
+        anchor = db_session.query(Message).filter(Message.content == "m3").one()
+
+        older = service.get_messages(test_user.id, conversation_messages.id, limit=2, before_id=anchor.id)
+        newer = service.get_messages(test_user.id, conversation_messages.id, limit=2, after_id=anchor.id)
+        rest = service.get_messages(test_user.id, conversation_messages.id, limit=2, cursor=newer["next_cursor"])
+
+        assert [m["content"] for m in older["messages"]] == ["m1", "m2"]
+        assert older["has_more"] is True
+        assert [m["content"] for m in newer["messages"]] == ["m4", "m5"]
+        assert [m["content"] for m in rest["messages"]] == ["m6"]
+        assert rest["next_cursor"] is None
+
+    def test_exact_page_has_no_more(self, db_session, test_user, conversation_messages):
+        """Test that a page ending exactly at the first message does not claim more."""
+        page = ChatService(db_session).get_messages(test_user.id, conversation_messages.id, limit=7)
+
+        assert len(page["messages"]) == 7
+        assert page["has_more"] is False
+        assert page["next_cursor"] is None
+
+    def test_invalid_arguments(self, db_session, test_user, conversation_messages):
+        """Test that mixed paging arguments, bad cursors and unknown anchors are rejected."""
+        service = ChatService(db_session)
+
+        with pytest.raises(ValidationError):
+            service.get_messages(test_user.id, conversation_messages.id, before_id=1, after_id=2)
+        with pytest.raises(ValidationError):
+            service.get_messages(test_user.id, conversation_messages.id, cursor="not-a-cursor")
+        with pytest.raises(NotFoundError):
+            service.get_messages(test_user.id, conversation_messages.id, before_id=999)
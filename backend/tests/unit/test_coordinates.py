@@ -0,0 +1,62 @@
+"""
+Unit tests for numeric coordinate storage and the string-compatible API schemas.
+"""
+import pytest
+from pydantic import ValidationError as PydanticValidationError
+from app.models.user import UserLocation
+from app.schemas.location import LocationUpdate, LocationResponse
+
+
+@pytest.mark.unit
+class TestCoordinates:
+    """Test coordinate column type and schema compatibility."""
+    
+    def test_schema_accepts_strings_and_numbers(self):
+        """Test that requests may send coordinates as strings or numbers."""
+        from_strings = LocationUpdate(latitude="45.123456", longitude="25.654321")
+        from_numbers = LocationUpdate(latitude=45.123456, longitude=25.654321)
+        
+        assert from_strings.latitude == from_numbers.latitude == 45.123456
+        assert from_strings.longitude == 25.654321
+    
+    def test_schema_rejects_non_numeric(self):
+        """Test that non-numeric strings are rejected by the schema."""
+        with pytest.raises(PydanticValidationError, match="must be valid numbers"):
+            LocationUpdate(latitude="north", longitude="25.0")
+    
+    def test_response_serializes_strings(self):
+        """Test that stored floats keep the string wire format."""
+        response = LocationResponse(
+            user_id=1,
+            latitude=45.123456,
+            longitude=25.654321,
+            accuracy_m=None,
+            updated_at="2025-01-01T00:00:00"
+        )
+        
+        assert response.model_dump()["latitude"] == "45.123456"
+        assert response.model_dump()["longitude"] == "25.654321"
+    
+    def test_string_coordinates_stored_as_float(self, db_session, test_user):
+        """Test that legacy string values are converted on write."""
+        db_session.add(UserLocation(user_id=test_user.id, latitude="45.5", longitude="-73.25"))
+        db_session.commit()
+        
+        location = db_session.query(UserLocation).filter(UserLocation.user_id == test_user.id).first()
+        db_session.refresh(location)
+        
+        assert location.latitude == 45.5
+        assert location.longitude == -73.25
+    
+    def test_bounding_box_range_query(self, db_session, test_user, test_user2):
+        """Test that coordinates compare numerically in SQL."""
+        db_session.add(UserLocation(user_id=test_user.id, latitude=9.5, longitude=10.0))
+        db_session.add(UserLocation(user_id=test_user2.id, latitude=10.5, longitude=10.0))
+        db_session.commit()
+        
+        # As strings, "9.5" > "10.0"; as numbers it is below the box
+        in_box = db_session.query(UserLocation).filter(
+            UserLocation.latitude.between(10.0, 11.0)
+        ).all()
+        
+        assert [location.user_id for location in in_box] == [test_user2.id]
@@ -0,0 +1,76 @@
+"""
+Unit tests for the expiry sweeper and the shake data sweeps.
+"""
+import pytest
+from datetime import datetime, timedelta
+from app.core.expiry_sweeper import ExpirySweeper
+from app.core.shake_matcher import shake_matcher
+from app.models.shake_session import ShakeSession, ShakeSessionStatus
+from app.services.shake_service import register_shake_sweeps
+
+
+def _session(user_id: int, status: ShakeSessionStatus, created_at: datetime, expires_at: datetime) -> ShakeSession:
+    return ShakeSession(
+        user_id=user_id,
+        latitude=45.0,
+        longitude=25.0,
+        status=status,
+        created_at=created_at,
+        expires_at=expires_at
+    )
+
+
+@pytest.mark.unit
+class TestExpirySweeper:
+    """Test expiry sweeper."""
+
+    def test_reports_count_per_sweep(self, db_session):
+        """Test that every sweep runs and its count is reported."""
+        sweeper = ExpirySweeper()
+        sweeper.register("first", lambda db: 3)
+        sweeper.register("second", lambda db: 0)
+
+        assert sweeper(db_session) == {"first": 3, "second": 0}
+
+    def test_failing_sweep_does_not_stop_others(self, db_session):
+        """Test that a failure is reported as None and later sweeps still run."""
+        def broken(db):
+            raise RuntimeError("boom")
+
+        sweeper = ExpirySweeper()
+        sweeper.register("broken", broken)
+        sweeper.register("working", lambda db: 1)
+
+        assert sweeper(db_session) == {"broken": None, "working": 1}
+
+    def test_duplicate_name_rejected(self):
+        """Test that sweep names are unique."""
+        sweeper = ExpirySweeper()
+        sweeper.register("sweep", lambda db: 0)
+
+        with pytest.raises(ValueError):
+            sweeper.register("sweep", lambda db: 0)
+
+    def test_shake_sweeps(self, db_session, test_user, test_user2):
+        """Test that stale active sessions expire and old finished ones are deleted."""
+        now = datetime.utcnow()
+        db_session.add_all([
+            _session(test_user.id, ShakeSessionStatus.ACTIVE, now - timedelta(minutes=1), now - timedelta(seconds=45)),
+            _session(test_user2.id, ShakeSessionStatus.ACTIVE, now, now + timedelta(seconds=15)),
+            _session(test_user.id, ShakeSessionStatus.MATCHED, now - timedelta(days=60), now - timedelta(days=60)),
+            _session(test_user2.id, ShakeSessionStatus.MATCHED, now - timedelta(days=1), now - timedelta(days=1)),
+        ])
+        db_session.commit()
+        shake_matcher.clear()
+        sweeper = ExpirySweeper()
+        register_shake_sweeps(sweeper)
+
+        report = sweeper(db_session)
+
+        assert report == {
+            "shake_sessions_expired": 1,
+            "shake_sessions_deleted": 1,
+            "pending_shakes_evicted": 0
+        }
+        statuses = sorted(s.status.value for s in db_session.query(ShakeSession).all())
+        assert statuses == ["active", "expired", "matched"]
@@ -0,0 +1,56 @@
+"""
+Unit tests for the shared geo helpers.
+"""
+import pytest
+from app.core.geo import centroid, degree_deltas, haversine_distance, haversine_distances
+
+
+@pytest.mark.unit
+class TestGeo:
+    """Test geo helpers."""
+
+    def test_haversine_distance(self):
+        """Test a known distance (1 degree of latitude)."""
+        assert haversine_distance(45.0, 25.0, 46.0, 25.0) == pytest.approx(111195, rel=1e-4)
+
+    def test_batched_distances_match_single(self):
+        """Test that the batched distances equal the per-pair ones."""
+        latitudes = [45.001, -33.9, 60.0]
+        longitudes = [25.002, 151.2, -179.9]
+
+        distances = haversine_distances(45.0, 25.0, latitudes, longitudes)
+
+        assert distances == pytest.approx([
+            haversine_distance(45.0, 25.0, lat, lon) for lat, lon in zip(latitudes, longitudes)
+        ])
+
+    @pytest.mark.parametrize("latitude", [-75.0, -45.0, 0.0, 45.0, 75.0])
+    def test_deltas_reach_circle(self, latitude):
+        """Test that the deltas reach the circle's edge north and east."""
+        lat_delta, lon_delta = degree_deltas(latitude, 100.0)
+
+        assert haversine_distance(latitude, 25.0, latitude + lat_delta, 25.0) == pytest.approx(100.0, rel=1e-3)
+        assert haversine_distance(latitude, 25.0, latitude, 25.0 + lon_delta) == pytest.approx(100.0, rel=1e-3)
+
+    def test_deltas_symmetric_across_hemispheres(self):
+        """Test that the longitude span depends on |latitude| only."""
+        assert degree_deltas(60.0, 100.0)[1] == pytest.approx(degree_deltas(-60.0, 100.0)[1])
+        assert degree_deltas(60.0, 100.0)[1] == pytest.approx(2 * degree_deltas(0.0, 100.0)[1], rel=1e-3)
+
+    def test_deltas_at_pole_span_all_longitudes(self):
+        """Test that a circle reaching a pole has no longitude bound."""
+        assert degree_deltas(89.9995, 100.0)[1] is None
+
+    def test_centroid(self):
+        """Test centroids of nearby points and of points across the antimeridian."""
+        lat, lon = centroid([(45.0, 25.0), (45.0002, 25.0)])
+        assert (lat, lon) == pytest.approx((45.0001, 25.0), abs=1e-7)
+
+        lat, lon = centroid([(0.0, 179.9), (0.0, -179.9)])
+        assert lat == pytest.approx(0.0, abs=1e-9)
+        assert abs(lon) == pytest.approx(180.0, abs=1e-7)
+
+    def test_centroid_requires_points(self):
+        """Test that an empty centroid is an error."""
+        with pytest.raises(ValueError):
+            centroid([])
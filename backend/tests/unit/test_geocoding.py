@@ -0,0 +1,100 @@
+"""
+Unit tests for background reverse geocoding.
+"""
+import threading
+import pytest
+from app.core.geocoding import GeocodingCache, GeocodingProvider, ReverseGeocoder, StaticGeocodingProvider
+
+
+class BlockingProvider(GeocodingProvider):
+    """Stand-in provider that holds every lookup until released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def reverse(self, latitude, longitude):
+        self.calls += 1
+        self.release.wait(5)
+        return f"{latitude:.4f}, {longitude:.4f}"
+
+
+class FailingProvider(GeocodingProvider):
+    def __init__(self):
+        self.calls = 0
+
+    def reverse(self, latitude, longitude):
+        self.calls += 1
+        raise ConnectionError("offline")
+
+
+@pytest.mark.unit
+class TestGeocodingCache:
+    """Test geocoding cache."""
+
+    def test_rounded_coordinates_share_entry(self):
+        """Test that nearby points within the key precision hit the same entry."""
+        cache = GeocodingCache(precision=4)
+        cache.put(45.12341, 25.65431, "Somewhere")
+
+        assert cache.get(45.12344, 25.65429) == (True, "Somewhere")
+        assert cache.get(45.1240, 25.6543) == (False, None)
+
+    def test_least_recently_used_evicted(self):
+        """Test that the oldest unused entry goes first when full."""
+        cache = GeocodingCache(max_size=2)
+        cache.put(1.0, 1.0, "a")
+        cache.put(2.0, 2.0, "b")
+        cache.get(1.0, 1.0)
+        cache.put(3.0, 3.0, "c")
+
+        assert cache.get(1.0, 1.0)[0] is True
+        assert cache.get(2.0, 2.0)[0] is False
+
+    def test_entries_expire(self):
+        """Test that entries older than the TTL are misses."""
+        cache = GeocodingCache(ttl_seconds=0)
+        cache.put(1.0, 1.0, "a")
+
+        assert cache.get(1.0, 1.0)[0] is False
+
+
+@pytest.mark.unit
+class TestReverseGeocoder:
+    """Test reverse geocoder."""
+
+    def test_callback_receives_address_and_result_cached(self):
+        """Test inline resolution and that a repeat lookup skips the provider."""
+        provider = StaticGeocodingProvider("Main Street")
+        geocoder = ReverseGeocoder(provider, GeocodingCache(), max_workers=0)
+        resolved = []
+
+        geocoder.resolve(45.0, 25.0, resolved.append)
+        geocoder.resolve(45.0, 25.0, resolved.append)
+
+        assert resolved == ["Main Street", "Main Street"]
+        assert provider.calls == 1
+        assert geocoder.cached(45.0, 25.0) == "Main Street"
+
+    def test_concurrent_lookups_share_provider_call(self):
+        """Test that lookups in flight for the same key are coalesced."""
+        provider = BlockingProvider()
+        geocoder = ReverseGeocoder(provider, GeocodingCache(), max_workers=2)
+        try:
+            first = geocoder.resolve(45.0, 25.0)
+            second = geocoder.resolve(45.00001, 25.0)
+            provider.release.set()
+
+            assert first.result(5) == second.result(5) == "45.0000, 25.0000"
+            assert provider.calls == 1
+        finally:
+            geocoder.shutdown()
+
+    def test_failure_not_cached(self):
+        """Test that provider errors resolve to None and are retried later."""
+        provider = FailingProvider()
+        geocoder = ReverseGeocoder(provider, GeocodingCache(), max_workers=0)
+
+        assert geocoder.resolve(45.0, 25.0).result() is None
+        assert geocoder.resolve(45.0, 25.0).result() is None
+        assert provider.calls == 2
@@ -0,0 +1,85 @@
+"""
+Unit tests for the location history write-behind buffer.
+"""
+import time
+import pytest
+from datetime import datetime
+from sqlalchemy.orm import sessionmaker
+from app.core.location_history_buffer import LocationHistoryBuffer
+from app.models.user_location_history import UserLocationHistory
+from app.services import location_service as location_service_module
+from app.services.location_service import LocationService
+
+
+def _row(user_id: int, latitude: float = 45.1) -> dict:
+    return {
+        "user_id": user_id,
+        "latitude": latitude,
+        "longitude": 25.1,
+        "recorded_at": datetime.utcnow(),
+        "altitude_m": None,
+        "accuracy_m": None,
+        "speed_mps": None,
+        "heading_deg": None,
+        "source": "gps"
+    }
+
+
+@pytest.fixture
+def history_buffer(db_session):
+    """A buffer writing to the test database, stopped after the test."""
+    buffer = LocationHistoryBuffer(
+        session_factory=sessionmaker(bind=db_session.get_bind()),
+        flush_size=3,
+        flush_interval_seconds=60
+    )
+    yield buffer
+    buffer.stop()
+
+
+@pytest.mark.unit
+class TestLocationHistoryBuffer:
+    """Test location history buffer."""
+
+    def test_add_refused_when_not_running(self, history_buffer, test_user):
+        """Test that callers write synchronously when the buffer is stopped."""
+        assert history_buffer.add(_row(test_user.id)) is False
+        assert history_buffer.pending_count() == 0
+
+    def test_stop_flushes_pending_rows(self, db_session, history_buffer, test_user):
+        """Test that stopping the buffer writes every pending row."""
+        history_buffer.start()
+        history_buffer.add(_row(test_user.id, 45.1))
+        history_buffer.add(_row(test_user.id, 45.2))
+
+        assert db_session.query(UserLocationHistory).count() == 0
+
+        history_buffer.stop()
+
+        assert db_session.query(UserLocationHistory).count() == 2
+        assert history_buffer.flushed_count == 2
+
+    def test_flush_on_size_threshold(self, db_session, history_buffer, test_user):
+        """Test that reaching flush_size wakes the flusher thread."""
+        history_buffer.start()
+        for i in range(3):
+            history_buffer.add(_row(test_user.id, 45.0 + i / 10))
+
+        deadline = time.time() + 5
+        while history_buffer.flushed_count < 3 and time.time() < deadline:
+            time.sleep(0.01)
+
+        assert history_buffer.flushed_count == 3
+        assert history_buffer.pending_count() == 0
+
+    def test_update_location_buffers_history(self, db_session, history_buffer, test_user, monkeypatch):
+        """Test that update_location defers the history insert to the buffer."""
+        monkeypatch.setattr(location_service_module, "location_history_buffer", history_buffer)
+        history_buffer.start()
+        location_service = LocationService(db_session)
+
+        location_service.update_location(test_user.id, "45.123456", "25.654321")
+
+        assert history_buffer.pending_count() == 1
+        history_buffer.flush()
+        assert len(location_service.get_location_history(test_user.id)) == 1
@@ -0,0 +1,84 @@
+"""
+Unit tests for the in-memory location index.
+"""
+import pytest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from app.core.location_index import LocationIndex
+
+
+@pytest.mark.unit
+class TestLocationIndex:
+    """Test location index."""
+    
+    def test_upsert_and_get(self):
+        """Test that an upserted location can be read back."""
+        index = LocationIndex()
+        now = datetime.utcnow()
+        
+        index.upsert(1, 45.123456, 25.654321, "10", now)
+        
+        entry = index.get(1)
+        assert entry["latitude"] == 45.123456
+        assert entry["accuracy_m"] == "10"
+        assert len(index) == 1
+    
+    def test_older_update_is_ignored(self):
+        """Test that stale data does not overwrite a newer position."""
+        index = LocationIndex()
+        now = datetime.utcnow()
+        
+        index.upsert(1, 45.2, 25.2, None, now)
+        assert index.upsert(1, 45.1, 25.1, None, now - timedelta(seconds=30)) is False
+        
+        assert index.get(1)["latitude"] == 45.2
+    
+    def test_nearby_filters_by_distance_and_sorts(self):
+        """Test radius search returns closest users first."""
+        index = LocationIndex()
+        now = datetime.utcnow()
+        index.upsert(1, 45.0000, 25.0000, None, now)
+        index.upsert(2, 45.0050, 25.0000, None, now)  # ~556 m north
+        index.upsert(3, 45.0010, 25.0000, None, now)  # ~111 m north
+        index.upsert(4, 46.0000, 25.0000, None, now)  # ~111 km north
+        
+        results = index.nearby(45.0, 25.0, 1000, user_ids={2, 3, 4})
+        
+        assert [entry["user_id"] for entry, _ in results] == [3, 2]
+        assert results[0][1] == pytest.approx(111, abs=2)
+    
+    def test_nearby_across_antimeridian(self):
+        """Test radius search wraps around longitude 180."""
+        index = LocationIndex()
+        index.upsert(1, 0.0, -179.9995, None, datetime.utcnow())
+        
+        results = index.nearby(0.0, 179.9995, 500)
+        
+        assert [entry["user_id"] for entry, _ in results] == [1]
+    
+    def test_moving_user_changes_cell(self):
+        """Test that a moved user is only found at the new position."""
+        index = LocationIndex()
+        now = datetime.utcnow()
+        index.upsert(1, 45.0, 25.0, None, now)
+        index.upsert(1, 48.0, 20.0, None, now + timedelta(seconds=1))
+        
+        assert index.nearby(45.0, 25.0, 1000) == []
+        assert len(index.nearby(48.0, 20.0, 1000)) == 1
+    
+    def test_refresh_if_stale(self):
+        """Test full load on first refresh and throttling afterwards."""
+        index = LocationIndex(refresh_seconds=60)
+        calls = []
+        rows = [SimpleNamespace(user_id=7, latitude=1.0, longitude=2.0,
+                                accuracy_m=None, updated_at=datetime.utcnow())]
+        
+        def fetch(since):
+            calls.append(since)
+            return rows
+        
+        index.refresh_if_stale(fetch)
+        index.refresh_if_stale(fetch)
+        
+        assert calls == [None]
+        assert index.get(7)["longitude"] == 2.0
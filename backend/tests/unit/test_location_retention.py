@@ -0,0 +1,200 @@
+"""
+Unit tests for location history retention and the periodic job runner.
+"""
+import pytest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy.orm import sessionmaker
+from app.core import background_jobs
+from app.core.background_jobs import PeriodicJob
+from app.models.user_location_history import UserLocationHistory
+from app.repositories.job_state_repository import JobStateRepository
+from app.repositories.location_repository import LocationRepository
+from app.services.location_retention_service import LocationRetentionService, LocationRetentionTask
+
+NOW = datetime(2026, 6, 15, 12, 0, 0)
+
+
+def _add_points(db_session, user_id: int, times):
+    LocationRepository(db_session).add_location_history_rows([
+        {"user_id": user_id, "latitude": 45.0, "longitude": 25.0, "recorded_at": recorded_at, "source": "gps"}
+        for recorded_at in times
+    ])
+
+
+def _recorded_at(db_session, user_id: int):
+    return [
+        row.recorded_at for row in db_session.query(UserLocationHistory)
+        .filter(UserLocationHistory.user_id == user_id)
+        .order_by(UserLocationHistory.recorded_at)
+        .all()
+    ]
+
+
+@pytest.fixture
+def retention_service(db_session):
+    return LocationRetentionService(
+        db_session,
+        full_resolution_days=30,
+        downsample_minutes=5,
+        retention_days=365,
+        batch_size=2
+    )
+
+
+@pytest.mark.unit
+class TestLocationRetentionService:
+    """Test location history retention policy."""
+
+    def test_downsamples_old_history(self, db_session, retention_service, test_user):
+        """Test that history past full resolution keeps one point per bucket."""
+        day = datetime(2026, 4, 1, 10, 0, 0)
+        old_points = [day + timedelta(minutes=m) for m in (0, 1, 2, 4, 5, 9, 11)]
+        _add_points(db_session, test_user.id, old_points)
+
+        result = retention_service.run(now=NOW)
+
+        assert result["downsampled_deleted"] == 4
+        assert _recorded_at(db_session, test_user.id) == [
+            day, day + timedelta(minutes=5), day + timedelta(minutes=11)
+        ]
+
+    def test_recent_history_kept_at_full_resolution(self, db_session, retention_service, test_user):
+        """Test that points inside the full-resolution window are untouched."""
+        recent = [NOW - timedelta(days=1, seconds=s) for s in (0, 10, 20)]
+        _add_points(db_session, test_user.id, recent)
+
+        result = retention_service.run(now=NOW)
+
+        assert result["downsampled_deleted"] == 0
+        assert len(_recorded_at(db_session, test_user.id)) == 3
+
+    def test_buckets_are_per_user(self, db_session, retention_service, test_user, test_user2):
+        """Test that one user's point never replaces another user's."""
+        point = datetime(2026, 4, 1, 10, 0, 0)
+        _add_points(db_session, test_user.id, [point])
+        _add_points(db_session, test_user2.id, [point + timedelta(seconds=30)])
+
+        retention_service.run(now=NOW)
+
+        assert len(_recorded_at(db_session, test_user.id)) == 1
+        assert len(_recorded_at(db_session, test_user2.id)) == 1
+
+    def test_expired_history_deleted(self, db_session, retention_service, test_user):
+        """Test that history past the retention horizon is removed in batches."""
+        expired = [NOW - timedelta(days=400, hours=h) for h in range(5)]
+        _add_points(db_session, test_user.id, expired + [NOW])
+
+        result = retention_service.run(now=NOW)
+
+        assert result["expired_deleted"] == 5
+        assert _recorded_at(db_session, test_user.id) == [NOW]
+
+    def test_rerun_is_noop(self, db_session, retention_service, test_user):
+        """Test that a second pass over thinned history deletes nothing."""
+        day = datetime(2026, 4, 1, 10, 0, 0)
+        _add_points(db_session, test_user.id, [day + timedelta(minutes=m) for m in range(10)])
+
+        first = retention_service.run(now=NOW)
+        second = retention_service.run(now=NOW)
+
+        assert first["downsampled_deleted"] == 8
+        assert second["downsampled_deleted"] == 0
+        assert first["downsampled_until"] == NOW - timedelta(days=30)
+
+    def test_task_persists_watermark(self, db_session, test_user):
+        """Test that the task resumes from the watermark stored by an earlier run, not from memory."""
+        LocationRetentionTask("retention-test")(db_session)
+        watermark = JobStateRepository(db_session).get_watermark("retention-test")
+        assert watermark is not None
+        # Thinned history behind the watermark is not scanned again by a fresh task
+        day = watermark - timedelta(days=1)
+        _add_points(db_session, test_user.id, [day + timedelta(minutes=m) for m in range(3)])
+
+        result = LocationRetentionTask("retention-test")(db_session)
+
+        assert result["downsampled_deleted"] == 0
+        assert len(_recorded_at(db_session, test_user.id)) == 3
+
+    def test_partitions_skipped_without_mysql(self, retention_service):
+        """Test that partition maintenance is a no-op on unpartitioned tables."""
+        result = retention_service.run(now=NOW)
+
+        assert result["partitions_added"] == []
+        assert result["partitions_dropped"] == []
+
+
+@pytest.mark.unit
+class TestPeriodicJob:
+    """Test periodic background job runner."""
+
+    def test_run_once_records_result(self, db_session):
+        """Test that a run passes a session to the task and keeps its result."""
+        sessions = []
+
+        def task(db):
+            sessions.append(db)
+            return {"swept": 3}
+
+        job = PeriodicJob("test-job", task, interval_seconds=60,
+                          session_factory=sessionmaker(bind=db_session.get_bind()))
+
+        assert job.run_once() == {"swept": 3}
+        assert job.run_count == 1
+        assert job.last_result == {"swept": 3}
+        assert job.last_run_at is not None
+        assert len(sessions) == 1
+
+    def test_failure_is_counted_not_raised(self, db_session):
+        """Test that a failing task does not propagate out of the job."""
+        def task(db):
+            raise RuntimeError("boom")
+
+        job = PeriodicJob("test-job", task, interval_seconds=60,
+                          session_factory=sessionmaker(bind=db_session.get_bind()))
+
+        assert job.run_once() is None
+        assert job.failure_count == 1
+        assert job.run_count == 0
+
+    def test_start_runs_immediately_and_stops(self, db_session):
+        """Test that the job thread runs on start and stop joins it."""
+        job = PeriodicJob("test-job", lambda db: {"ok": True}, interval_seconds=60,
+                          session_factory=sessionmaker(bind=db_session.get_bind()))
+
+        job.start()
+        job.stop()
+
+        assert job.run_count == 1
+        assert not job.running
+
+    def test_skips_run_when_lock_is_held(self, db_session, monkeypatch):
+        """Test that a job whose lock another worker holds skips the run."""
+        calls = []
+
+        @contextmanager
+        def held_elsewhere(engine, name):
+            calls.append(name)
+            yield False
+
+        monkeypatch.setattr(background_jobs, "advisory_lock", held_elsewhere)
+        job = PeriodicJob("test-job", lambda db: {"ok": True}, interval_seconds=60,
+                          session_factory=sessionmaker(bind=db_session.get_bind()), lock_name="test-lock")
+
+        assert job.run_once() is None
+        assert calls == ["test-lock"]
+        assert job.skip_count == 1
+        assert job.run_count == 0
+        assert job.failure_count == 0
+
+    def test_warns_once_without_named_locks(self, db_session, caplog):
+        """Test that a locked job on a database without GET_LOCK runs, with one warning."""
+        job = PeriodicJob("test-job", lambda db: {"ok": True}, interval_seconds=60,
+                          session_factory=sessionmaker(bind=db_session.get_bind()), lock_name="test-lock")
+
+        with caplog.at_level("WARNING", logger="app.core.background_jobs"):
+            job.run_once()
+            job.run_once()
+
+        assert job.run_count == 2
+        assert [r.message for r in caplog.records] == ["Background job test-job runs unlocked: named locks need MySQL"]
@@ -2,9 +2,14 @@
 Unit tests for LocationService.
 """
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta
+import json
+from sqlalchemy import event
 from app.services.location_service import LocationService
 from app.core.exceptions import ValidationError
+from app.core.security import create_access_token
+from app.core.location_write_stats import location_write_stats
+from app.models.user_location_history import UserLocationHistory
 
 
 @pytest.mark.unit
@@ -24,8 +29,8 @@ class TestLocationService:
         
         assert location is not None
         assert location["user_id"] == test_user.id
-        assert location["latitude"] == "45.123456"
-        assert location["longitude"] == "25.654321"
+        assert location["latitude"] == 45.123456
+        assert location["longitude"] == 25.654321
         assert location["accuracy_m"] == "10.5"
     
     def test_update_location_invalid_latitude(self, db_session, test_user):
@@ -61,6 +66,89 @@ class TestLocationService:
                 longitude="25.654321"
             )
     
+    def test_update_location_stationary_suppressed(self, db_session, test_user):
+        """Test that a repeated fix within the threshold only refreshes the timestamp."""
+        location_service = LocationService(db_session)
+        first = location_service.update_location(test_user.id, "45.123456", "25.654321")
+        suppressed_before = location_write_stats.suppressed
+        
+        # ~5.5 m north of the stored position
+        second = location_service.update_location(test_user.id, "45.123506", "25.654321")
+        
+        assert second["history_suppressed"] is True
+        assert second["latitude"] == 45.123456
+        assert second["updated_at"] >= first["updated_at"]
+        assert location_write_stats.suppressed == suppressed_before + 1
+        assert db_session.query(UserLocationHistory).count() == 1
+    
+    def test_update_location_moved_not_suppressed(self, db_session, test_user):
+        """Test that moving beyond the threshold is written normally."""
+        location_service = LocationService(db_session)
+        location_service.update_location(test_user.id, "45.123456", "25.654321")
+        
+        # ~110 m north
+        moved = location_service.update_location(test_user.id, "45.124456", "25.654321")
+        
+        assert moved["history_suppressed"] is False
+        assert moved["latitude"] == 45.124456
+        assert db_session.query(UserLocationHistory).count() == 2
+    
+    def test_update_location_reads_row_once(self, db_session, test_user):
+        """Test that a move updates the row loaded for the stationary check instead of selecting it again."""
+        location_service = LocationService(db_session)
+        location_service.update_location(test_user.id, "45.123456", "25.654321")
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db_session.get_bind(), "before_cursor_execute", listener)
+        try:
+            location_service.update_location(test_user.id, "45.124456", "25.654321", save_history=False)
+        finally:
+            event.remove(db_session.get_bind(), "before_cursor_execute", listener)
+        
+        selects = [s for s in statements if s.lstrip().upper().startswith("SELECT") and "FROM user_locations" in s]
+        # The stationary check, then the refresh after the commit
+        assert len(selects) == 2
+    
+    def test_update_location_accuracy_widens_threshold(self, db_session, test_user):
+        """Test that a move inside the reported accuracy is treated as stationary."""
+        location_service = LocationService(db_session)
+        location_service.update_location(test_user.id, "45.123456", "25.654321")
+        
+        # ~55 m north, reported accuracy 80 m
+        result = location_service.update_location(test_user.id, "45.123956", "25.654321", accuracy_m="80")
+        
+        assert result["history_suppressed"] is True
+    
+    def test_update_location_stale_position_not_suppressed(self, db_session, test_user):
+        """Test that an old stored position is always replaced."""
+        location_service = LocationService(db_session)
+        location_service.update_location(test_user.id, "45.123456", "25.654321")
+        stored = location_service.location_repo.get_user_location(test_user.id)
+        stored.updated_at = stored.last_written_at = datetime.utcnow() - timedelta(hours=1)
+        db_session.commit()
+        
+        result = location_service.update_location(test_user.id, "45.123456", "25.654321")
+        
+        assert result["history_suppressed"] is False
+        assert db_session.query(UserLocationHistory).count() == 2
+    
+    def test_update_location_stationary_device_writes_after_max_age(self, db_session, test_user):
+        """Test that frequent stationary fixes do not keep a stored position fresh forever."""
+        location_service = LocationService(db_session)
+        location_service.update_location(test_user.id, "45.123456", "25.654321")
+        stored = location_service.location_repo.get_user_location(test_user.id)
+        # Written 400 s ago, touched by a suppressed fix a minute ago
+        stored.last_written_at = datetime.utcnow() - timedelta(seconds=400)
+        stored.updated_at = datetime.utcnow() - timedelta(seconds=60)
+        db_session.commit()
+        
+        result = location_service.update_location(test_user.id, "45.123456", "25.654321")
+        again = location_service.update_location(test_user.id, "45.123456", "25.654321")
+        
+        assert result["history_suppressed"] is False
+        assert again["history_suppressed"] is True
+        assert db_session.query(UserLocationHistory).count() == 2
+    
     def test_get_friends_locations_empty(self, db_session, test_user):
         """Test getting friends locations when user has no friends."""
         location_service = LocationService(db_session)
@@ -88,7 +176,7 @@ class TestLocationService:
         
         assert len(locations) == 1
         assert locations[0]["user_id"] == test_user2.id
-        assert locations[0]["latitude"] == "45.123456"
+        assert locations[0]["latitude"] == 45.123456
     
     def test_get_friends_locations_sharing_disabled(self, db_session, test_user, test_user2, test_friendship):
         """Test that friends with location sharing disabled are not returned."""
@@ -106,6 +194,23 @@ class TestLocationService:
         
         assert len(locations) == 0
     
+    def test_get_nearby_friends(self, db_session, test_user, test_user2, test_friendship):
+        """Test finding friends within a radius of the user's location."""
+        location_service = LocationService(db_session)
+        test_friendship.status = "accepted"
+        test_user2.location_sharing_enabled = True
+        db_session.commit()
+        
+        location_service.update_location(test_user.id, "45.0000", "25.0000")
+        location_service.update_location(test_user2.id, "45.0010", "25.0000")
+        
+        nearby = location_service.get_nearby_friends(test_user.id, radius_m=500)
+        
+        assert len(nearby) == 1
+        assert nearby[0]["user_id"] == test_user2.id
+        assert nearby[0]["distance_m"] == pytest.approx(111, abs=2)
+        assert location_service.get_nearby_friends(test_user.id, radius_m=50) == []
+    
     def test_add_location_history(self, db_session, test_user):
         """Test adding location history."""
         location_service = LocationService(db_session)
@@ -121,7 +226,35 @@ class TestLocationService:
         
         assert history is not None
         assert history["user_id"] == test_user.id
-        assert history["latitude"] == "45.123456"
+        assert history["latitude"] == 45.123456
+    
+    def test_add_location_history_batch(self, db_session, test_user):
+        """Test adding many history records in one call."""
+        location_service = LocationService(db_session)
+        now = datetime.utcnow()
+        points = [
+            {"latitude": f"45.{i}", "longitude": "25.1", "recorded_at": now, "source": "gps"}
+            for i in range(1, 6)
+        ]
+        
+        result = location_service.add_location_history_batch(test_user.id, points)
+        
+        assert result["inserted"] == 5
+        assert len(location_service.get_location_history(test_user.id)) == 5
+    
+    def test_add_location_history_batch_rejects_invalid_point(self, db_session, test_user):
+        """Test that one invalid point rejects the whole batch."""
+        location_service = LocationService(db_session)
+        now = datetime.utcnow()
+        points = [
+            {"latitude": "45.1", "longitude": "25.1", "recorded_at": now},
+            {"latitude": "145.1", "longitude": "25.1", "recorded_at": now},
+        ]
+        
+        with pytest.raises(ValidationError, match=r"points\[1\]"):
+            location_service.add_location_history_batch(test_user.id, points)
+        
+        assert location_service.get_location_history(test_user.id) == []
     
     def test_get_location_history(self, db_session, test_user):
         """Test getting location history."""
@@ -145,5 +278,86 @@ class TestLocationService:
         history = location_service.get_location_history(test_user.id)
         
         assert len(history) == 2
-        assert history[0]["latitude"] == "45.2"  # Most recent first
+        assert history[0]["latitude"] == 45.2  # Most recent first
 
+    
+    def test_get_location_history_page(self, db_session, test_user):
+        """Test keyset pagination walks all records exactly once, newest first."""
+        location_service = LocationService(db_session)
+        now = datetime.utcnow()
+        # Two records share a timestamp to exercise the id tie-breaker
+        points = [
+            {"latitude": 45.0 + i / 10, "longitude": 25.1, "recorded_at": now + timedelta(seconds=min(i, 3))}
+            for i in range(5)
+        ]
+        location_service.add_location_history_batch(test_user.id, points)
+        
+        seen = []
+        cursor = None
+        pages = 0
+        while True:
+            page = location_service.get_location_history_page(test_user.id, limit=2, cursor=cursor)
+            seen.extend(item["id"] for item in page["items"])
+            pages += 1
+            if not page["has_more"]:
+                assert page["next_cursor"] is None
+                break
+            cursor = page["next_cursor"]
+        
+        assert pages == 3
+        assert seen == [5, 4, 3, 2, 1]
+    
+    def test_get_location_history_page_invalid_cursor(self, db_session, test_user):
+        """Test that a malformed cursor is rejected."""
+        location_service = LocationService(db_session)
+        
+        with pytest.raises(ValidationError, match="Invalid pagination cursor"):
+            location_service.get_location_history_page(test_user.id, cursor="not-a-cursor")
+    
+    def test_export_location_history_ndjson(self, db_session, test_user):
+        """Test streaming history export as NDJSON, oldest first."""
+        location_service = LocationService(db_session)
+        now = datetime.utcnow()
+        points = [
+            {"latitude": 45.0 + i / 10, "longitude": 25.1, "recorded_at": now + timedelta(seconds=i)}
+            for i in range(5)
+        ]
+        location_service.add_location_history_batch(test_user.id, points)
+        
+        chunks = list(location_service.export_location_history(test_user.id, batch_size=2))
+        records = [json.loads(line) for line in "".join(chunks).splitlines()]
+        
+        assert len(chunks) == 3
+        assert [r["latitude"] for r in records] == [45.0, 45.1, 45.2, 45.3, 45.4]
+        assert records[0]["recorded_at"] == now.isoformat()
+    
+    def test_export_location_history_csv(self, db_session, test_user):
+        """Test streaming history export as CSV with a header row."""
+        location_service = LocationService(db_session)
+        location_service.add_location_history(
+            user_id=test_user.id,
+            latitude="45.1",
+            longitude="25.1",
+            recorded_at=datetime.utcnow()
+        )
+        
+        lines = "".join(location_service.export_location_history(test_user.id, export_format="csv")).splitlines()
+        
+        assert lines[0].startswith("id,recorded_at,latitude,longitude")
+        assert len(lines) == 2
+        assert ",45.1,25.1," in lines[1]
+    
+    def test_export_endpoint_streams_from_own_session(self, client, db_session, test_user):
+        """Test that the export endpoint streams through the injected session factory."""
+        LocationService(db_session).add_location_history(
+            user_id=test_user.id,
+            latitude="45.1",
+            longitude="25.1",
+            recorded_at=datetime.utcnow()
+        )
+        token = create_access_token({"sub": str(test_user.id)})
+        
+        response = client.get("/api/v1/location/history/export", headers={"Authorization": f"Bearer {token}"})
+        
+        assert response.status_code == 200
+        assert [json.loads(line)["latitude"] for line in response.text.splitlines()] == [45.1]
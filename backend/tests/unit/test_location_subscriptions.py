@@ -0,0 +1,149 @@
+"""
+Unit tests for live friend location push.
+"""
+import asyncio
+import json
+import pytest
+from app.core.location_subscriptions import LocationSubscriptionManager
+from app.models.friendship import Friendship
+from app.services import location_service as location_service_module
+from app.services.location_service import LocationService
+
+
+class FakeWebSocket:
+    """Records what would have been sent to the client."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, data: str):
+        self.sent.append(json.loads(data))
+
+
+class StalledWebSocket(FakeWebSocket):
+    """A client that does not read until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.released = asyncio.Event()
+
+    async def send_text(self, data: str):
+        await self.released.wait()
+        await super().send_text(data)
+
+
+@pytest.fixture
+def subscriptions(monkeypatch):
+    manager = LocationSubscriptionManager()
+    monkeypatch.setattr(location_service_module, "location_subscriptions", manager)
+    return manager
+
+
+@pytest.fixture
+def friends(db_session, test_user, test_user2):
+    friendship = Friendship(user_id=test_user.id, friend_id=test_user2.id, status="accepted")
+    db_session.add(friendship)
+    db_session.commit()
+    return friendship
+
+
+async def _update_and_deliver(db_session, subscriptions, user_id: int, latitude: float = 45.123456):
+    LocationService(db_session).update_location(user_id, latitude, 25.654321, save_history=False)
+    await subscriptions.flush()
+
+
+@pytest.mark.unit
+class TestLocationSubscriptions:
+    """Test pushing location updates to subscribed friends."""
+
+    @pytest.mark.asyncio
+    async def test_update_pushed_to_friend(self, db_session, subscriptions, friends, test_user, test_user2):
+        """Test that a friend's open socket receives the new position."""
+        websocket = FakeWebSocket()
+        subscriptions.connect(websocket, test_user2.id)
+
+        await _update_and_deliver(db_session, subscriptions, test_user.id)
+
+        assert len(websocket.sent) == 1
+        message = websocket.sent[0]
+        assert message["type"] == "friend_location"
+        assert message["location"]["user_id"] == test_user.id
+        assert message["location"]["username"] == test_user.username
+        assert message["location"]["latitude"] == "45.123456"
+
+    @pytest.mark.asyncio
+    async def test_not_pushed_when_sharing_disabled(self, db_session, subscriptions, friends, test_user, test_user2):
+        """Test that location_sharing_enabled=False keeps the position private."""
+        test_user.location_sharing_enabled = False
+        db_session.commit()
+        websocket = FakeWebSocket()
+        subscriptions.connect(websocket, test_user2.id)
+
+        await _update_and_deliver(db_session, subscriptions, test_user.id)
+
+        assert websocket.sent == []
+
+    @pytest.mark.asyncio
+    async def test_close_friends_only_filter(self, db_session, subscriptions, friends, test_user, test_user2):
+        """Test that close-friends-only sockets skip other friends."""
+        websocket = FakeWebSocket()
+        subscriptions.connect(websocket, test_user2.id, close_friends_only=True)
+
+        await _update_and_deliver(db_session, subscriptions, test_user.id)
+        assert websocket.sent == []
+
+        friends.is_close_friend = True
+        db_session.commit()
+        await _update_and_deliver(db_session, subscriptions, test_user.id, latitude=45.2)
+        assert len(websocket.sent) == 1
+
+    @pytest.mark.asyncio
+    async def test_not_pushed_to_non_friends(self, db_session, subscriptions, test_user, test_user2):
+        """Test that subscribers who are not friends receive nothing."""
+        websocket = FakeWebSocket()
+        subscriptions.connect(websocket, test_user2.id)
+
+        await _update_and_deliver(db_session, subscriptions, test_user.id)
+
+        assert websocket.sent == []
+
+    @pytest.mark.asyncio
+    async def test_disconnect_stops_delivery(self, db_session, subscriptions, friends, test_user, test_user2):
+        """Test that closed sockets are forgotten."""
+        websocket = FakeWebSocket()
+        subscriptions.connect(websocket, test_user2.id)
+        subscriptions.disconnect(websocket)
+
+        await _update_and_deliver(db_session, subscriptions, test_user.id)
+
+        assert websocket.sent == []
+        assert subscriptions.subscribed_user_ids() == set()
+
+    @pytest.mark.asyncio
+    async def test_slow_socket_does_not_delay_others(self, db_session, subscriptions, friends,
+                                                     test_user, test_user2):
+        """Test that a stalled client does not hold up delivery to another one."""
+        slow, fast = StalledWebSocket(), FakeWebSocket()
+        subscriptions.connect(slow, test_user2.id)
+        subscriptions.connect(fast, test_user2.id)
+
+        LocationService(db_session).update_location(test_user.id, 45.1, 25.6, save_history=False)
+        await asyncio.wait_for(subscriptions.outbound.queues[fast].join(), timeout=1.0)
+
+        assert len(fast.sent) == 1
+        assert slow.sent == []
+        slow.released.set()
+        await subscriptions.flush()
+        assert len(slow.sent) == 1
+
+    @pytest.mark.asyncio
+    async def test_publish_from_worker_thread(self, subscriptions, test_user2):
+        """Test that a publish from the threadpool is delivered on the socket's loop."""
+        websocket = FakeWebSocket()
+        subscriptions.connect(websocket, test_user2.id)
+
+        await asyncio.to_thread(subscriptions.publish, {"type": "friend_location"}, {test_user2.id: False})
+        await asyncio.sleep(0)
+        await subscriptions.flush()
+
+        assert websocket.sent == [{"type": "friend_location"}]
@@ -0,0 +1,204 @@
+"""
+Unit tests for cross-worker chat broadcast backends.
+"""
+import asyncio
+import json
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from app.core.pubsub import InProcessBroadcastBackend, RedisBroadcastBackend
+from app.core.websocket_manager import WebSocketManager
+from tests.helpers.redis_broker import LocalBroker
+
+
+class FakeWebSocket:
+    """Records what would have been sent to the client."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        self.sent.append(json.loads(data))
+
+
+async def wait_for(condition, timeout: float = 2.0):
+    """Poll until condition() holds; messages through the broker arrive asynchronously."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.unit
+class TestInProcessBroadcast:
+    """Test managers sharing an in-process backend, standing in for workers."""
+
+    @pytest.mark.asyncio
+    async def test_broadcast_reaches_other_worker_once(self):
+        """Test that a broadcast reaches sockets on both workers, each exactly once."""
+        hub = InProcessBroadcastBackend()
+        worker_a, worker_b = WebSocketManager(hub), WebSocketManager(hub)
+        await worker_a.start()
+        await worker_b.start()
+        socket_a, socket_b = FakeWebSocket(), FakeWebSocket()
+        await worker_a.connect_user(socket_a, user_id=1, conversation_ids=[10])
+        await worker_b.connect_user(socket_b, user_id=2, conversation_ids=[10])
+
+        await worker_a.broadcast_to_conversation(10, {"type": "new_message"})
+        await worker_a.flush()
+        await worker_b.flush()
+
+        assert socket_a.sent == [{"type": "new_message", "conversation_id": 10}]
+        assert socket_b.sent == [{"type": "new_message", "conversation_id": 10}]
+
+    @pytest.mark.asyncio
+    async def test_exclusion_and_participants_cross_workers(self):
+        """Test that sender exclusion and new-conversation subscription apply on remote workers."""
+        hub = InProcessBroadcastBackend()
+        worker_a, worker_b = WebSocketManager(hub), WebSocketManager(hub)
+        await worker_a.start()
+        await worker_b.start()
+        sender_elsewhere, recipient = FakeWebSocket(), FakeWebSocket()
+        await worker_b.connect_user(sender_elsewhere, user_id=1, conversation_ids=[])
+        await worker_b.connect_user(recipient, user_id=2, conversation_ids=[])
+
+        await worker_a.broadcast_to_conversation(
+            20, {"type": "new_message"}, exclude_user_id=1, participant_ids=[1, 2]
+        )
+        await worker_b.flush()
+
+        assert sender_elsewhere.sent == []
+        assert recipient.sent == [{"type": "new_message", "conversation_id": 20}]
+
+    @pytest.mark.asyncio
+    async def test_publish_failure_keeps_local_delivery(self):
+        """Test that local sockets are still served when the backend fails."""
+
+        class BrokenBackend(InProcessBroadcastBackend):
+            async def publish(self, message: dict):
+                raise ConnectionError("broker down")
+
+        manager = WebSocketManager(BrokenBackend())
+        socket = FakeWebSocket()
+        await manager.connect_user(socket, user_id=1, conversation_ids=[10])
+
+        await manager.broadcast_to_conversation(10, {"type": "new_message"})
+        await manager.flush()
+
+        assert len(socket.sent) == 1
+
+
+@pytest.mark.unit
+class TestRedisBroadcast:
+    """Test the broker backend against the local stand-in broker."""
+
+    @pytest.mark.asyncio
+    async def test_publish_reaches_subscribers(self):
+        """Test that a published message reaches every subscriber."""
+        broker = LocalBroker()
+        port = await broker.start()
+        url = f"redis://127.0.0.1:{port}/0"
+        publisher = RedisBroadcastBackend(url, "chat")
+        subscriber = RedisBroadcastBackend(url, "chat")
+        received = []
+
+        async def handler(message):
+            received.append(message)
+
+        try:
+            await subscriber.subscribe(handler)
+            await subscriber.wait_until_subscribed(timeout=2.0)
+            await publisher.publish({"hello": "world"})
+            await wait_for(lambda: received)
+            assert received == [{"hello": "world"}]
+        finally:
+            await publisher.close()
+            await subscriber.close()
+            await broker.stop()
+
+    @pytest.mark.asyncio
+    async def test_managers_across_broker(self):
+        """Test end-to-end fan-out between two managers through the broker."""
+        broker = LocalBroker()
+        port = await broker.start()
+        url = f"redis://127.0.0.1:{port}/0"
+        worker_a = WebSocketManager(RedisBroadcastBackend(url, "chat"))
+        worker_b = WebSocketManager(RedisBroadcastBackend(url, "chat"))
+        try:
+            for worker in (worker_a, worker_b):
+                await worker.start()
+                await worker.backend.wait_until_subscribed(timeout=2.0)
+            socket_a, socket_b = FakeWebSocket(), FakeWebSocket()
+            await worker_a.connect_user(socket_a, user_id=1, conversation_ids=[10])
+            await worker_b.connect_user(socket_b, user_id=2, conversation_ids=[10])
+
+            await worker_a.broadcast_to_conversation(10, {"type": "new_message", "content": "hi"})
+            await wait_for(lambda: socket_b.sent)
+            # Give a duplicate echo a chance to show up
+            await asyncio.sleep(0.05)
+            await worker_a.flush()
+
+            assert socket_a.sent == [{"type": "new_message", "content": "hi", "conversation_id": 10}]
+            assert socket_b.sent == [{"type": "new_message", "content": "hi", "conversation_id": 10}]
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
+            await broker.stop()
+
+    @pytest.mark.asyncio
+    async def test_publisher_reconnects_after_broker_restart(self):
+        """Test that a stale publisher connection is replaced transparently."""
+        broker = LocalBroker()
+        port = await broker.start()
+        publisher = RedisBroadcastBackend(f"redis://127.0.0.1:{port}/0", "chat")
+        try:
+            await publisher.publish({"n": 1})
+            await broker.stop()
+            await broker.start(port=port)
+            await publisher.publish({"n": 2})
+        finally:
+            await publisher.close()
+            await broker.stop()
+
+    @pytest.mark.asyncio
+    async def test_subscriber_resubscribes_after_broker_restart(self):
+        """Test that the subscriber comes back on its own once the broker does."""
+        broker = LocalBroker()
+        port = await broker.start()
+        url = f"redis://127.0.0.1:{port}/0"
+        publisher = RedisBroadcastBackend(url, "chat")
+        subscriber = RedisBroadcastBackend(url, "chat", reconnect_delay_seconds=0.01)
+        received = []
+
+        async def handler(message):
+            received.append(message)
+
+        try:
+            await subscriber.subscribe(handler)
+            await subscriber.wait_until_subscribed(timeout=2.0)
+            await broker.stop()
+            await wait_for(lambda: not subscriber._subscribed.is_set())
+            await broker.start(port=port)
+            await subscriber.wait_until_subscribed(timeout=2.0)
+
+            await publisher.publish({"n": 1})
+            await wait_for(lambda: received)
+            assert received == [{"n": 1}]
+        finally:
+            await publisher.close()
+            await subscriber.close()
+            await broker.stop()
+
+    @pytest.mark.asyncio
+    async def test_publish_fails_without_broker(self):
+        """Test that publishing raises when no broker is reachable."""
+        broker = LocalBroker()
+        port = await broker.start()
+        await broker.stop()
+        publisher = RedisBroadcastBackend(f"redis://127.0.0.1:{port}/0", "chat")
+
+        with pytest.raises(RedisConnectionError):
+            await publisher.publish({"n": 1})
@@ -0,0 +1,27 @@
+"""
+Unit tests for the helpers of the shake load-simulation benchmark.
+"""
+import pytest
+from benchmarks.shake_load import build_population, percentile
+import random
+
+
+@pytest.mark.unit
+class TestShakeBenchmark:
+    """Test shake benchmark harness."""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = [float(i) for i in range(1, 101)]
+
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([], 95) == 0.0
+
+    def test_population_is_clustered(self):
+        """Test population size and friend pair ordering."""
+        positions, pairs = build_population(40, 4, 30.0, 0.5, 1, random.Random(1))
+
+        assert len(positions) == 40
+        assert all(first < second for first, second in pairs)
+
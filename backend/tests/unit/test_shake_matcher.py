@@ -0,0 +1,280 @@
+"""
+Unit tests for the in-memory shake matcher.
+"""
+import asyncio
+import threading
+import pytest
+from datetime import datetime, timedelta
+from app.core.shake_matcher import ShakeMatcher, claim_single_process, geohash_encode, match_scores, parse_accuracy
+
+NOW = datetime(2026, 6, 15, 12, 0, 0)
+
+
+@pytest.fixture
+def matcher():
+    return ShakeMatcher(precision=7, ttl_seconds=15)
+
+
+@pytest.mark.unit
+class TestShakeMatcher:
+    """Test shake matcher."""
+
+    def test_geohash_encode(self):
+        """Test geohash against a known value."""
+        assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+    def test_session_ids_unique_across_matchers(self):
+        """Test that matchers in different processes (or after a restart) do not reuse session IDs."""
+        ids = {ShakeMatcher().add(1, 45.0, 25.0, None, friend_ids=[], now=NOW).session_id for _ in range(100)}
+
+        assert len(ids) == 100
+        assert all(0 < session_id < 2 ** 53 for session_id in ids)
+
+    def test_second_process_refused(self, tmp_path):
+        """Test that only one process at a time may serve shakes, and the next once it is gone."""
+        lock_path = str(tmp_path / "shake-matcher.lock")
+        first = claim_single_process(lock_path)
+        # Another open file description of the lock competes like another worker would
+        with pytest.raises(RuntimeError, match="single worker"):
+            claim_single_process(lock_path)
+
+        first.close()
+        claim_single_process(lock_path).close()
+
+    def test_claim_match_with_nearby_friend(self, matcher):
+        """Test that two friends shaking close together are matched once."""
+        matcher.add(1, 45.0, 25.0, None, friend_ids=[2], now=NOW)
+        matcher.add(2, 45.0003, 25.0, None, friend_ids=[1], now=NOW)
+
+        claimed = matcher.claim_match(2, radius_m=100, now=NOW)
+
+        assert claimed is not None
+        own, partner = claimed
+        assert own.user_id == 2
+        assert partner.user_id == 1
+        assert len(matcher) == 0
+        assert matcher.claim_match(1, radius_m=100, now=NOW) is None
+
+    def test_no_match_with_non_friend(self, matcher):
+        """Test that strangers shaking nearby are not matched."""
+        matcher.add(1, 45.0, 25.0, None, friend_ids=[], now=NOW)
+        matcher.add(2, 45.0, 25.0, None, friend_ids=[3], now=NOW)
+
+        assert matcher.claim_match(2, radius_m=100, now=NOW) is None
+        assert len(matcher) == 2
+
+    def test_no_match_out_of_range(self, matcher):
+        """Test that friends further apart than the radius are not matched."""
+        matcher.add(1, 45.0, 25.0, None, friend_ids=[2], now=NOW)
+        matcher.add(2, 45.002, 25.0, None, friend_ids=[1], now=NOW)
+
+        assert matcher.claim_match(2, radius_m=100, now=NOW) is None
+
+    def test_match_across_cell_boundary(self, matcher):
+        """Test that neighbouring geohash cells are searched."""
+        # Cell boundary at longitude ~25.000763 for precision 7
+        matcher.add(1, 45.0, 25.0005, None, friend_ids=[2], now=NOW)
+        matcher.add(2, 45.0, 25.0010, None, friend_ids=[1], now=NOW)
+
+        assert matcher.get(1, now=NOW).geohash != matcher.get(2, now=NOW).geohash
+        assert matcher.claim_match(2, radius_m=100, now=NOW) is not None
+
+    def test_closest_friend_wins(self, matcher):
+        """Test that the closest of several friends is chosen."""
+        matcher.add(1, 45.0005, 25.0, None, friend_ids=[3], now=NOW)
+        matcher.add(2, 45.0001, 25.0, None, friend_ids=[3], now=NOW)
+        matcher.add(3, 45.0, 25.0, None, friend_ids=[1, 2], now=NOW)
+
+        _, partner = matcher.claim_match(3, radius_m=100, now=NOW)
+
+        assert partner.user_id == 2
+
+    def test_precise_fix_beats_closer_fuzzy_fix(self, matcher):
+        """Test that a tight fix 30 m away beats a 100 m-accuracy fix 20 m away."""
+        matcher.add(1, 45.0 + 30 / 111320, 25.0, "5", friend_ids=[3], now=NOW)
+        matcher.add(2, 45.0 + 20 / 111320, 25.0, "100", friend_ids=[3], now=NOW)
+        matcher.add(3, 45.0, 25.0, "5", friend_ids=[1, 2], now=NOW)
+
+        _, partner = matcher.claim_match(3, radius_m=100, now=NOW)
+
+        assert partner.user_id == 1
+
+    def test_simultaneous_shake_beats_earlier_one(self, matcher):
+        """Test that the shake closest in time wins at equal distance."""
+        matcher.add(1, 45.0001, 25.0, "10", friend_ids=[3], now=NOW)
+        later = NOW + timedelta(seconds=8)
+        matcher.add(2, 45.0, 25.0001, "10", friend_ids=[3], now=later)
+        matcher.add(3, 45.0, 25.0, "10", friend_ids=[1, 2], now=later)
+
+        _, partner = matcher.claim_match(3, radius_m=100, now=later)
+
+        assert partner.user_id == 2
+
+    def test_match_scores(self):
+        """Test score ordering for distance, accuracy and time."""
+        near, far, fuzzy, late = match_scores(
+            [5.0, 50.0, 5.0, 5.0], 10.0, [10.0, 10.0, 200.0, 10.0], [0.0, 0.0, 0.0, 10.0],
+            spread_m=10.0, time_scale_s=3.0
+        )
+
+        assert near < far
+        assert near < fuzzy
+        assert near < late
+
+    def test_parse_accuracy(self):
+        """Test accuracy parsing falls back to the default."""
+        assert parse_accuracy("12.5", 20.0) == 12.5
+        assert parse_accuracy(None, 20.0) == 20.0
+        assert parse_accuracy("abc", 20.0) == 20.0
+        assert parse_accuracy("-3", 20.0) == 20.0
+        assert parse_accuracy("0.1", 20.0) == 1.0
+
+    def test_expired_shakes_evicted(self, matcher):
+        """Test that shakes disappear after their TTL."""
+        matcher.add(1, 45.0, 25.0, None, friend_ids=[2], now=NOW)
+        later = NOW + timedelta(seconds=16)
+        matcher.add(2, 45.0, 25.0, None, friend_ids=[1], now=later)
+
+        assert matcher.get(1, now=later) is None
+        assert matcher.claim_match(2, radius_m=100, now=later) is None
+        assert len(matcher) == 1
+
+    def test_purge_expired_ignores_replaced_shakes(self, matcher):
+        """Test that a replaced shake's old expiry does not evict the new one."""
+        matcher.add(1, 45.0, 25.0, None, friend_ids=[], now=NOW)
+        matcher.add(1, 45.0, 25.0, None, friend_ids=[], now=NOW + timedelta(seconds=10))
+
+        assert matcher.purge_expired(now=NOW + timedelta(seconds=20)) == 0
+        assert matcher.get(1, now=NOW + timedelta(seconds=20)) is not None
+
+    def test_restore_after_failed_match(self, matcher):
+        """Test that claimed shakes can be put back."""
+        matcher.add(1, 45.0, 25.0, None, friend_ids=[2], now=NOW)
+        matcher.add(2, 45.0, 25.0, None, friend_ids=[1], now=NOW)
+        claimed = matcher.claim_match(2, radius_m=100, now=NOW)
+
+        matcher.restore(claimed, now=NOW)
+
+        assert len(matcher) == 2
+
+
+    def test_claim_blocks_partner_until_delivered(self, matcher):
+        """Test that the partner of a claimed match waits for its result."""
+        matcher.add(1, 45.0, 25.0, None, friend_ids=[2])
+        matcher.add(2, 45.0, 25.0, None, friend_ids=[1])
+        matcher.claim_match(2, radius_m=100)
+        results = []
+
+        waiter = threading.Thread(target=lambda: results.append(matcher.wait_for_claim(1, timeout=5)))
+        waiter.start()
+        assert matcher.is_claimed(1)
+        matcher.deliver(1, {"matched": True})
+        waiter.join(5)
+
+        assert results == [{"matched": True}]
+        assert not matcher.is_claimed(1)
+
+    def test_restore_releases_claims(self, matcher):
+        """Test that a failed match wakes the partner with no result."""
+        matcher.add(1, 45.0, 25.0, None, friend_ids=[2])
+        matcher.add(2, 45.0, 25.0, None, friend_ids=[1])
+        claimed = matcher.claim_match(2, radius_m=100)
+
+        matcher.restore(claimed)
+
+        assert not matcher.is_claimed(1)
+        assert matcher.wait_for_claim(1, timeout=5) is None
+        assert matcher.get(1) is not None
+
+@pytest.mark.unit
+class TestShakeMatcherWait:
+    """Test waiting for match results."""
+
+    @pytest.mark.asyncio
+    async def test_waiter_woken_by_delivery_from_another_thread(self, matcher):
+        """Test that a result delivered from a worker thread wakes the waiting request."""
+        loop = asyncio.get_running_loop()
+        waiting = asyncio.create_task(matcher.wait_for_match(1, timeout=5))
+        await asyncio.sleep(0)
+
+        await loop.run_in_executor(None, matcher.deliver, 1, {"matched": True})
+
+        assert await waiting == {"matched": True}
+        assert matcher.pop_result(1) is None
+
+    @pytest.mark.asyncio
+    async def test_wait_times_out(self, matcher):
+        """Test that waiting without a match returns None."""
+        assert await matcher.wait_for_match(1, timeout=0.01) is None
+
+    @pytest.mark.asyncio
+    async def test_result_delivered_before_wait(self, matcher):
+        """Test that a result delivered while nobody waited is returned at once."""
+        matcher.deliver(1, {"matched": True})
+
+        assert await matcher.wait_for_match(1, timeout=5) == {"matched": True}
+
+    def test_undelivered_result_expires(self, matcher):
+        """Test that kept results are dropped after the TTL."""
+        matcher.deliver(1, {"matched": True}, now=NOW)
+
+        assert matcher.pop_result(1, now=NOW + timedelta(seconds=16)) is None
+
+    def test_group_clusters_mutual_friends(self, matcher):
+        """Test that a group holds only shakers who are all friends with each other."""
+        matcher.add(1, 45.0, 25.0, None, friend_ids=[2, 3, 4], now=NOW, group=True)
+        matcher.add(2, 45.0001, 25.0, None, friend_ids=[1, 3], now=NOW, group=True)
+        matcher.add(3, 45.0002, 25.0, None, friend_ids=[1, 2], now=NOW, group=True)
+        # Friends with 1 only, so not part of the group
+        matcher.add(4, 45.0001, 25.0001, None, friend_ids=[1], now=NOW, group=True)
+
+        members = matcher.cluster(1, radius_m=100, max_size=10, now=NOW)
+
+        assert [member.user_id for member in members] == [1, 2, 3]
+
+    def test_group_waits_to_settle(self, matcher):
+        """Test that a group is claimed only after it had time to gather."""
+        matcher.add(1, 45.0, 25.0, None, friend_ids=[2, 3], now=NOW, group=True)
+        matcher.add(2, 45.0001, 25.0, None, friend_ids=[1, 3], now=NOW, group=True)
+
+        assert matcher.claim_group(2, radius_m=100, settle_seconds=3, max_size=10, now=NOW) is None
+
+        later = NOW + timedelta(seconds=1)
+        matcher.add(3, 45.0002, 25.0, None, friend_ids=[1, 2], now=later, group=True)
+        settled = NOW + timedelta(seconds=3)
+        members = matcher.claim_group(3, radius_m=100, settle_seconds=3, max_size=10, now=settled)
+
+        assert [member.user_id for member in members] == [3, 2, 1]
+        assert len(matcher) == 0
+        assert all(matcher.is_claimed(user_id) for user_id in (1, 2, 3))
+
+    def test_full_group_claimed_without_settling(self, matcher):
+        """Test that a group of max_size is claimed at once."""
+        matcher.add(1, 45.0, 25.0, None, friend_ids=[2], now=NOW, group=True)
+        matcher.add(2, 45.0001, 25.0, None, friend_ids=[1], now=NOW, group=True)
+
+        members = matcher.claim_group(1, radius_m=100, settle_seconds=3, max_size=2, now=NOW)
+
+        assert [member.user_id for member in members] == [1, 2]
+
+    def test_group_and_pair_shakes_do_not_mix(self, matcher):
+        """Test that one-to-one shakes never match group shakes."""
+        matcher.add(1, 45.0, 25.0, None, friend_ids=[2], now=NOW, group=True)
+        matcher.add(2, 45.0001, 25.0, None, friend_ids=[1], now=NOW)
+
+        assert matcher.claim_match(2, radius_m=100, now=NOW) is None
+        assert matcher.cluster(1, radius_m=100, max_size=10, now=NOW)[1:] == []
+
+    def test_cluster_many_shakers(self, matcher):
+        """Test clustering hundreds of shakers that are all friends."""
+        user_ids = list(range(1, 301))
+        for i, user_id in enumerate(user_ids):
+            friend_ids = [other for other in user_ids if other != user_id]
+            matcher.add(user_id, 45.0 + (i % 20) * 0.00002, 25.0 + (i // 20) * 0.00002, None,
+                        friend_ids=friend_ids, now=NOW, group=True)
+
+        members = matcher.claim_group(1, radius_m=100, settle_seconds=0, max_size=50, now=NOW)
+
+        assert len(members) == 50
+        assert len({member.user_id for member in members}) == 50
+        assert len(matcher) == 250
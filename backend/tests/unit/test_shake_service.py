@@ -0,0 +1,259 @@
+"""
+Unit tests for ShakeService.
+"""
+import threading
+from datetime import datetime, timedelta
+import pytest
+from app.core.geocoding import GeocodingCache, ReverseGeocoder, StaticGeocodingProvider
+from app.core.config import settings
+from app.core.shake_matcher import shake_matcher
+from app.models.friendship import Friendship
+from app.models.shake_session import ShakeSession, ShakeSessionStatus
+from app.models.meeting import Meeting, MeetingParticipant
+from app.models.user import User
+from app.services import shake_service as shake_service_module
+from app.repositories.shake_repository import ShakeRepository
+from app.services.shake_service import ShakeService
+
+
+@pytest.fixture(autouse=True)
+def clean_matcher():
+    """Start every test with no pending shakes."""
+    shake_matcher.clear()
+    yield
+    shake_matcher.clear()
+
+
+@pytest.fixture(autouse=True)
+def geocoder(monkeypatch):
+    """Resolve addresses inline with a local stand-in provider."""
+    geocoder = ReverseGeocoder(StaticGeocodingProvider("Strada Memorandumului 1, Cluj-Napoca"),
+                               GeocodingCache(), max_workers=0)
+    monkeypatch.setattr(shake_service_module, "reverse_geocoder", geocoder)
+    return geocoder
+
+
+@pytest.fixture
+def friends(db_session, test_user, test_user2):
+    friendship = Friendship(user_id=test_user.id, friend_id=test_user2.id, status="accepted")
+    db_session.add(friendship)
+    db_session.commit()
+    return friendship
+
+
+@pytest.mark.unit
+class TestShakeService:
+    """Test shake service."""
+
+    def test_first_shake_waits_in_memory(self, db_session, session_factory, test_user, friends):
+        """Test that an unmatched shake is not written to the database."""
+        shake_service = ShakeService(db_session, session_factory)
+
+        result = shake_service.initiate_shake(test_user.id, 45.0, 25.0)
+
+        assert result["matched"] is False
+        assert result["status"] == "active"
+        assert db_session.query(ShakeSession).count() == 0
+        assert shake_service.get_active_session(test_user.id)["session_id"] == result["session_id"]
+
+    def test_friends_shaking_together_match(self, db_session, session_factory, test_user, test_user2, friends):
+        """Test that a match persists both sessions and creates a meeting."""
+        shake_service = ShakeService(db_session, session_factory)
+        shake_service.initiate_shake(test_user.id, 45.0, 25.0)
+
+        result = shake_service.initiate_shake(test_user2.id, 45.0002, 25.0)
+
+        assert result["matched"] is True
+        assert result["matched_user_id"] == test_user.id
+        assert result["meeting_id"] is not None
+        sessions = db_session.query(ShakeSession).all()
+        assert len(sessions) == 2
+        assert all(s.status == ShakeSessionStatus.MATCHED for s in sessions)
+        assert {s.matched_user_id for s in sessions} == {test_user.id, test_user2.id}
+        assert shake_service.get_active_session(test_user.id) is None
+
+    def test_meeting_address_filled_by_geocoder(self, db_session, session_factory, test_user, test_user2, friends, geocoder):
+        """Test that the meeting starts with coordinates and gets the resolved address."""
+        shake_service = ShakeService(db_session, session_factory)
+        shake_service.initiate_shake(test_user.id, 45.0, 25.0)
+
+        result = shake_service.initiate_shake(test_user2.id, 45.0002, 25.0)
+
+        meeting = db_session.query(Meeting).filter(Meeting.id == result["meeting_id"]).first()
+        db_session.refresh(meeting)
+        assert meeting.address == "Strada Memorandumului 1, Cluj-Napoca"
+        assert geocoder.provider.calls == 1
+
+    def test_partner_receives_match_on_next_call(self, db_session, session_factory, test_user, test_user2, friends):
+        """Test that the first shaker gets the match from their side on their next call."""
+        shake_service = ShakeService(db_session, session_factory)
+        first = shake_service.initiate_shake(test_user.id, 45.0, 25.0)
+        partner_result = shake_service.initiate_shake(test_user2.id, 45.0002, 25.0)
+        
+        result = shake_service.initiate_shake(test_user.id, 45.0, 25.0)
+        
+        assert result["matched"] is True
+        assert result["matched_user_id"] == test_user2.id
+        assert result["meeting_id"] == partner_result["meeting_id"]
+        assert result["session_id"] != partner_result["session_id"]
+        # The ID from the first, unmatched response identifies the match too
+        assert result["session_id"] == first["session_id"]
+        assert result["record_id"] != partner_result["record_id"]
+
+    def test_claimed_partner_reads_result_instead_of_matching(self, db_session, session_factory, test_user, test_user2):
+        """Test that a request arriving while its match is being finalized waits for it."""
+        shake_matcher.add(test_user.id, 45.0, 25.0, None, friend_ids=[test_user2.id])
+        shake_matcher.add(test_user2.id, 45.0, 25.0, None, friend_ids=[test_user.id])
+        shake_matcher.claim_match(test_user2.id, radius_m=100)
+        results = []
+
+        request = threading.Thread(
+            target=lambda: results.append(ShakeService(db_session, session_factory).initiate_shake(test_user.id, 45.0, 25.0))
+        )
+        request.start()
+        shake_matcher.deliver(test_user.id, {"session_id": 1, "status": "matched", "matched": True})
+        request.join(5)
+
+        assert results[0]["matched"] is True
+        assert shake_matcher.get(test_user.id) is None
+
+    def test_mark_sessions_matched_claims_only_active_rows(self, db_session, test_user, test_user2):
+        """Test that matching already matched sessions fails without changes."""
+        now = datetime.utcnow()
+        sessions = [
+            ShakeSession(user_id=user.id, latitude=45.0, longitude=25.0,
+                         status=ShakeSessionStatus.ACTIVE, expires_at=now + timedelta(seconds=15))
+            for user in (test_user, test_user2)
+        ]
+        db_session.add_all(sessions)
+        db_session.commit()
+        shake_repo = ShakeRepository(db_session)
+        matched_user_ids = {sessions[0].id: test_user2.id, sessions[1].id: test_user.id}
+
+        shake_repo.mark_sessions_matched(matched_user_ids, meeting_id=1)
+        with pytest.raises(ValueError):
+            shake_repo.mark_sessions_matched(matched_user_ids, meeting_id=2)
+
+        db_session.refresh(sessions[0])
+        assert sessions[0].meeting_id == 1
+
+    def test_failed_persist_leaves_no_meeting(self, db_session, session_factory, test_user, test_user2, friends, monkeypatch):
+        """Test that a match whose sessions cannot be stored drops its meeting, so a retry makes only one."""
+        create_matched_group = ShakeRepository.create_matched_group
+        calls = []
+
+        def fail_once(self, shakes, meeting_id):
+            calls.append(meeting_id)
+            if len(calls) == 1:
+                raise RuntimeError("database unavailable")
+            return create_matched_group(self, shakes, meeting_id)
+
+        monkeypatch.setattr(ShakeRepository, "create_matched_group", fail_once)
+        shake_service = ShakeService(db_session, session_factory)
+        shake_service.initiate_shake(test_user.id, 45.0, 25.0)
+
+        failed = shake_service.initiate_shake(test_user2.id, 45.0002, 25.0)
+
+        assert failed["matched"] is False
+        assert db_session.query(Meeting).count() == 0
+        assert db_session.query(MeetingParticipant).count() == 0
+        assert shake_matcher.get(test_user.id) is not None
+
+        retried = shake_service.initiate_shake(test_user2.id, 45.0002, 25.0)
+
+        assert retried["matched"] is True
+        assert db_session.query(Meeting).count() == 1
+
+    def test_non_friends_do_not_match(self, db_session, session_factory, test_user, test_user2):
+        """Test that users who are not friends are never matched."""
+        shake_service = ShakeService(db_session, session_factory)
+        shake_service.initiate_shake(test_user.id, 45.0, 25.0)
+
+        result = shake_service.initiate_shake(test_user2.id, 45.0, 25.0)
+
+        assert result["matched"] is False
+
+    def test_nearby_shaking_friends(self, db_session, session_factory, test_user, test_user2, friends):
+        """Test listing friends currently shaking nearby."""
+        shake_service = ShakeService(db_session, session_factory)
+        shake_service.initiate_shake(test_user2.id, 45.0, 25.0)
+
+        nearby = shake_service.get_nearby_shaking_friends(test_user.id, 45.0003, 25.0)
+
+        assert len(nearby) == 1
+        assert nearby[0]["user_id"] == test_user2.id
+        assert nearby[0]["distance_m"] == pytest.approx(33.4, abs=0.5)
+
+    def test_group_shake_creates_one_meeting(self, db_session, session_factory, test_user, test_user2, friends, monkeypatch):
+        """Test that friends group-shaking together share one meeting once the group settles."""
+        third = User(username="testuser3", email="test3@example.com", password_hash="x",
+                     full_name="Test User 3", is_active=True, email_verified=True)
+        db_session.add(third)
+        db_session.commit()
+        for user in (test_user, test_user2):
+            db_session.add(Friendship(user_id=user.id, friend_id=third.id, status="accepted"))
+        db_session.commit()
+        shake_service = ShakeService(db_session, session_factory)
+        monkeypatch.setattr(ShakeService, "GROUP_SETTLE_SECONDS", 3600)
+        shake_service.initiate_shake(test_user.id, 45.0, 25.0, group=True)
+        shake_service.initiate_shake(test_user2.id, 45.0001, 25.0, group=True)
+        waiting = shake_service.initiate_shake(third.id, 45.0002, 25.0, group=True)
+
+        monkeypatch.setattr(ShakeService, "GROUP_SETTLE_SECONDS", 0)
+        result = shake_service.check_group_shake(third.id)
+
+        assert waiting["matched"] is False
+        assert waiting["nearby_friends_count"] == 2
+        assert result["matched"] is True
+        assert result["matched_user_ids"] == [test_user.id, test_user2.id]
+        meeting = db_session.query(Meeting).filter(Meeting.id == result["meeting_id"]).first()
+        assert meeting.organizer_id == test_user.id
+        participant_ids = {
+            p.user_id for p in db_session.query(MeetingParticipant).filter(MeetingParticipant.meeting_id == meeting.id)
+        }
+        assert {test_user2.id, third.id} <= participant_ids
+        sessions = db_session.query(ShakeSession).all()
+        assert len(sessions) == 3
+        assert all(s.meeting_id == meeting.id for s in sessions)
+        delivered = shake_matcher.pop_result(test_user2.id)
+        assert delivered["meeting_id"] == meeting.id
+        assert delivered["matched_user_ids"] == [test_user.id, third.id]
+
+    def test_group_shake_does_not_match_pair_shake(self, db_session, session_factory, test_user, test_user2, friends, monkeypatch):
+        """Test that a one-to-one shake is not pulled into a group."""
+        monkeypatch.setattr(ShakeService, "GROUP_SETTLE_SECONDS", 0)
+        shake_service = ShakeService(db_session, session_factory)
+        shake_service.initiate_shake(test_user.id, 45.0, 25.0, group=True)
+
+        result = shake_service.initiate_shake(test_user2.id, 45.0001, 25.0)
+
+        assert result["matched"] is False
+        assert db_session.query(ShakeSession).count() == 0
+
+    def test_sql_store_records_every_shake(self, db_session, session_factory, test_user, test_user2, friends, monkeypatch):
+        """Test that the sql store writes pending shakes and turns them into the match."""
+        monkeypatch.setattr(settings, "SHAKE_STORAGE_BACKEND", "sql")
+        shake_service = ShakeService(db_session, session_factory)
+        shake_service.initiate_shake(test_user.id, 45.0, 25.0)
+        shake_service.initiate_shake(test_user.id, 45.0001, 25.0)
+
+        pending = db_session.query(ShakeSession).all()
+        assert len(pending) == 1
+        assert pending[0].status == ShakeSessionStatus.ACTIVE
+        assert float(pending[0].latitude) == pytest.approx(45.0001)
+
+        result = shake_service.initiate_shake(test_user2.id, 45.0002, 25.0)
+
+        assert result["matched"] is True
+        db_session.expire_all()
+        sessions = db_session.query(ShakeSession).all()
+        assert len(sessions) == 2
+        assert all(s.status == ShakeSessionStatus.MATCHED for s in sessions)
+        assert all(s.meeting_id == result["meeting_id"] for s in sessions)
+
+    def test_unknown_store_rejected(self, db_session, monkeypatch):
+        """Test that a misconfigured storage backend fails loudly."""
+        monkeypatch.setattr(settings, "SHAKE_STORAGE_BACKEND", "redis")
+
+        with pytest.raises(ValueError):
+            ShakeService(db_session)
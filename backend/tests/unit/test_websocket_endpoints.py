@@ -0,0 +1,210 @@
+"""
+Unit tests for the WebSocket endpoints: authentication, membership checks and client frames.
+"""
+import asyncio
+import json
+import pytest
+from fastapi import WebSocketDisconnect
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.v1 import chat as chat_module
+from app.api.v1 import location as location_module
+from app.core.security import create_access_token, get_password_hash
+from app.core.websocket_manager import websocket_manager
+from app.models.chat import Conversation, Message
+from app.models.user import User
+
+
+class FakeWebSocket:
+    """A client that connects, sends the given frames and hangs up."""
+
+    def __init__(self, frames=()):
+        self.accepted = False
+        self.closed_with = None
+        self.sent = []
+        self.frames = list(frames)
+
+    async def accept(self):
+        self.accepted = True
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.closed_with = code
+
+    async def send_text(self, data: str):
+        self.sent.append(json.loads(data))
+
+    async def receive_text(self) -> str:
+        if not self.frames:
+            # Let queued replies go out before hanging up
+            await asyncio.sleep(0.01)
+            raise WebSocketDisconnect()
+        return json.dumps(self.frames.pop(0))
+
+
+async def _create_user(db: AsyncSession, username: str, is_active: bool = True) -> User:
+    user = User(
+        username=username,
+        email=f"{username}@example.com",
+        password_hash=get_password_hash("testpassword123"),
+        full_name=username.title(),
+        is_active=is_active
+    )
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+
+async def _create_conversation(db: AsyncSession, user1: User, user2: User) -> Conversation:
+    conversation = Conversation(user1_id=user1.id, user2_id=user2.id)
+    db.add(conversation)
+    await db.commit()
+    await db.refresh(conversation)
+    return conversation
+
+
+def _token(user: User) -> str:
+    return create_access_token({"sub": str(user.id)})
+
+
+@pytest.fixture
+def accepted_friendship(db_session, test_friendship):
+    test_friendship.status = "accepted"
+    db_session.commit()
+    return test_friendship
+
+
+@pytest.mark.unit
+class TestChatWebSocketEndpoints:
+    """Test the chat WebSocket endpoints with an injected AsyncSession."""
+
+    @pytest.mark.asyncio
+    async def test_conversation_socket_requires_membership(self, async_db):
+        """Test that /chat/ws/{id} is closed for a user outside the conversation."""
+        alice, bob, carol = [await _create_user(async_db, name) for name in ("alice", "bob", "carol")]
+        conversation = await _create_conversation(async_db, alice, bob)
+        outsider = FakeWebSocket()
+
+        await chat_module.websocket_endpoint(outsider, conversation.id, _token(carol), async_db)
+
+        assert outsider.closed_with == 1008
+        assert websocket_manager.get_connection_count(conversation.id) == 0
+
+    @pytest.mark.asyncio
+    async def test_conversation_socket_for_member(self, async_db):
+        """Test that a participant is connected until the client hangs up."""
+        alice, bob = [await _create_user(async_db, name) for name in ("alice", "bob")]
+        conversation = await _create_conversation(async_db, alice, bob)
+        member = FakeWebSocket(frames=[{"type": "ping"}])
+
+        await chat_module.websocket_endpoint(member, conversation.id, _token(alice), async_db)
+
+        assert member.accepted
+        assert member.closed_with is None
+        assert websocket_manager.get_connection_count(conversation.id) == 0
+
+    @pytest.mark.asyncio
+    async def test_user_socket_rejects_inactive_user(self, async_db, session_factory):
+        """Test that /chat/ws is closed for a deactivated account."""
+        inactive = await _create_user(async_db, "inactive", is_active=False)
+        socket = FakeWebSocket()
+
+        await chat_module.user_websocket_endpoint(socket, _token(inactive), async_db, session_factory)
+
+        assert not socket.accepted
+        assert socket.closed_with == 1008
+
+    @pytest.mark.asyncio
+    async def test_subscribe_checks_membership(self, async_db, session_factory):
+        """Test that a subscribe frame is only honoured for the user's own conversations."""
+        alice, bob, carol = [await _create_user(async_db, name) for name in ("alice", "bob", "carol")]
+        own = await _create_conversation(async_db, alice, bob)
+        foreign = await _create_conversation(async_db, bob, carol)
+        socket = FakeWebSocket()
+        await websocket_manager.connect_user(socket, alice.id, [])
+        try:
+            denied = await chat_module._handle_chat_frame(
+                socket, alice.id, {"type": "subscribe", "conversation_id": foreign.id}, async_db, session_factory
+            )
+            allowed = await chat_module._handle_chat_frame(
+                socket, alice.id, {"type": "subscribe", "conversation_id": own.id}, async_db, session_factory
+            )
+
+            assert denied == {"type": "error", "conversation_id": foreign.id, "detail": "Not allowed"}
+            assert allowed == {"type": "subscribed", "conversation_id": own.id}
+            assert websocket_manager.connection_subscriptions[socket] == {own.id}
+        finally:
+            websocket_manager.disconnect(socket)
+
+
+@pytest.mark.unit
+class TestSendMessageFrame:
+    """Test the send_message frame of the multiplexed chat WebSocket."""
+
+    @pytest.mark.asyncio
+    async def test_ack(self, db_session, async_db, session_factory, test_user, test_user2, accepted_friendship):
+        """Test that a sent frame is stored and acknowledged with its client_message_id."""
+        reply = await chat_module._handle_chat_frame(None, test_user.id, {
+            "type": "send_message", "client_message_id": "c-1", "friend_id": test_user2.id, "content": "hi"
+        }, async_db, session_factory)
+
+        assert reply["type"] == "message_ack"
+        assert reply["client_message_id"] == "c-1"
+        assert reply["duplicate"] is False
+        assert reply["conversation_id"] == reply["data"]["conversation_id"]
+        assert db_session.query(Message).count() == 1
+
+    @pytest.mark.asyncio
+    async def test_duplicate_ack(self, db_session, async_db, session_factory, test_user, test_user2, accepted_friendship):
+        """Test that a resent frame is acknowledged with the original message."""
+        frame = {"type": "send_message", "client_message_id": "c-1", "friend_id": test_user2.id, "content": "hi"}
+        first = await chat_module._handle_chat_frame(None, test_user.id, frame, async_db, session_factory)
+        retry = await chat_module._handle_chat_frame(None, test_user.id, frame, async_db, session_factory)
+
+        assert retry["duplicate"] is True
+        assert retry["data"]["id"] == first["data"]["id"]
+        assert db_session.query(Message).count() == 1
+
+    @pytest.mark.asyncio
+    async def test_errors_carry_client_message_id(self, db_session, async_db, session_factory, test_user, test_user2, test_friendship):
+        """Test that rejected frames are answered with an error naming the client_message_id."""
+        missing_id = await chat_module._handle_chat_frame(None, test_user.id, {
+            "type": "send_message", "friend_id": test_user2.id, "content": "hi"
+        }, async_db, session_factory)
+        invalid = await chat_module._handle_chat_frame(None, test_user.id, {
+            "type": "send_message", "client_message_id": "c-1", "friend_id": test_user2.id, "content": ""
+        }, async_db, session_factory)
+        forbidden = await chat_module._handle_chat_frame(None, test_user.id, {
+            "type": "send_message", "client_message_id": "c-2", "friend_id": test_user2.id, "content": "hi"
+        }, async_db, session_factory)
+
+        assert missing_id["type"] == "error"
+        assert invalid == {"type": "error", "client_message_id": "c-1", "detail": invalid["detail"]}
+        assert invalid["detail"].startswith("content")
+        assert forbidden["type"] == "error" and forbidden["client_message_id"] == "c-2"
+
+
+@pytest.mark.unit
+class TestLocationWebSocketEndpoint:
+    """Test the location WebSocket endpoint with an injected AsyncSession."""
+
+    @pytest.mark.asyncio
+    async def test_rejects_inactive_user(self, async_db):
+        """Test that a deactivated account cannot subscribe to friends' locations."""
+        inactive = await _create_user(async_db, "inactive", is_active=False)
+        socket = FakeWebSocket()
+
+        await location_module.location_websocket(socket, _token(inactive), False, async_db)
+
+        assert not socket.accepted
+        assert socket.closed_with == 1008
+
+    @pytest.mark.asyncio
+    async def test_accepts_active_user(self, async_db):
+        """Test that an active user is accepted and answered."""
+        alice = await _create_user(async_db, "alice")
+        socket = FakeWebSocket(frames=[{"type": "ping"}])
+
+        await location_module.location_websocket(socket, _token(alice), False, async_db)
+
+        assert socket.accepted
+        assert socket.sent == [{"type": "pong"}]
@@ -0,0 +1,248 @@
+"""
+Unit tests for chat WebSocket routing.
+"""
+import asyncio
+import json
+import pytest
+from app.core.security import create_access_token
+from app.core.websocket_manager import WebSocketManager
+
+
+class FakeWebSocket:
+    """Records what would have been sent to the client."""
+
+    def __init__(self):
+        self.accepted = False
+        self.closed_with = None
+        self.sent = []
+
+    async def accept(self):
+        self.accepted = True
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.closed_with = code
+
+    async def send_text(self, data: str):
+        self.sent.append(json.loads(data))
+
+
+@pytest.fixture
+def manager():
+    return WebSocketManager()
+
+
+@pytest.mark.unit
+class TestWebSocketManager:
+    """Test chat WebSocket routing."""
+
+    @pytest.mark.asyncio
+    async def test_multiplexed_socket_routed_by_conversation(self, manager):
+        """Test that one socket receives every subscribed conversation, tagged with its ID."""
+        socket = FakeWebSocket()
+        await manager.connect_user(socket, user_id=1, conversation_ids=[10, 11])
+
+        await manager.broadcast_to_conversation(10, {"type": "new_message"})
+        await manager.broadcast_to_conversation(11, {"type": "new_message"})
+        await manager.broadcast_to_conversation(12, {"type": "new_message"})
+
+        await manager.flush()
+        assert socket.accepted
+        assert [frame["conversation_id"] for frame in socket.sent] == [10, 11]
+
+    @pytest.mark.asyncio
+    async def test_sender_excluded(self, manager):
+        """Test that the sender's own sockets are skipped."""
+        sender, recipient = FakeWebSocket(), FakeWebSocket()
+        await manager.connect_user(sender, user_id=1, conversation_ids=[10])
+        await manager.connect_user(recipient, user_id=2, conversation_ids=[10])
+
+        await manager.broadcast_to_conversation(10, {"type": "new_message"}, exclude_user_id=1)
+
+        await manager.flush()
+        assert sender.sent == []
+        assert len(recipient.sent) == 1
+
+    @pytest.mark.asyncio
+    async def test_new_conversation_reaches_participants(self, manager):
+        """Test that a conversation created after connecting is routed to its participants."""
+        socket = FakeWebSocket()
+        await manager.connect_user(socket, user_id=2, conversation_ids=[])
+
+        await manager.broadcast_to_conversation(20, {"type": "new_message"}, participant_ids=[1, 2])
+        await manager.broadcast_to_conversation(20, {"type": "typing"})
+
+        await manager.flush()
+        assert [frame["type"] for frame in socket.sent] == ["new_message", "typing"]
+
+    @pytest.mark.asyncio
+    async def test_unsubscribe_sticks(self, manager):
+        """Test that an unsubscribed conversation is not re-subscribed by new messages."""
+        socket = FakeWebSocket()
+        await manager.connect_user(socket, user_id=2, conversation_ids=[10])
+        manager.unsubscribe(socket, 10)
+
+        await manager.broadcast_to_conversation(10, {"type": "new_message"}, participant_ids=[1, 2])
+
+        await manager.flush()
+        assert socket.sent == []
+        manager.subscribe(socket, 10)
+        await manager.broadcast_to_conversation(10, {"type": "new_message"})
+        await manager.flush()
+        assert len(socket.sent) == 1
+
+    @pytest.mark.asyncio
+    async def test_disconnect_forgets_socket(self, manager):
+        """Test that disconnecting removes every subscription."""
+        socket = FakeWebSocket()
+        await manager.connect_user(socket, user_id=1, conversation_ids=[10, 11])
+
+        manager.disconnect(socket)
+
+        assert manager.get_connection_count(10) == 0
+        assert manager.get_connection_count(11) == 0
+        assert manager.get_user_connection_count(1) == 0
+        assert socket not in manager.connection_users
+
+    @pytest.mark.asyncio
+    async def test_single_conversation_socket(self, manager, test_user):
+        """Test that a per-conversation socket is accepted and only gets that conversation."""
+        socket = FakeWebSocket()
+        token = create_access_token({"sub": str(test_user.id)})
+
+        await manager.connect(socket, 10, token)
+        await manager.broadcast_to_conversation(10, {"type": "new_message"}, participant_ids=[test_user.id])
+        await manager.broadcast_to_conversation(11, {"type": "new_message"}, participant_ids=[test_user.id])
+
+        await manager.flush()
+        assert socket.accepted
+        assert [frame["conversation_id"] for frame in socket.sent] == [10]
+
+    @pytest.mark.asyncio
+    async def test_invalid_token_closed(self, manager):
+        """Test that a bad token closes the socket without accepting it."""
+        socket = FakeWebSocket()
+
+        await manager.connect(socket, 10, "not-a-token")
+
+        assert not socket.accepted
+        assert socket.closed_with == 1008
+
+
+class StalledWebSocket(FakeWebSocket):
+    """A client on a bad network: sends block until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.released = asyncio.Event()
+
+    async def send_text(self, data: str):
+        await self.released.wait()
+        await super().send_text(data)
+
+
+@pytest.mark.unit
+class TestOutboundQueues:
+    """Test per-connection outbound queues and their overflow policies."""
+
+    @pytest.mark.asyncio
+    async def test_slow_socket_does_not_block_others(self):
+        """Test that a stalled client neither blocks the broadcast nor other clients."""
+        manager = WebSocketManager(queue_size=4)
+        slow, fast = StalledWebSocket(), FakeWebSocket()
+        await manager.connect_user(slow, user_id=1, conversation_ids=[10])
+        await manager.connect_user(fast, user_id=2, conversation_ids=[10])
+
+        await asyncio.wait_for(manager.broadcast_to_conversation(10, {"type": "new_message"}), timeout=1.0)
+        await asyncio.wait_for(manager.outbound.queues[fast].join(), timeout=1.0)
+
+        assert len(fast.sent) == 1
+        assert slow.sent == []
+        slow.released.set()
+        await manager.flush()
+        assert len(slow.sent) == 1
+
+    @pytest.mark.asyncio
+    async def test_overflow_disconnects_by_default(self):
+        """Test that a full queue disconnects and closes the socket."""
+        manager = WebSocketManager(queue_size=2)
+        slow = StalledWebSocket()
+        await manager.connect_user(slow, user_id=1, conversation_ids=[10])
+
+        for n in range(5):
+            await manager.broadcast_to_conversation(10, {"type": "new_message", "n": n})
+        # The close handshake runs in the background
+        await asyncio.sleep(0.01)
+
+        assert manager.get_connection_count(10) == 0
+        assert slow not in manager.outbound.queues
+        assert slow.closed_with == 1013
+        assert manager.outbound.dropped_frames == 1
+
+    @pytest.mark.asyncio
+    async def test_overflow_drop_oldest(self):
+        """Test that drop_oldest keeps the socket and the most recent frames."""
+        manager = WebSocketManager(queue_size=2, overflow_policy="drop_oldest")
+        slow = StalledWebSocket()
+        await manager.connect_user(slow, user_id=1, conversation_ids=[10])
+        # Let the writer take the first frame, so it is in flight
+        await manager.broadcast_to_conversation(10, {"n": 0})
+        await asyncio.sleep(0)
+
+        for n in range(1, 6):
+            await manager.broadcast_to_conversation(10, {"n": n})
+        slow.released.set()
+        await manager.flush()
+
+        assert [frame["n"] for frame in slow.sent] == [0, 4, 5]
+        assert manager.get_connection_count(10) == 1
+
+    @pytest.mark.asyncio
+    async def test_overflow_drop_newest(self):
+        """Test that drop_newest keeps the socket and the frames already queued."""
+        manager = WebSocketManager(queue_size=2, overflow_policy="drop_newest")
+        slow = StalledWebSocket()
+        await manager.connect_user(slow, user_id=1, conversation_ids=[10])
+        await manager.broadcast_to_conversation(10, {"n": 0})
+        await asyncio.sleep(0)
+
+        for n in range(1, 6):
+            await manager.broadcast_to_conversation(10, {"n": n})
+        slow.released.set()
+        await manager.flush()
+
+        assert [frame["n"] for frame in slow.sent] == [0, 1, 2]
+        assert manager.outbound.dropped_frames == 3
+
+    @pytest.mark.asyncio
+    async def test_send_timeout_disconnects(self):
+        """Test that a socket stuck on one send is disconnected."""
+        manager = WebSocketManager(send_timeout_seconds=0.05)
+        slow = StalledWebSocket()
+        await manager.connect_user(slow, user_id=1, conversation_ids=[10])
+
+        await manager.broadcast_to_conversation(10, {"type": "new_message"})
+        await asyncio.sleep(0.2)
+
+        assert manager.get_connection_count(10) == 0
+        assert slow.closed_with == 1013
+
+    @pytest.mark.asyncio
+    async def test_failed_send_disconnects(self, manager):
+        """Test that a socket whose send fails is forgotten."""
+
+        class BrokenWebSocket(FakeWebSocket):
+            async def send_text(self, data: str):
+                raise RuntimeError("connection reset")
+
+        socket = BrokenWebSocket()
+        await manager.connect_user(socket, user_id=1, conversation_ids=[10])
+
+        await manager.broadcast_to_conversation(10, {"type": "new_message"})
+        await manager.flush()
+
+        assert socket not in manager.connection_users
+
+    def test_unknown_policy_rejected(self):
+        """Test that a misconfigured overflow policy fails fast."""
+        with pytest.raises(ValueError):
+            WebSocketManager(overflow_policy="block")